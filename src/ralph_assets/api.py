@@ -12,6 +12,7 @@ from django.contrib.auth.models import User
 from tastypie import fields
 from tastypie.authentication import ApiKeyAuthentication
 from tastypie.constants import ALL, ALL_WITH_RELATIONS
+from tastypie.paginator import Paginator
 from tastypie.resources import ModelResource
 from tastypie.throttle import CacheThrottle
 
@@ -31,6 +32,7 @@ from ralph_assets.models import (
     SoftwareCategory,
     Warehouse,
 )
+from ralph_assets.models_assets import prefetch_ralph_devices
 
 THROTTLE_AT = settings.API_THROTTLING['throttle_at']
 TIMEFRAME = settings.API_THROTTLING['timeframe']
@@ -88,7 +90,7 @@ class AssetsField(fields.RelatedField):
         super(AssetsField, self).__init__(*args, **kwargs)
 
     def dehydrate(self, bundle, **kwargs):
-        assets = Asset.objects.filter(owner=bundle.obj)
+        assets = prefetch_ralph_devices(Asset.objects.filter(owner=bundle.obj))
         return [
             self.dehydrate_related(bundle, self.get_related_resource(asset))
             for asset in assets
@@ -98,6 +100,15 @@ class AssetsField(fields.RelatedField):
         return 'assets'
 
 
+class AssetsPaginator(Paginator):
+    """Fetches Ralph devices linked with all assets of the page at once."""
+
+    def get_slice(self, limit, offset):
+        return prefetch_ralph_devices(
+            super(AssetsPaginator, self).get_slice(limit, offset)
+        )
+
+
 class AssetManufacturerResource(ModelResource):
     class Meta:
         queryset = AssetManufacturer.objects.all()
@@ -321,6 +332,7 @@ class AssetsResource(ModelResource):
             'warehouse': ALL_WITH_RELATIONS,
         }
         list_allowed_methods = ['get']
+        paginator_class = AssetsPaginator
         throttle = CacheThrottle(
             throttle_at=THROTTLE_AT,
             timeframe=TIMEFRAME,
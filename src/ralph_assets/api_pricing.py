@@ -7,7 +7,19 @@ from __future__ import unicode_literals
 
 from django.db.models import Q
 
-from ralph_assets.models_assets import Asset, Warehouse
+from ralph_assets.delta import (
+    ASSET_MODELS,
+    get_asset_dates_token,
+    get_change_token,
+    get_changed_asset_ids,
+    iterate_delta,
+)
+from ralph_assets.models_assets import (
+    Asset,
+    Warehouse,
+    iterate_with_ralph_devices,
+)
+from ralph_assets.models_util import iterate_chunks
 
 
 def get_warehouses():
@@ -19,12 +31,15 @@ def get_warehouses():
         }
 
 
-def get_assets(date):
-    """Yields dicts describing all assets"""
-    for asset in Asset.objects_dc.filter(
+def get_assets(date, ids=None):
+    """Yields dicts describing all assets (or these with given ids)"""
+    assets = Asset.objects_dc.filter(
         Q(invoice_date=None) | Q(invoice_date__lte=date),
         part_info=None,
-    ):
+    ).select_related('model__category')
+    if ids is not None:
+        assets = assets.filter(pk__in=ids)
+    for asset in iterate_with_ralph_devices(assets):
         device_info = asset.device_info
 
         venture_info = asset.venture
@@ -51,19 +66,39 @@ def get_assets(date):
         }
 
 
+def get_assets_delta(date, since, previous_date=None):
+    """Yields dicts describing assets at *date* changed since *since* and
+    tombstones of assets not exported anymore - *previous_date* is the date
+    of the export made at *since* (see :mod:`ralph_assets.delta`)"""
+    return iterate_delta(
+        get_changed_asset_ids(since, date, previous_date),
+        lambda ids: get_assets(date, ids),
+        'asset_id',
+    )
+
+
+def get_assets_change_token(date):
+    return '{};{}'.format(
+        get_change_token(*ASSET_MODELS), get_asset_dates_token(date),
+    )
+
+
 def get_asset_parts():
     """Yields dicts describing parts of assets"""
-    for asset in Asset.objects_dc.all():
-        for part in asset.get_parts():
-            device_info = asset.device_info
+    parts = Asset.objects.filter(
+        part_info__device__in=Asset.objects_dc.all(),
+    ).select_related('model', 'part_info__device__device_info')
+    for chunk in iterate_chunks(parts):
+        for part in chunk:
+            device = part.part_info.device
+            device_info = device.device_info
             yield {
                 'asset_id': part.id,
-                'barcode': asset.barcode,
+                'barcode': device.barcode,
                 'is_deprecated': part.is_deprecated(),
                 'model': part.model.name if part.model else None,
                 'price': part.price,
                 'ralph_id': device_info.ralph_device_id if device_info else None,  # noqa
-                'sn': asset.sn,
-                'deprecation_rate': asset.deprecation_rate,
-                'is_deprecated': part.is_deprecated(),
+                'sn': device.sn,
+                'deprecation_rate': device.deprecation_rate,
             }
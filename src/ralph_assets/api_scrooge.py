@@ -10,9 +10,28 @@ import logging
 from django.db.models import Q
 
 from ralph.util.api import Getter
+from ralph_assets.delta import (
+    ASSET_MODELS,
+    MODEL_MODELS,
+    get_asset_dates_token,
+    get_change_token,
+    get_changed_asset_ids,
+    get_changed_ids,
+    get_changed_model_ids,
+    iterate_delta,
+)
+from ralph_assets.history.models import get_current_m2m_values
 from ralph_assets.licences.models import Licence
-from ralph_assets.models_assets import Asset, AssetModel, AssetType, Warehouse
+from ralph_assets.models_assets import (
+    Asset,
+    AssetModel,
+    AssetType,
+    Warehouse,
+    iterate_with_ralph_devices,
+)
+from ralph_assets.models_status import get_liquidated_ids
 from ralph_assets.models_support import Support
+from ralph_assets.models_util import iterate_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -20,32 +39,73 @@ logger = logging.getLogger(__name__)
 class DatedGetter(Getter):
     """
     Returns only items that have a timespan (marked by begin_field and
-    end_field) that contains given date"""
+    end_field) that contains given date.
+
+    Items are streamed in chunks of ``chunk_size``, with ``select_related``
+    relations joined. For every ``prefetch_m2m`` item (result key -> m2m
+    field) lists of related pks are read with one query per chunk.
+    """
+    select_related = ()
+    prefetch_m2m = {}
+    chunk_size = 1000
 
     def __init__(self, date, *args, **kwargs):
         self.date = date
         super(DatedGetter, self).__init__(*args, **kwargs)
 
     def get_queryset(self):
-        return super(DatedGetter, self).get_queryset().filter(**{
+        queryset = super(DatedGetter, self).get_queryset().filter(**{
             self.begin_field + '__lte': self.date,
             self.end_field + '__gte': self.date,
         })
-
-
-def get_warehouses():
-    """Yields dicts describing all warehouses"""
-    for warehouse in Warehouse.objects.all():
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        return queryset
+
+    def __iter__(self):
+        for chunk in iterate_chunks(self.get_queryset(), self.chunk_size):
+            m2m_values = dict(
+                (name, get_current_m2m_values(chunk, field_name))
+                for name, field_name in self.prefetch_m2m.iteritems()
+            )
+            for item in chunk:
+                result = self.format_item(item)
+                for name, values in m2m_values.iteritems():
+                    result[name] = values.get(item.pk, [])
+                yield result
+
+
+def get_warehouses(ids=None):
+    """Yields dicts describing all warehouses (or these with given ids)"""
+    warehouses = Warehouse.objects.all()
+    if ids is not None:
+        warehouses = warehouses.filter(pk__in=ids)
+    for warehouse in warehouses:
         yield {
             'warehouse_id': warehouse.id,
             'warehouse_name': warehouse.name,
         }
 
 
-def get_models():
-    for model in AssetModel.objects.filter(
+def get_warehouses_delta(since):
+    """Yields dicts describing warehouses changed since *since* and
+    tombstones of deleted ones (see :mod:`ralph_assets.delta`)"""
+    return iterate_delta(
+        get_changed_ids(Warehouse, since), get_warehouses, 'warehouse_id',
+    )
+
+
+def get_warehouses_change_token():
+    return get_change_token(Warehouse)
+
+
+def get_models(ids=None):
+    models = AssetModel.objects.filter(
         type__in=AssetType.DC.choices
-    ).select_related('manufacturer', 'category'):
+    ).select_related('manufacturer', 'category')
+    if ids is not None:
+        models = models.filter(pk__in=ids)
+    for model in models:
         yield {
             'model_id': model.id,
             'name': model.name,
@@ -56,48 +116,86 @@ def get_models():
         }
 
 
-def get_assets(date):
-    """Yields dicts describing all assets"""
-    for asset in Asset.objects_dc.filter(
+def get_models_delta(since):
+    """Yields dicts describing models changed since *since* and tombstones
+    of deleted ones (see :mod:`ralph_assets.delta`)"""
+    return iterate_delta(get_changed_model_ids(since), get_models, 'model_id')
+
+
+def get_models_change_token():
+    return get_change_token(*MODEL_MODELS)
+
+
+def get_assets(date, ids=None):
+    """Yields dicts describing all assets (or these with given ids)"""
+    queryset = Asset.objects_dc.filter(
         Q(invoice_date=None) | Q(invoice_date__lte=date),
         part_info=None,
-    ).select_related('model', 'device_info'):
-        if not asset.device_info_id:
-            logger.error('Asset {0} has no device'.format(asset.id))
-            continue
-        if not asset.service_id:
-            logger.error('Asset {0} has no service'.format(asset.id))
-            continue
-        if not asset.device_environment_id:
-            logger.error('Asset {0} has no environment'.format(asset.id))
-            continue
-        if asset.is_liquidated(date):
-            logger.info("Skipping asset {} - it's liquidated")
-            continue
-        device_info = asset.device_info
-        hostname = None
-        if device_info:
-            ralph_device = device_info.get_ralph_device()
-            if ralph_device:
-                hostname = ralph_device.name
-
-        yield {
-            'asset_id': asset.id,
-            'device_id': device_info.ralph_device_id if device_info else None,
-            'asset_name': hostname,
-            'service_id': asset.service_id,
-            'environment_id': asset.device_environment_id,
-            'sn': asset.sn,
-            'barcode': asset.barcode,
-            'warehouse_id': asset.warehouse_id,
-            'cores_count': asset.cores_count,
-            'power_consumption': asset.model.power_consumption,
-            'collocation': asset.model.height_of_device,
-            'depreciation_rate': asset.deprecation_rate,
-            'is_depreciated': asset.is_deprecated(date=date),
-            'price': asset.price,
-            'model_id': asset.model_id,
-        }
+    ).select_related('model', 'device_info')
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    liquidated = get_liquidated_ids(ids, date)
+    for asset in iterate_with_ralph_devices(queryset):
+        asset_info = _get_asset_info(asset, date, liquidated)
+        if asset_info:
+            yield asset_info
+
+
+def get_assets_delta(date, since, previous_date=None, chunk_size=1000):
+    """Yields dicts describing assets at *date* changed since *since* and
+    tombstones of assets not exported anymore - *previous_date* is the date
+    of the export made at *since* (see :mod:`ralph_assets.delta`)"""
+    return iterate_delta(
+        get_changed_asset_ids(since, date, previous_date),
+        lambda ids: get_assets(date, ids),
+        'asset_id',
+        chunk_size,
+    )
+
+
+def get_assets_change_token(date):
+    return '{};{}'.format(
+        get_change_token(*ASSET_MODELS), get_asset_dates_token(date),
+    )
+
+
+def _get_asset_info(asset, date, liquidated):
+    if not asset.device_info_id:
+        logger.error('Asset {0} has no device'.format(asset.id))
+        return
+    if not asset.service_id:
+        logger.error('Asset {0} has no service'.format(asset.id))
+        return
+    if not asset.device_environment_id:
+        logger.error('Asset {0} has no environment'.format(asset.id))
+        return
+    if asset.id in liquidated:
+        logger.info("Skipping asset {} - it's liquidated".format(asset.id))
+        return
+    device_info = asset.device_info
+    hostname = None
+    if device_info:
+        ralph_device = device_info.get_ralph_device()
+        if ralph_device:
+            hostname = ralph_device.name
+
+    return {
+        'asset_id': asset.id,
+        'device_id': device_info.ralph_device_id if device_info else None,
+        'asset_name': hostname,
+        'service_id': asset.service_id,
+        'environment_id': asset.device_environment_id,
+        'sn': asset.sn,
+        'barcode': asset.barcode,
+        'warehouse_id': asset.warehouse_id,
+        'cores_count': asset.cores_count,
+        'power_consumption': asset.model.power_consumption,
+        'collocation': asset.model.height_of_device,
+        'depreciation_rate': asset.deprecation_rate,
+        'is_depreciated': asset.is_deprecated(date=date),
+        'price': asset.price,
+        'model_id': asset.model_id,
+    }
 
 
 class get_supports(DatedGetter):
@@ -114,10 +212,8 @@ class get_supports(DatedGetter):
         'price',
         'date_from',
         'date_to',
-        ('assets', (lambda support: [
-            asset.id for asset in support.assets.all()
-        ]))
     ]
+    prefetch_m2m = {'assets': 'assets'}
 
 
 class get_licences(DatedGetter):
@@ -134,7 +230,6 @@ class get_licences(DatedGetter):
         'price',
         'invoice_date',
         'valid_thru',
-        ('assets', (lambda licence: [
-            asset.id for asset in licence.assets.all()
-        ]))
     ]
+    select_related = ('software_category',)
+    prefetch_m2m = {'assets': 'assets'}
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""In-process index of the asset categories tree.
+
+The whole tree is loaded with one query and every category is mapped to the
+slugs of its subtree, computed from MPTT's ``lft``/``rght`` columns. The
+index is rebuilt after any category is saved or deleted - in other processes
+too: with a cache shared by processes (like memcached or Redis) the index
+version is kept in it, with a cache local to the process (``LocMemCache``,
+Ralph's default, or ``DummyCache``) the version is read from the database
+(count and the latest ``modified`` of categories) every time.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, Max
+
+from ralph_assets.models_assets import AssetCategory
+
+
+VERSION_KEY = 'ralph_assets:category_index_version'
+
+CategoryNode = namedtuple('CategoryNode', [
+    'slug', 'name', 'type', 'parent_id', 'is_blade',
+])
+
+
+class CategoryIndex(object):
+    """Categories tree kept in memory.
+
+    :param categories: iterable of ``(slug, name, type, parent_id, is_blade,
+        tree_id, lft, rght)`` tuples
+    """
+
+    def __init__(self, categories):
+        self.nodes = {}
+        self.subtrees = {}
+        self.by_name = {}
+        rows = sorted(categories, key=lambda row: (row[5], row[6]))
+        for index, row in enumerate(rows):
+            slug, name, type, parent_id, is_blade, tree_id, lft, rght = row
+            node = CategoryNode(slug, name, type, parent_id, is_blade)
+            self.nodes[slug] = node
+            self.by_name.setdefault((name, type), []).append(node)
+            # descendants directly follow their ancestor in (tree, lft) order
+            subtree = [slug]
+            for other in rows[index + 1:]:
+                if other[5] != tree_id or other[6] > rght:
+                    break
+                subtree.append(other[0])
+            self.subtrees[slug] = tuple(subtree)
+
+    @classmethod
+    def load(cls):
+        return cls(AssetCategory.objects.values_list(
+            'slug', 'name', 'type', 'parent_id', 'is_blade', 'tree_id',
+            'lft', 'rght',
+        ))
+
+    def get(self, slug):
+        return self.nodes.get(slug)
+
+    def get_subtree_slugs(self, slug):
+        """Returns slugs of category *slug* and of all its descendants."""
+        return self.subtrees.get(slug, (slug,))
+
+    def get_ancestors(self, slug):
+        """Returns nodes of the ancestors of category *slug*, starting from
+        the root."""
+        ancestors = []
+        node = self.nodes.get(slug)
+        while node and node.parent_id:
+            node = self.nodes.get(node.parent_id)
+            if node:
+                ancestors.append(node)
+        return ancestors[::-1]
+
+    def find(self, name, type):
+        """Returns the category named *name* of *type*, like
+        ``AssetCategory.objects.get(name=name, type=type)`` would."""
+        nodes = self.by_name.get((name, type), [])
+        if not nodes:
+            raise AssetCategory.DoesNotExist(
+                "AssetCategory matching query does not exist.",
+            )
+        if len(nodes) > 1:
+            raise AssetCategory.MultipleObjectsReturned(
+                "get() returned more than one AssetCategory",
+            )
+        return nodes[0]
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def _cache_is_shared():
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def _get_db_version():
+    row = AssetCategory.objects.aggregate(
+        count=Count('pk'), last=Max('modified'),
+    )
+    return (row['count'], row['last'])
+
+
+def _get_version():
+    if not _cache_is_shared():
+        return _get_db_version()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        cache.add(VERSION_KEY, version)
+    return version
+
+
+def get_category_index():
+    """Returns the up to date :class:`CategoryIndex`."""
+    global _index, _index_version
+    version = _get_version()
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = CategoryIndex.load()
+            _index_version = version
+        return _index
+
+
+def invalidate_category_index():
+    global _index
+    with _lock:
+        _index = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000))
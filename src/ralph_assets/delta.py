@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Incremental (delta) exports.
+
+Delta of an export since given time consists of current records of objects
+changed since then and tombstones (``{<id key>: id, 'deleted': True}``) of
+changed objects which aren't exported - deleted (softly or not) or not
+matching the export (anymore). Objects are changed if they were saved (their
+``modified`` is not older than given time) or got history entries - these are
+also written by :func:`log_deletion` for objects removed from the database.
+Bulk updates (``QuerySet.update``, e.g. in ``update_deprecation_dates`` or
+``update_device_locations``) write neither, so their changes are in deltas
+only when they're covered otherwise - like deprecation dates, which are
+compared between export dates.
+
+Deltas should be computed since a :class:`Watermark` returned by
+:func:`get_watermark` at the start of the previous run (a plain datetime is
+accepted too). Rows are stamped before their transactions commit, so rows
+committed after the previous run read them may be stamped earlier than it
+started - changes are read since ``ASSETS_DELTA_OVERLAP`` seconds before the
+watermark (and history entries by ids, newer than the last one seen), so
+some of them are exported twice rather than never.
+
+Values read from Ralph (hostnames, ventures, cores counts) are not tracked
+here - deltas cover changes of assets and their models only.
+
+:func:`get_change_token` is a cheap summary of the state of models - when it's
+the same as at the previous run, a delta would be empty.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Max, Q
+
+from ralph_assets.history.models import History, HistoryArchive
+from ralph_assets.models_assets import (
+    Asset,
+    AssetCategory,
+    AssetManufacturer,
+    AssetModel,
+    Warehouse,
+)
+from ralph_assets.models_dc_assets import DeviceInfo
+
+
+CHUNK_SIZE = 1000
+DELETED_FIELD = 'deleted'
+# models whose objects make values of exported models and assets
+MODEL_MODELS = (AssetModel, AssetCategory, AssetManufacturer)
+ASSET_MODELS = (Asset, DeviceInfo) + MODEL_MODELS
+# models whose objects removed from the database are logged in history
+DELETION_LOGGED_MODELS = ASSET_MODELS + (Warehouse,)
+DELTA_OVERLAP = datetime.timedelta(
+    seconds=getattr(settings, 'ASSETS_DELTA_OVERLAP', 300),
+)
+
+Watermark = namedtuple('Watermark', ['started', 'history_id'])
+
+
+def get_watermark():
+    """Returns :class:`Watermark` of the export starting now - pass it as
+    *since* to deltas of the next run."""
+    return Watermark(
+        datetime.datetime.now(),
+        History.objects.aggregate(last=Max('id'))['last'] or 0,
+    )
+
+
+def _as_watermark(since):
+    if isinstance(since, Watermark):
+        return since
+    return Watermark(since, None)
+
+
+def log_deletion(obj):
+    """Writes history entry of *obj* removed from the database - the same as
+    written when it's softly deleted."""
+    History.objects.log_changes(obj, getattr(obj, 'saving_user', None), [{
+        'field': DELETED_FIELD,
+        'old': False,
+        'new': True,
+    }])
+
+
+def get_changed_ids(model, since):
+    """Returns set of ids of *model* objects saved (deleted included) or
+    with history entries written since *since* (with overlap)."""
+    since = _as_watermark(since)
+    changed_since = since.started - DELTA_OVERLAP
+    content_type = ContentType.objects.get_for_model(model)
+    ids = set(model._base_manager.filter(
+        modified__gte=changed_since,
+    ).values_list('pk', flat=True))
+    new_entries = Q(date__gte=changed_since)
+    if since.history_id is not None:
+        new_entries |= Q(id__gt=since.history_id)
+    for history_model in (History, HistoryArchive):
+        ids.update(history_model.objects.filter(
+            new_entries, content_type=content_type,
+        ).values_list('object_id', flat=True).distinct())
+    return ids
+
+
+def get_changed_model_ids(since):
+    """Returns set of ids of asset models changed since *since* - with their
+    manufacturers or categories."""
+    ids = get_changed_ids(AssetModel, since)
+    ids.update(AssetModel._base_manager.filter(
+        Q(manufacturer__in=get_changed_ids(AssetManufacturer, since)) |
+        Q(category__in=get_changed_ids(AssetCategory, since))
+    ).values_list('pk', flat=True))
+    return ids
+
+
+def get_changed_asset_ids(since, date, previous_date=None):
+    """Returns set of ids of assets which may be exported for *date*
+    differently than they were exported for *previous_date* (date of *since*
+    by default) at *since* - changed (with their models or device info),
+    invoiced or deprecated between these dates."""
+    previous_date = previous_date or _as_watermark(since).started.date()
+    first, last = sorted([previous_date, date])
+    ids = get_changed_ids(Asset, since)
+    ids.update(Asset._base_manager.filter(
+        Q(model__in=get_changed_model_ids(since)) |
+        Q(device_info__in=get_changed_ids(DeviceInfo, since)) |
+        Q(invoice_date__gt=first, invoice_date__lte=last) |
+        Q(
+            effective_deprecation_date__gte=first,
+            effective_deprecation_date__lt=last,
+        )
+    ).values_list('pk', flat=True))
+    return ids
+
+
+def iterate_delta(ids, get_items, key, chunk_size=CHUNK_SIZE):
+    """Yields records returned by ``get_items(ids)`` for chunks of *ids*
+    (with ``deleted`` set to False) and tombstones of ids without records.
+    *key* is the name of id in records."""
+    ids = sorted(ids)
+    for start in xrange(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        missing = set(chunk)
+        for item in get_items(chunk):
+            missing.discard(item[key])
+            item['deleted'] = False
+            yield item
+        for object_id in sorted(missing):
+            yield {key: object_id, 'deleted': True}
+
+
+def get_change_token(*models):
+    """Returns string which changes whenever objects of *models* are saved,
+    deleted or get history entries - with two aggregates (on indexed
+    columns) per model."""
+    parts = []
+    for model in models:
+        content_type = ContentType.objects.get_for_model(model)
+        parts.append(model._base_manager.aggregate(
+            last=Max('modified'),
+        )['last'])
+        parts.append(History.objects.filter(
+            content_type=content_type,
+        ).aggregate(last=Max('date'))['last'])
+    return ';'.join(
+        part.isoformat() if part else '-' for part in parts
+    )
+
+
+def get_asset_dates_token(date):
+    """Returns string which changes whenever any asset gets invoiced or
+    deprecated between *date* and the date it was computed for - completes
+    change token of assets exported for given date."""
+    invoiced = Asset._base_manager.filter(
+        invoice_date__lte=date,
+    ).aggregate(last=Max('invoice_date'))['last']
+    deprecated = Asset._base_manager.filter(
+        effective_deprecation_date__lt=date,
+    ).aggregate(last=Max('effective_deprecation_date'))['last']
+    return ';'.join(
+        part.isoformat() if part else '-' for part in (invoiced, deprecated)
+    )
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Deprecation of many assets at once.
+
+:meth:`Asset.is_deprecated` computes deprecation of a single asset.
+:class:`DeprecationTable` computes it for columns of values read with one
+query (without creating model instances) - deprecation dates are computed
+once per distinct combination of these values and then deprecated-on-date
+flags and remaining values (straight-line depreciation of the price between
+invoice date and deprecation date) are derived from them for all assets.
+Both use :func:`get_deprecation_date`, so their results are the same.
+
+The deprecation date is also stored in ``Asset.effective_deprecation_date``
+(None for assets which are always deprecated), so "deprecated on given date"
+can be filtered in SQL - see :func:`deprecated_on`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Q
+
+
+DEPRECATION_COLUMNS = (
+    'pk', 'invoice_date', 'deprecation_rate', 'deprecation_end_date',
+    'force_deprecation', 'price',
+)
+CENT = decimal.Decimal('0.01')
+UPDATE_CHUNK_SIZE = 1000
+
+
+def get_deprecation_months(deprecation_rate):
+    return int(
+        (1 / (deprecation_rate / 100) * 12)
+        if deprecation_rate else 0
+    )
+
+
+def get_deprecation_date(
+    invoice_date, deprecation_rate, deprecation_end_date, force_deprecation,
+):
+    """Returns date after which the asset is deprecated or None if it's
+    always deprecated (forced or without invoice date)."""
+    if force_deprecation or not invoice_date:
+        return None
+    if deprecation_end_date:
+        return deprecation_end_date
+    return invoice_date + relativedelta(
+        months=get_deprecation_months(deprecation_rate),
+    )
+
+
+def deprecated_on(date):
+    """Q of assets deprecated on *date* (``Asset.is_deprecated(date)``)."""
+    return (
+        Q(effective_deprecation_date=None) |
+        Q(effective_deprecation_date__lt=date)
+    )
+
+
+class DeprecationTable(object):
+    """Deprecation of assets given as rows of :data:`DEPRECATION_COLUMNS`
+    values - kept as lists of columns (in the order of rows)."""
+
+    def __init__(self, rows):
+        columns = zip(*rows) or [()] * len(DEPRECATION_COLUMNS)
+        (
+            self.ids, self.invoice_dates, self.rates, self.end_dates,
+            self.forced, self.prices,
+        ) = [list(column) for column in columns]
+        self.deprecation_dates = self._get_deprecation_dates()
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        return cls(queryset.values_list(*DEPRECATION_COLUMNS))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _get_deprecation_dates(self):
+        computed = {}
+        dates = []
+        for key in zip(
+            self.invoice_dates, self.rates, self.end_dates, self.forced,
+        ):
+            if key not in computed:
+                computed[key] = get_deprecation_date(*key)
+            dates.append(computed[key])
+        return dates
+
+    def get_deprecated(self, date=None):
+        """Returns list of ``is_deprecated(date)`` of assets."""
+        date = date or datetime.date.today()
+        return [
+            deprecation_date is None or deprecation_date < date
+            for deprecation_date in self.deprecation_dates
+        ]
+
+    def get_deprecated_ids(self, date=None):
+        deprecated = self.get_deprecated(date)
+        return [
+            asset_id for asset_id, flag in zip(self.ids, deprecated) if flag
+        ]
+
+    def get_remaining_values(self, date):
+        """Returns list of values of assets at *date* - prices depreciated
+        linearly from invoice date to deprecation date."""
+        values = []
+        for invoice_date, deprecation_date, price in zip(
+            self.invoice_dates, self.deprecation_dates, self.prices,
+        ):
+            price = price or decimal.Decimal(0)
+            if deprecation_date is None or deprecation_date < date:
+                values.append(decimal.Decimal(0).quantize(CENT))
+                continue
+            period = (deprecation_date - invoice_date).days
+            left = (deprecation_date - date).days
+            if period <= 0 or left >= period:
+                values.append(price.quantize(CENT))
+                continue
+            values.append((price * left / period).quantize(CENT))
+        return values
+
+    def get_monthly_values(self, start, months):
+        """Returns (dates, values) - first days of *months* months from the
+        month of *start* and for each of them list of remaining values of
+        assets (see :meth:`get_remaining_values`)."""
+        first_day = start.replace(day=1)
+        dates = [
+            first_day + relativedelta(months=month)
+            for month in xrange(months)
+        ]
+        return dates, [self.get_remaining_values(date) for date in dates]
+
+
+def update_deprecation_dates(assets):
+    """Stores deprecation dates of *assets* (a queryset) computed from their
+    current values - with one update per distinct date in every chunk."""
+    asset_ids = list(assets.order_by('pk').values_list('pk', flat=True))
+    for start in xrange(0, len(asset_ids), UPDATE_CHUNK_SIZE):
+        chunk = assets.filter(
+            pk__in=asset_ids[start:start + UPDATE_CHUNK_SIZE],
+        )
+        table = DeprecationTable.from_queryset(chunk)
+        ids_by_date = {}
+        for asset_id, deprecation_date in zip(
+            table.ids, table.deprecation_dates,
+        ):
+            ids_by_date.setdefault(deprecation_date, []).append(asset_id)
+        for deprecation_date, ids in ids_by_date.iteritems():
+            chunk.filter(pk__in=ids).exclude(
+                effective_deprecation_date=deprecation_date,
+            ).update(effective_deprecation_date=deprecation_date)
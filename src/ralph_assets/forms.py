@@ -115,7 +115,7 @@ asset_search_back_office_fieldsets = lambda: OrderedDict([
             'provider', 'source', 'ralph_device_id', 'request_date_from',
             'request_date_to', 'provider_order_date_from',
             'provider_order_date_to', 'delivery_date_from', 'delivery_date_to',
-            'deprecation_rate',
+            'deprecation_rate', 'deprecation_date_from', 'deprecation_date_to',
         ]
     })
 ])
@@ -150,7 +150,7 @@ asset_search_dc_fieldsets = lambda: OrderedDict([
             'provider', 'source', 'ralph_device_id', 'request_date_from',
             'request_date_to', 'provider_order_date_from',
             'provider_order_date_to', 'delivery_date_from', 'delivery_date_to',
-            'deprecation_rate',
+            'deprecation_rate', 'deprecation_date_from', 'deprecation_date_to',
         ]
     })
 ])
@@ -1679,6 +1679,23 @@ class SearchAssetForm(Form):
                                  ('deprecated', 'Deprecated'), ],
         label=_('Deprecation')
     )
+    deprecation_date_from = DateField(
+        required=False, widget=DateWidget(attrs={
+            'placeholder': _('Start YYYY-MM-DD'),
+            'data-collapsed': True,
+        }),
+        label=_('Deprecation date'),
+        input_formats=RALPH_DATE_FORMAT_LIST,
+    )
+    deprecation_date_to = DateField(
+        required=False, widget=DateWidget(attrs={
+            'class': 'end-date-field ',
+            'placeholder': _('End YYYY-MM-DD'),
+            'data-collapsed': True,
+        }),
+        label='',
+        input_formats=RALPH_DATE_FORMAT_LIST,
+    )
     invoice_date_from = DateField(
         required=False, widget=DateWidget(attrs={
             'placeholder': _('Start YYYY-MM-DD'),
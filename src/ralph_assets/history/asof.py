@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Field values of objects at a point in time.
+
+Values are rebuilt from the current state of objects: history entries
+written after given time are replayed from the newest to the oldest one and
+each of them restores its ``old_value`` - with one history query per batch of
+objects. Current values are formatted like history entries are written (see
+:func:`ralph_assets.history.utils.format_history_value`), so both have the
+same form.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import itertools
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.fields.related import RelatedField
+
+from ralph_assets.history.models import (
+    DEFAULT_HISTORY_FIELD_EXCLUDE,
+    History,
+    HistoryArchive,
+)
+from ralph_assets.history.utils import format_history_value
+
+
+BATCH_SIZE = 1000
+
+
+def get_history_fields(model):
+    """Returns fields of *model* tracked by history."""
+    exclude = getattr(
+        model, 'exclude_fields_from_history', DEFAULT_HISTORY_FIELD_EXCLUDE,
+    )
+    return [
+        field for field in model._meta.fields
+        if field.name not in exclude and not field.primary_key
+    ]
+
+
+def _get_current_values(rows, fields):
+    """Returns {pk: {field name: value}} of *rows* (dicts of attnames) in the
+    form used by history - related objects of all rows are loaded at once."""
+    related = {}
+    for field in fields:
+        if isinstance(field, RelatedField):
+            related[field.name] = field.rel.to._base_manager.in_bulk(set(
+                row[field.attname] for row in rows
+                if row[field.attname] is not None
+            ))
+    values = {}
+    for row in rows:
+        obj_values = {}
+        for field in fields:
+            value = row[field.attname]
+            if field.name in related:
+                value = related[field.name].get(value)
+            obj_values[field.name] = format_history_value(field, value)
+        values[row['pk']] = obj_values
+    return values
+
+
+def _get_changes_after(content_type, object_ids, field_names, date):
+    """Returns history entries (archived included) of objects written after
+    *date*, the newest first."""
+    entries = itertools.chain.from_iterable(
+        model.objects.filter(
+            content_type=content_type,
+            object_id__in=object_ids,
+            field_name__in=field_names,
+            date__gt=date,
+        ).values_list('date', 'id', 'object_id', 'field_name', 'old_value')
+        for model in (History, HistoryArchive)
+    )
+    return sorted(entries, reverse=True)
+
+
+def get_values_as_of(queryset, date, fields=None, batch_size=BATCH_SIZE):
+    """Yields dicts with ``id`` and values of *fields* (names, all fields
+    tracked by history by default) of objects from *queryset* as they were at
+    *date*, in order of primary keys.
+    """
+    model = queryset.model
+    content_type = ContentType.objects.get_for_model(model)
+    history_fields = get_history_fields(model)
+    if fields is not None:
+        history_fields = [
+            field for field in history_fields if field.name in fields
+        ]
+    field_names = [field.name for field in history_fields]
+    queryset = queryset.order_by('pk').values(
+        'pk', *[field.attname for field in history_fields]
+    )
+    last_pk = None
+    while True:
+        batch = queryset
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1]['pk']
+        values = _get_current_values(rows, history_fields)
+        changes = _get_changes_after(
+            content_type, list(values), field_names, date,
+        )
+        for _, _, object_id, field_name, old_value in changes:
+            values[object_id][field_name] = old_value
+        for row in rows:
+            obj_values = values[row['pk']]
+            obj_values['id'] = row['pk']
+            yield obj_values
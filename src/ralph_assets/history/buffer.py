@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Buffered writing of history entries.
+
+Inside :class:`buffered_history` block (a context manager or a decorator)
+history entries are collected instead of being inserted one object at a
+time. They are written with a single ``bulk_create`` when the outermost
+block ends and dropped when it raises.
+
+The outermost block runs in a transaction - it joins the current one when
+transaction is already managed (like ``nested_commit_on_success``) or
+commits its own. Entries are written in this transaction, so they are
+rolled back with the changes. Only when the block commits its own
+transaction and ``ASSETS_HISTORY_FLUSH_QUEUE`` names an rq queue, writing
+is handed off to a worker - after the commit, so the worker never writes
+history of changes which were rolled back (or aren't visible yet).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import functools
+import sys
+import threading
+
+import django_rq
+from django.conf import settings
+from django.db import transaction
+
+from ralph_assets.history.cache import (
+    invalidate_pending_recent_history,
+    invalidate_recent_history,
+)
+
+
+HISTORY_FLUSH_QUEUE = getattr(settings, 'ASSETS_HISTORY_FLUSH_QUEUE', None)
+# attributes of entries passed to workers
+QUEUED_FIELDS = (
+    'date', 'user_id', 'content_type_id', 'object_id', 'field_name',
+    'old_value', 'new_value',
+)
+# rows per INSERT (Django 1.4 ``bulk_create`` doesn't split big lists)
+WRITE_BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+def get_history_buffer():
+    """Returns list collecting history entries or None outside of
+    :class:`buffered_history` block."""
+    return getattr(_local, 'buffer', None)
+
+
+def write_history(entries):
+    """Inserts unsaved ``History`` *entries* in batches."""
+    from ralph_assets.history.models import History
+    for start in xrange(0, len(entries), WRITE_BATCH_SIZE):
+        History.objects.bulk_create(entries[start:start + WRITE_BATCH_SIZE])
+    invalidate_recent_history(
+        (entry.content_type_id, entry.object_id) for entry in entries
+    )
+
+
+def write_history_rows(rows):
+    """Inserts history entries with attributes from *rows* (dicts) - job of
+    the flush queue."""
+    from ralph_assets.history.models import History
+    write_history([History(**row) for row in rows])
+
+
+def enqueue_history(entries):
+    """Hands writing of unsaved *entries* off to the flush queue."""
+    if not entries:
+        return
+    django_rq.get_queue(HISTORY_FLUSH_QUEUE).enqueue(
+        write_history_rows,
+        [
+            dict((name, getattr(entry, name)) for name in QUEUED_FIELDS)
+            for entry in entries
+        ],
+    )
+
+
+class buffered_history(object):
+    """Collects history entries written inside the block (run in a
+    transaction), e.g.::
+
+        with buffered_history():
+            for asset in assets:
+                asset.save()
+
+    or ``@buffered_history()`` as a decorator. Nested blocks join the
+    outermost one.
+    """
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with buffered_history():
+                return func(*args, **kwargs)
+        return inner
+
+    def __enter__(self):
+        self.outermost = get_history_buffer() is None
+        if self.outermost:
+            _local.buffer = []
+            self.transaction = None
+            if not transaction.is_managed():
+                self.transaction = transaction.commit_on_success()
+                self.transaction.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.outermost:
+            return False
+        entries = _local.buffer
+        _local.buffer = None
+        queued = bool(HISTORY_FLUSH_QUEUE and self.transaction)
+        try:
+            if exc_type is None and entries and not queued:
+                write_history(entries)
+        except Exception:
+            if self.transaction is not None:
+                self.transaction.__exit__(*sys.exc_info())
+                invalidate_pending_recent_history()
+            raise
+        if self.transaction is not None:
+            self.transaction.__exit__(exc_type, exc_value, traceback)
+            invalidate_pending_recent_history()
+            if exc_type is None and queued:
+                enqueue_history(entries)
+        return False
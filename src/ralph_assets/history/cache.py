@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Opt-in cache of the latest history entries of objects (shown by
+``short_history`` and ``status_history`` template tags on edit pages).
+
+Entries of an object are kept under one key, deleted every time history
+entries of the object are written (or archived) - after they're committed,
+so other processes can't cache the entries from before. Inside of managed
+transactions keys are deleted when the request finishes (or when
+``buffered_history`` block commits its transaction). Rendered HTML isn't
+cached - it shows dates relative to now.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+
+
+_local = threading.local()
+
+
+def get_cache_timeout():
+    """Returns timeout (in seconds) of cached entries; 0 disables cache."""
+    return getattr(settings, 'ASSETS_HISTORY_CACHE_TIMEOUT', 0)
+
+
+def get_cache_key(content_type_id, object_id):
+    return 'ralph_assets:recent_history:{}:{}'.format(
+        content_type_id, object_id,
+    )
+
+
+def get_recent_history(obj, field_name=None, limit=5):
+    """Returns list of at most *limit* latest history entries of *obj* (of
+    *field_name* only, if given)."""
+    from ralph_assets.history.models import History
+    content_type = ContentType.objects.get_for_model(obj.__class__)
+
+    def compute():
+        history = History.objects.filter(
+            content_type=content_type, object_id=obj.pk,
+        )
+        if field_name:
+            history = history.filter(field_name=field_name)
+        return list(
+            history.select_related('user').order_by('-date', '-id')[:limit]
+        )
+
+    timeout = get_cache_timeout()
+    if not timeout:
+        return compute()
+    key = get_cache_key(content_type.id, obj.pk)
+    cached = cache.get(key) or {}
+    entries = cached.get((field_name, limit))
+    if entries is None:
+        entries = compute()
+        cached[field_name, limit] = entries
+        cache.set(key, cached, timeout)
+    return entries
+
+
+def invalidate_recent_history(objects):
+    """Drops cached entries of *objects* - (content type id, object id)
+    pairs - now or, inside of managed transaction, after it's committed."""
+    if not get_cache_timeout():
+        return
+    keys = set(
+        get_cache_key(content_type_id, object_id)
+        for content_type_id, object_id in objects
+    )
+    if transaction.is_managed():
+        pending = getattr(_local, 'pending', None)
+        if pending is None:
+            pending = _local.pending = set()
+        pending.update(keys)
+    else:
+        cache.delete_many(list(keys))
+
+
+def invalidate_pending_recent_history():
+    """Drops cached entries of objects whose history was written inside of
+    transactions, which are committed (or rolled back) by now."""
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    if pending:
+        cache.delete_many(list(pending))
@@ -10,19 +10,20 @@ from collections import namedtuple
 
 from datetime import datetime
 
-from django.db import models
-from django.core import serializers
+from django.db import connections, models
 from django.core.urlresolvers import reverse
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.generic import GenericForeignKey
 from django.utils.translation import ugettext_lazy as _
 
+from ralph_assets.history.buffer import buffered_history, get_history_buffer
+from ralph_assets.history.cache import invalidate_recent_history
+
 
 DEFAULT_HISTORY_FIELD_EXCLUDE = ('created', 'modified', 'invoice_date',
                                  'cache_version', 'rght', 'level', 'lft',
-                                 'tree_id', 'loan_end_date')
-
-serializer = serializers.get_serializer("python")()
+                                 'tree_id', 'loan_end_date',
+                                 'effective_deprecation_date')
 
 Snapshot = namedtuple(
     'Snapshot',
@@ -31,13 +32,16 @@ Snapshot = namedtuple(
 
 
 class HistoryManager(models.Manager):
-    def get_history_for_this_object(self, obj, field_name=None):
+    def get_history_for_this_object(
+        self, obj, field_name=None, include_archive=False,
+    ):
         if not obj:
             return
         content_type = ContentType.objects.get_for_model(obj.__class__)
         kwargs = {
             'content_type': content_type,
             'object_id': obj.id,
+            'include_archive': include_archive,
         }
         if field_name:
             kwargs.update({
@@ -46,13 +50,24 @@ class HistoryManager(models.Manager):
         return self.get_history_for_this_content_type(**kwargs)
 
     def get_history_for_this_content_type(
-        self, content_type, object_id, **kwargs
+        self, content_type, object_id, include_archive=False, **kwargs
     ):
-        return self.model.objects.filter(
+        """Returns queryset of history entries of the object - or, with
+        *include_archive*, :class:`MergedHistory` of entries and archived
+        ones (newest first)."""
+        history = self.model.objects.filter(
+            content_type=content_type,
+            object_id=object_id,
+            **kwargs
+        )
+        if not include_archive:
+            return history
+        archived = HistoryArchive.objects.filter(
             content_type=content_type,
             object_id=object_id,
             **kwargs
         )
+        return MergedHistory(history, archived)
 
     def log_changes(self, obj, user, diff_data):
         if not obj:
@@ -71,10 +86,15 @@ class HistoryManager(models.Manager):
                     new_value=data['new'] if data['new'] else '-',
                 )
             )
-        self.model.objects.bulk_create(changed_items)
+        history_buffer = get_history_buffer()
+        if history_buffer is not None:
+            history_buffer.extend(changed_items)
+        else:
+            self.model.objects.bulk_create(changed_items)
+            invalidate_recent_history([(content_type.id, obj.id)])
 
 
-class History(models.Model):
+class AbstractHistory(models.Model):
     date = models.DateTimeField(verbose_name=_('date'), default=datetime.now)
     user = models.ForeignKey(
         'auth.User', verbose_name=_('user'), null=True,
@@ -82,16 +102,13 @@ class History(models.Model):
     )
     content_type = models.ForeignKey(ContentType)
     object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey('content_type', 'object_id')
     field_name = models.CharField(max_length=64, default='')
     old_value = models.TextField(default='')
     new_value = models.TextField(default='')
-    objects = HistoryManager()
 
     class Meta:
+        abstract = True
         app_label = 'ralph_assets'
-        verbose_name = _('history change')
-        verbose_name_plural = _('history changes')
         ordering = ('-date',)
 
     def __unicode__(self):
@@ -112,6 +129,158 @@ class History(models.Model):
         })
 
 
+class History(AbstractHistory):
+    # (content_type, object_id, field_name, date) index is created in
+    # migration, Django 1.4 can't declare composite indexes
+    content_object = GenericForeignKey('content_type', 'object_id')
+    objects = HistoryManager()
+
+    class Meta(AbstractHistory.Meta):
+        verbose_name = _('history change')
+        verbose_name_plural = _('history changes')
+
+
+class HistoryArchive(AbstractHistory):
+    """History entries moved out of :class:`History` by
+    ``archive_history`` command."""
+
+    class Meta(AbstractHistory.Meta):
+        verbose_name = _('archived history change')
+        verbose_name_plural = _('archived history changes')
+
+
+class MergedHistory(object):
+    """History entries and archived entries (newest first), merged with
+    ``UNION`` in SQL - so they can be counted and sliced by paginators
+    without reading all of them."""
+
+    def __init__(self, history, archived):
+        self.querysets = (history, archived)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if key.step is not None:
+            raise ValueError('Step is not supported')
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        if stop <= start:
+            return []
+        rows = self._get_rows(start, stop - start)
+        entries = [
+            queryset.select_related('user').in_bulk([
+                entry_id for source, entry_id in rows if source == index
+            ])
+            for index, queryset in enumerate(self.querysets)
+        ]
+        return [entries[source][entry_id] for source, entry_id in rows]
+
+    def _get_rows(self, offset, limit):
+        """Returns list of (index of queryset, id) of entries."""
+        connection = connections[self.querysets[0].db]
+        qn = connection.ops.quote_name
+        parts, params = [], []
+        for index, queryset in enumerate(self.querysets):
+            sql, sql_params = queryset.order_by().extra(
+                select={'source': unicode(index)},
+            ).values_list('source', 'id', 'date').query.sql_with_params()
+            parts.append(sql)
+            params.extend(sql_params)
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT {source}, {id} FROM ({union}) AS merged '
+            'ORDER BY {date} DESC, {id} DESC LIMIT %s OFFSET %s'.format(
+                union=' UNION ALL '.join(parts),
+                source=qn('source'), id=qn('id'), date=qn('date'),
+            ),
+            params + [limit, offset],
+        )
+        return [(int(source), entry_id) for source, entry_id in cursor]
+
+
+def _get_latest_values(history_model, content_type, ids, field_name):
+    latest_ids = history_model.objects.filter(
+        content_type=content_type,
+        object_id__in=ids,
+        field_name=field_name,
+    ).order_by().values('object_id').annotate(
+        latest_id=models.Max('id'),
+    ).values_list('latest_id', flat=True)
+    return dict(
+        history_model.objects.filter(id__in=list(latest_ids)).values_list(
+            'object_id', 'new_value',
+        )
+    )
+
+
+def get_previous_m2m_values(objs, field_name):
+    """Returns dict of pks lists saved in the latest history entries of m2m
+    *field_name* of *objs* (all of the same model) - entries waiting in the
+    history buffer included, archived entries used for objects without
+    newer ones."""
+    if not objs:
+        return {}
+    content_type = ContentType.objects.get_for_model(objs[0].__class__)
+    ids = set(obj.pk for obj in objs)
+    values = _get_latest_values(History, content_type, ids, field_name)
+    archived_ids = ids.difference(values)
+    if archived_ids:
+        values.update(_get_latest_values(
+            HistoryArchive, content_type, archived_ids, field_name,
+        ))
+    for entry in get_history_buffer() or ():
+        if (
+            entry.content_type_id == content_type.id and
+            entry.object_id in ids and
+            entry.field_name == field_name
+        ):
+            values[entry.object_id] = entry.new_value
+    return dict(
+        (object_id, json.loads(value) if value and value != '-' else [])
+        for object_id, value in values.iteritems()
+    )
+
+
+def get_current_m2m_values(objs, field_name):
+    """Returns dict of pks lists of objects related to *objs* (all of the
+    same model) by m2m *field_name*, read in one query."""
+    field = objs[0]._meta.get_field(field_name)
+    lookup = field.related_query_name()
+    rows = field.rel.to._default_manager.filter(**{
+        '{}__in'.format(lookup): [obj.pk for obj in objs],
+    }).values_list(lookup, 'pk')
+    values = {}
+    for obj_pk, related_pk in rows:
+        values.setdefault(obj_pk, []).append(related_pk)
+    return values
+
+
+_tracked_attnames = {}
+
+
+def get_tracked_attnames(model):
+    """Returns attnames of *model* fields registered for history."""
+    attnames = _tracked_attnames.get(model)
+    if attnames is None:
+        from ralph_assets.history import registry
+        if model not in registry:
+            return ()
+        attnames = _tracked_attnames[model] = tuple(
+            field.attname for field in model._meta.fields
+            if field.name in registry[model]
+        )
+    return attnames
+
+
 class HistoryMixin(object):
     """Django's raw m2m_change signal sucks when working with forms."""
 
@@ -127,23 +296,44 @@ class HistoryMixin(object):
             register(self.__class__, exclude=exclude)
             for field in self._meta.get_all_related_many_to_many_objects():
                 register(field.field.rel.through, m2m=True)
+        self.remember_history_values()
+
+    def remember_history_values(self):
+        """Keep values of tracked fields the object was loaded (or last
+        saved) with - history of the next save is computed against them,
+        without reading the object from the database again."""
+        values = self.__dict__
+        self._history_values = dict(
+            (attname, values[attname])
+            for attname in get_tracked_attnames(self.__class__)
+            if attname in values
+        )
+
+    def get_history_original(self):
+        """Returns unsaved copy of the object with remembered values of
+        loaded tracked fields (other fields keep their defaults)."""
+        values = self._history_values
+        return self.__class__(**dict(
+            (field.attname, values[field.attname])
+            for field in self._meta.fields if field.attname in values
+        ))
 
-    def get_history(self, field_name=None):
+    def get_history(self, field_name=None, include_archive=False):
         return History.objects.get_history_for_this_object(
             obj=self,
             field_name=field_name,
+            include_archive=include_archive,
         )
 
-    def get_snapshot(self, obj, manager, field_name):
-        """Method returns snapshot from current state of object."""
-        snapshot = serializer.serialize(manager.all(), fields=())
-        try:
-            history = obj.get_history(field_name=field_name)[0]
-        except (IndexError, AttributeError):
-            history = None
-        previous = getattr(history, 'new_value', None)
-        previous = previous and json.loads(previous) or []
-        current = [s['pk'] for s in snapshot]
+    def get_snapshot(self, obj, manager, field_name, previous=None):
+        """Method returns snapshot from current state of object (compared
+        with *previous* list of pks, read from the latest history entry if
+        not given)."""
+        current = list(manager.values_list('pk', flat=True))
+        if previous is None:
+            previous = get_previous_m2m_values([obj], field_name).get(
+                obj.pk, [],
+            )
         deleted = set(previous) - set(current)
         added = set(current) - set(previous)
         changed = not set(current) == set(previous)
@@ -164,10 +354,27 @@ class HistoryMixin(object):
             )
 
     def _save_related_objects_history(self, manager, related_pks, field_name):
-        for obj in manager.filter(pk__in=related_pks):
-            manager = getattr(obj, field_name)
-            snapshot = self.get_snapshot(obj, manager, field_name)
-            self.save_history_from_snapshot(snapshot)
+        """Save history of m2m *field_name* of many related objects - with
+        one query for current and one for previous values of all of them."""
+        objs = list(manager.filter(pk__in=related_pks))
+        if not objs:
+            return
+        current = get_current_m2m_values(objs, field_name)
+        previous = get_previous_m2m_values(objs, field_name)
+        with buffered_history():
+            for obj in objs:
+                obj_previous = previous.get(obj.pk, [])
+                obj_current = current.get(obj.pk, [])
+                snapshot = Snapshot(
+                    obj_current,
+                    obj_previous,
+                    set(obj_current) - set(obj_previous),
+                    set(obj_previous) - set(obj_current),
+                    set(obj_current) != set(obj_previous),
+                    obj,
+                    field_name,
+                )
+                self.save_history_from_snapshot(snapshot)
 
     def save_reverse_relation_history(self):
         """Save history to related objects reverse."""
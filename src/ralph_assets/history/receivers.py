@@ -13,8 +13,8 @@ def pre_save(sender, instance, **kwargs):
     instance._history_context.start(sender, instance)
 
 
-def post_save(sender, instance, **kwargs):
-    instance._history_context.end()
+def post_save(sender, instance, created=False, **kwargs):
+    instance._history_context.end(created)
 
 
 def m2m_changed(sender, instance, action, reverse, **kwargs):
@@ -12,6 +12,19 @@ from django.db.models.fields.related import RelatedField
 from ralph_assets.history.models import History
 
 
+def format_history_value(field, value):
+    """Returns *value* of *field* in the form stored in history - text of
+    related object (``None`` when it's not set), label of choice or text of
+    the value, ``-`` for empty values."""
+    if isinstance(field, RelatedField):
+        return unicode(value)
+    if field.choices:
+        value = dict(field.flatchoices).get(value)
+    if not value:
+        return '-'
+    return unicode(value)
+
+
 def field_changes(instance, ignore=('id', 'ralph_device_id')):
     """Yield the name, original value and new value for each changed field.
     Skip all insignificant fields and those passed in ``ignore``.
@@ -104,17 +117,40 @@ class HistoryContext(object):
         from ralph_assets.history import registry
         return registry
 
-    def pre_save(self):
+    def get_loaded_fields(self):
+        """Tracked fields which were loaded with the object (deferred ones
+        have no remembered values)."""
+        original = self.obj._history_values
+        fields = self.registry.get(self.model, ())
+        return [
+            field for field in self.obj._meta.fields
+            if field.name in fields and field.attname in original
+        ]
+
+    def load_previous(self):
+        """Compares the object with values it was loaded with, instead of
+        reading it from the database - the previous version is rebuilt only
+        if any tracked field has changed."""
         self.pre_obj = None
-        try:
-            self.pre_obj = self.model._default_manager.get(pk=self.obj.pk)
-        except self.model.DoesNotExist:
+        original = self.obj._history_values
+        loaded_fields = self.get_loaded_fields()
+        if all(
+            unicode(original[field.attname]) ==
+            unicode(getattr(self.obj, field.attname))
+            for field in loaded_fields
+        ):
             return
-        self.past_snapshot = self.get_fields_snapshot(
-            [self.pre_obj]
-        )[0]['fields']
+        self.pre_obj = self.obj.get_history_original()
+        past_snapshot = self.get_fields_snapshot([self.pre_obj])[0]['fields']
+        self.past_snapshot = dict(
+            (field.name, past_snapshot[field.name])
+            for field in loaded_fields if field.name in past_snapshot
+        )
 
-    def post_save(self):
+    def post_save(self, created=False):
+        if created:
+            return
+        self.load_previous()
         if not self.pre_obj:
             return
         current_snapshot = self.get_fields_snapshot([self.obj])[0]['fields']
@@ -130,13 +166,11 @@ class HistoryContext(object):
             old_field = self.pre_obj._meta.get_field_by_name(field)[0]
             new_field = self.obj._meta.get_field_by_name(field)[0]
             if isinstance(new_field, RelatedField):
-                old_value = str(getattr(self.pre_obj, field))
-                new_value = str(getattr(self.obj, field))
+                old_value = getattr(self.pre_obj, field)
+                new_value = getattr(self.obj, field)
             elif hasattr(old_field, 'choices') and old_field.choices:
                 if int(old_value) == int(new_value):
                     continue
-                old_value = get_choices(self.pre_obj, field, old_value)
-                new_value = get_choices(self.obj, field, new_value)
             elif hasattr(self.obj, 'get_{}_display'.format(field)):
                 old_value = getattr(
                     self.pre_obj, 'get_{}_display'.format(field)
@@ -144,7 +178,8 @@ class HistoryContext(object):
                 new_value = getattr(
                     self.obj, 'get_{}_display'.format(field)
                 )()
-
+            old_value = format_history_value(old_field, old_value)
+            new_value = format_history_value(new_field, new_value)
             if old_value != new_value:
                 diff_data.append(
                     {
@@ -161,10 +196,10 @@ class HistoryContext(object):
         self.obj = obj
         self.model = self.obj.__class__
         self.sender = sender
-        self.pre_save()
 
-    def end(self):
-        self.post_save()
+    def end(self, created=False):
+        self.post_save(created)
+        self.obj.remember_history_values()
         self.obj = None
         self.sender = None
         self.reverse = False
@@ -43,28 +43,32 @@ class HistoryListForModel(PaginateMixin, ContentTypeMixin, HistoryBase):
 
     def dispatch(self, request, *args, **kwargs):
         self.status = bool(request.GET.get('status', ''))
+        self.archive = bool(request.GET.get('archive', ''))
         return super(HistoryListForModel, self).dispatch(
             request, *args, **kwargs
         )
 
     def get_paginate_queryset(self):
-        history = History.objects.get_history_for_this_content_type(
-            content_type=self.content_type,
-            object_id=self.object_id,
-        )
         self.show_status_button = True
         try:
             self.model._meta.get_field_by_name('status')
         except FieldDoesNotExist:
             self.show_status_button = False
+        kwargs = {}
         if self.status and self.show_status_button:
-            history = history.filter(field_name__exact='status')
-        return history
+            kwargs['field_name__exact'] = 'status'
+        return History.objects.get_history_for_this_content_type(
+            content_type=self.content_type,
+            object_id=self.object_id,
+            include_archive=self.archive,
+            **kwargs
+        )
 
     def get_context_data(self, **kwargs):
         context = super(HistoryListForModel, self).get_context_data(**kwargs)
         context.update({
             'status': self.status,
+            'archive': self.archive,
             'show_status_button': self.show_status_button,
         })
         return context
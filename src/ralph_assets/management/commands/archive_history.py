@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import textwrap
+from optparse import make_option
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ralph_assets.history.cache import invalidate_recent_history
+from ralph_assets.history.models import History, HistoryArchive
+
+
+ARCHIVE_FIELDS = (
+    'id', 'date', 'user', 'content_type', 'object_id', 'field_name',
+    'old_value', 'new_value',
+)
+
+
+class Command(BaseCommand):
+    """Move history entries older than given number of months to the
+    archive table (they are still shown in full history of objects)."""
+    help = textwrap.dedent(__doc__).strip()
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--months',
+            type='int',
+            dest='months',
+            default=getattr(settings, 'ASSETS_HISTORY_ARCHIVE_MONTHS', 24),
+            help="Archive entries older than this number of months",
+        ),
+        make_option(
+            '--batch-size',
+            type='int',
+            dest='batch_size',
+            default=1000,
+            help="Number of entries moved in one transaction",
+        ),
+    )
+
+    def handle(self, *args, **options):
+        cutoff = datetime.datetime.now() - relativedelta(
+            months=options['months'],
+        )
+        moved = 0
+        while True:
+            with transaction.commit_on_success():
+                rows = list(
+                    History.objects.filter(date__lt=cutoff).order_by(
+                        'id',
+                    ).values(*ARCHIVE_FIELDS)[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                objects = [
+                    (row['content_type'], row['object_id']) for row in rows
+                ]
+                HistoryArchive.objects.bulk_create([
+                    HistoryArchive(
+                        user_id=row.pop('user'),
+                        content_type_id=row.pop('content_type'),
+                        **row
+                    )
+                    for row in rows
+                ])
+                History.objects.filter(
+                    id__in=[row['id'] for row in rows],
+                ).delete()
+            invalidate_recent_history(objects)
+            moved += len(rows)
+        self.stdout.write(
+            'Archived {} history entries older than {}.\n'.format(
+                moved, cutoff.date(),
+            )
+        )
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import csv
+import datetime
+import textwrap
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import smart_str
+
+from ralph_assets.history.asof import get_history_fields, get_values_as_of
+from ralph_assets.models_assets import Asset
+
+
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+
+def parse_date(value):
+    """Parses *value* to datetime - the end of the day if only date is
+    given."""
+    for date_format in DATE_FORMATS:
+        try:
+            date = datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        if date_format == '%Y-%m-%d':
+            date = datetime.datetime.combine(date, datetime.time.max)
+        return date
+    raise CommandError('Invalid date: {}'.format(value))
+
+
+class Command(BaseCommand):
+    """Export CSV snapshot of assets as they were at given date (YYYY-MM-DD
+    or YYYY-MM-DD HH:MM[:SS]) - rebuilt from their history."""
+    help = textwrap.dedent(__doc__).strip()
+    args = '<date>'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--filter',
+            type="choice",
+            dest='filter_type',
+            choices=["all", "dc", "back_office"],
+            default="all",
+            help="Filter items, all, dc, back_office",
+        ),
+        make_option(
+            '--output',
+            dest='output',
+            default=None,
+            help="Write CSV to this file instead of standard output",
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Date argument is required.')
+        date = parse_date(args[0])
+        managers = {
+            'all': Asset.admin_objects,
+            'dc': Asset.admin_objects_dc,
+            'back_office': Asset.admin_objects_bo,
+        }
+        assets = managers[options['filter_type']].filter(created__lte=date)
+        header = ['id'] + [field.name for field in get_history_fields(Asset)]
+        output = open(options['output'], 'wb') if options['output'] else None
+        try:
+            writer = csv.writer(output or self.stdout)
+            writer.writerow(header)
+            for values in get_values_as_of(assets, date):
+                writer.writerow([smart_str(values[name]) for name in header])
+        finally:
+            if output:
+                output.close()
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import textwrap
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ralph_assets.deprecation import update_deprecation_dates
+from ralph_assets.models_assets import Asset
+
+
+class Command(BaseCommand):
+    """Recompute stored deprecation dates of all assets (use it after
+    changing deprecation fields with bulk updates, which skip ``save``)."""
+    help = textwrap.dedent(__doc__).strip()
+
+    def handle(self, *args, **options):
+        with transaction.commit_on_success():
+            update_deprecation_dates(Asset.admin_objects.all())
+        self.stdout.write('Rebuilt deprecation dates of {} assets.\n'.format(
+            Asset.admin_objects.count(),
+        ))
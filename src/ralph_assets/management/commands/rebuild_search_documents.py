@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import textwrap
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ralph_assets.models_assets import Asset
+from ralph_assets.models_search import (
+    UPDATE_CHUNK_SIZE,
+    update_search_documents,
+)
+
+
+class Command(BaseCommand):
+    """Rebuild search documents of all assets (use it after turning
+    ASSETS_SEARCH_DOCUMENTS on)."""
+    help = textwrap.dedent(__doc__).strip()
+
+    def handle(self, *args, **options):
+        asset_ids = list(
+            Asset.admin_objects.order_by('pk').values_list('pk', flat=True)
+        )
+        for start in xrange(0, len(asset_ids), UPDATE_CHUNK_SIZE):
+            with transaction.commit_on_success():
+                update_search_documents(
+                    asset_ids[start:start + UPDATE_CHUNK_SIZE],
+                )
+        self.stdout.write('Rebuilt search documents of {} assets.\n'.format(
+            len(asset_ids),
+        ))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import textwrap
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ralph_assets.models_assets import Asset
+from ralph_assets.models_status import (
+    UPDATE_CHUNK_SIZE,
+    rebuild_status_intervals,
+)
+
+
+class Command(BaseCommand):
+    """Rebuild periods of asset statuses from history of status changes (run
+    it once after migrating - until then, periods of each asset are rebuilt
+    at its first save and its liquidation is read from history)."""
+    help = textwrap.dedent(__doc__).strip()
+
+    def handle(self, *args, **options):
+        asset_ids = list(
+            Asset.admin_objects.order_by('pk').values_list('pk', flat=True)
+        )
+        for start in xrange(0, len(asset_ids), UPDATE_CHUNK_SIZE):
+            with transaction.commit_on_success():
+                rebuild_status_intervals(
+                    asset_ids[start:start + UPDATE_CHUNK_SIZE],
+                )
+        self.stdout.write('Rebuilt status intervals of {} assets.\n'.format(
+            len(asset_ids),
+        ))
@@ -42,6 +42,8 @@ from ralph_assets.licences.models import (
     LicenceType,
     SoftwareCategory,
 )
+from ralph_assets.models_search import AssetNgram, AssetSearchDocument
+from ralph_assets.models_status import AssetStatusInterval
 from ralph_assets.models_support import Support
 from ralph_assets.models_transition import (
     Action,
@@ -485,9 +487,12 @@ __all__ = [
     'AssetCategoryType',
     'AssetManufacturer',
     'AssetModel',
+    'AssetNgram',
     'AssetOwner',
+    'AssetSearchDocument',
     'AssetSource',
     'AssetStatus',
+    'AssetStatusInterval',
     'AssetType',
     'BOAssetModelLookup',
     'BODeviceLookup',
@@ -12,8 +12,6 @@ import datetime
 import logging
 import os
 
-from dateutil.relativedelta import relativedelta
-
 from dj.choices import Country
 from django.contrib.auth.models import User
 from lck.django.choices import Choices
@@ -51,10 +49,15 @@ from ralph.discovery.models_util import SavingUser
 from ralph_assets.history.models import HistoryMixin
 from ralph_assets.history.utils import field_changes
 from ralph.util.models import SyncFieldMixin
+from ralph_assets.deprecation import (
+    get_deprecation_date,
+    get_deprecation_months,
+)
 from ralph_assets.models_util import (
     Regionalized,
     RegionalizedDBManager,
     WithForm,
+    iterate_chunks,
 )
 from ralph_assets.utils import iso2_to_iso3
 from ralph_assets.models_dc_assets import (  # noqa
@@ -574,6 +577,10 @@ class Asset(
         'Check if you no longer want to bill for this asset'
     ))
     deprecation_end_date = models.DateField(null=True, blank=True)
+    # computed on save, None when the asset is always deprecated
+    effective_deprecation_date = models.DateField(
+        null=True, blank=True, db_index=True, editable=False,
+    )
     production_year = models.PositiveSmallIntegerField(null=True, blank=True)
     slots = models.FloatField(
         verbose_name='Slots',
@@ -725,14 +732,9 @@ class Asset(
                     self.generate_hostname(commit, template_vars)
 
     def get_ralph_device(self):
-        if not self.device_info or not self.device_info.ralph_device_id:
-            return None
-        try:
-            return Device.objects.get(
-                pk=self.device_info.ralph_device_id,
-            )
-        except Device.DoesNotExist:
+        if not self.device_info:
             return None
+        return self.device_info.get_ralph_device()
 
     def get_synced_objs_and_fields(self):
         # Implementation of the abstract method from SyncFieldMixin.
@@ -782,6 +784,7 @@ class Asset(
     def save(self, commit=True, force_unlink=False, *args, **kwargs):
         _replace_empty_with_none(self, ['source', 'hostname'])
         self.handle_device_linkage(force_unlink)
+        self.effective_deprecation_date = self.get_deprecation_date()
         return super(Asset, self).save(commit=commit, *args, **kwargs)
 
     def get_data_icon(self):
@@ -851,22 +854,20 @@ class Asset(
         super(Asset, self).__init__(*args, **kwargs)
 
     def get_deprecation_months(self):
-        return int(
-            (1 / (self.deprecation_rate / 100) * 12)
-            if self.deprecation_rate else 0
+        return get_deprecation_months(self.deprecation_rate)
+
+    def get_deprecation_date(self):
+        return get_deprecation_date(
+            self.invoice_date,
+            self.deprecation_rate,
+            self.deprecation_end_date,
+            self.force_deprecation,
         )
 
     def is_deprecated(self, date=None):
         date = date or datetime.date.today()
-        if self.force_deprecation or not self.invoice_date:
-            return True
-        if self.deprecation_end_date:
-            deprecation_date = self.deprecation_end_date
-        else:
-            deprecation_date = self.invoice_date + relativedelta(
-                months=self.get_deprecation_months(),
-            )
-        return deprecation_date < date
+        deprecation_date = self.get_deprecation_date()
+        return deprecation_date is None or deprecation_date < date
 
     def is_liquidated(self, date=None):
         date = date or datetime.date.today()
@@ -877,11 +878,8 @@ class Asset(
         return False
 
     def _liquidated_at(self, date):
-        liquidated_history = self.get_history().filter(
-            new_value='liquidated',
-            field_name='status',
-        ).order_by('-date')[:1]
-        return liquidated_history and liquidated_history[0].date.date() <= date
+        from ralph_assets.models_status import get_liquidated_ids
+        return self.pk in get_liquidated_ids([self.pk], date)
 
     def delete_with_info(self, *args, **kwargs):
         """
@@ -900,7 +898,7 @@ class Asset(
     def is_discovered(self):
         if self.part_info:
             if self.part_info.device:
-                return self.part_info.device.is_discovered()
+                return self.part_info.device.is_discovered
             return False
         try:
             dev = self.device_info.get_ralph_device()
@@ -1044,6 +1042,68 @@ class ReportOdtSourceLanguage(SavingUser, TimeTrackable):
         return self.report_odt_source.slug
 
 
+def _prefetch_related_object(objects, field_name, queryset=None):
+    """Load objects related by FK *field_name* with all *objects* in one
+    query and put them into the field's cache. Returns list of related
+    objects (already cached ones included)."""
+    if not objects:
+        return []
+    field = objects[0]._meta.get_field(field_name)
+    cache_name = field.get_cache_name()
+    missing = {}
+    for obj in objects:
+        if hasattr(obj, cache_name):
+            continue
+        related_id = getattr(obj, field.attname)
+        if related_id is not None:
+            missing.setdefault(related_id, []).append(obj)
+    if missing:
+        if queryset is None:
+            queryset = field.rel.to._default_manager.all()
+        for related in queryset.filter(pk__in=missing.keys()):
+            for obj in missing[related.pk]:
+                setattr(obj, cache_name, related)
+    return [
+        getattr(obj, cache_name) for obj in objects
+        if getattr(obj, cache_name, None) is not None
+    ]
+
+
+def prefetch_ralph_devices(assets):
+    """Load Ralph devices (with venture, department and model) linked with
+    *assets* and with parent devices of parts in one query, so ``venture``,
+    ``linked_device`` and ``is_discovered`` of these assets don't query
+    the database for each asset. Returns *assets* as a list."""
+    assets = list(assets)
+    part_infos = _prefetch_related_object(assets, 'part_info')
+    parents = _prefetch_related_object(
+        part_infos, 'device',
+        Asset.admin_objects.select_related('device_info'),
+    )
+    device_infos = _prefetch_related_object(assets + parents, 'device_info')
+    ids = set(
+        device_info.ralph_device_id for device_info in device_infos
+        if device_info.ralph_device_id
+    )
+    devices = Device.objects.select_related(
+        'venture__department', 'model',
+    ).in_bulk(ids) if ids else {}
+    for device_info in device_infos:
+        if device_info.ralph_device_id:
+            device_info.set_ralph_device(
+                devices.get(device_info.ralph_device_id),
+            )
+    return assets
+
+
+def iterate_with_ralph_devices(queryset, chunk_size=1000):
+    """Iterate over assets from *queryset* fetched in chunks, with linked
+    Ralph devices prefetched for each chunk."""
+    for chunk in iterate_chunks(queryset, chunk_size):
+        for asset in prefetch_ralph_devices(chunk):
+            yield asset
+
+
 @receiver(pre_save, sender=Asset, dispatch_uid='ralph_assets.views.device')
 def device_hostname_assigning(sender, instance, raw, using, **kwargs):
     """A hook for assigning ``hostname`` value when an asset is edited."""
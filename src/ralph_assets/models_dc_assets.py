@@ -295,6 +295,26 @@ class DeviceInfo(HistoryMixin, TimeTrackable, SavingUser, SoftDeletable):
         choices=Orientation(),
         default=Orientation.front.id,
     )
+    # names of the location denormalized by update_device_locations (see
+    # LOCATION_NAME_FIELDS), so assets are searched by them without joins
+    location_rack = models.CharField(
+        max_length=75, null=True, db_index=True, editable=False,
+    )
+    location_data_center = models.CharField(
+        max_length=75, null=True, db_index=True, editable=False,
+    )
+    location_server_room = models.CharField(
+        max_length=75, null=True, db_index=True, editable=False,
+    )
+    location_rack_server_room = models.CharField(
+        max_length=75, null=True, db_index=True, editable=False,
+    )
+    location_rack_data_center = models.CharField(
+        max_length=75, null=True, db_index=True, editable=False,
+    )
+    location_complete = models.BooleanField(
+        default=False, db_index=True, editable=False,
+    )
 
     def clean_fields(self, exclude=None):
         """
@@ -358,12 +378,34 @@ class DeviceInfo(HistoryMixin, TimeTrackable, SavingUser, SoftDeletable):
     def get_ralph_device(self):
         if not self.ralph_device_id:
             return None
+        cached = getattr(self, '_ralph_device_cache', None)
+        if cached and cached[0] == self.ralph_device_id:
+            return cached[1]
         try:
             dev = Device.objects.get(id=self.ralph_device_id)
             return dev
         except Device.DoesNotExist:
             return None
 
+    def set_ralph_device(self, device):
+        """Prime :meth:`get_ralph_device` with already fetched *device* (or
+        None when linked device doesn't exist)."""
+        self._ralph_device_cache = (self.ralph_device_id, device)
+
+    def get_ralph_cores_count(self):
+        """Returns number of cores of linked Ralph device or None when there
+        is no such device."""
+        cached = getattr(self, '_ralph_cores_count_cache', None)
+        if cached and cached[0] == self.ralph_device_id:
+            return cached[1]
+        device = self.get_ralph_device()
+        return device.get_core_count() if device else None
+
+    def set_ralph_cores_count(self, cores_count):
+        """Prime :meth:`get_ralph_cores_count` with already computed
+        *cores_count*."""
+        self._ralph_cores_count_cache = (self.ralph_device_id, cores_count)
+
     def get_orientation_desc(self):
         return Orientation.name_from_id(self.orientation)
 
@@ -373,6 +415,54 @@ class DeviceInfo(HistoryMixin, TimeTrackable, SavingUser, SoftDeletable):
         super(DeviceInfo, self).__init__(*args, **kwargs)
 
 
+# denormalized names of the location of device info (column -> lookup)
+LOCATION_NAME_FIELDS = (
+    ('location_rack', 'rack__name'),
+    ('location_data_center', 'data_center__name'),
+    ('location_server_room', 'server_room__name'),
+    ('location_rack_server_room', 'rack__server_room__name'),
+    ('location_rack_data_center', 'rack__data_center__name'),
+)
+
+
+def is_location_complete(location, is_blade):
+    """True if all location fields (*location* is a dict) are set - and slot
+    number for blades."""
+    required = [
+        'data_center', 'server_room', 'rack', 'position', 'orientation',
+    ]
+    if is_blade:
+        required.append('slot_no')
+    return all(location[field] is not None for field in required)
+
+
+def update_device_locations(device_infos):
+    """Recomputes names of the location (see :data:`LOCATION_NAME_FIELDS`)
+    and ``location_complete`` of *device_infos* queryset."""
+    device_info_model = device_infos.model
+    asset_model = device_info_model.asset.related.model
+    locations = list(device_infos.values(
+        'pk', 'location_complete', 'data_center', 'server_room', 'rack',
+        'position', 'orientation', 'slot_no',
+        *[field for name_field in LOCATION_NAME_FIELDS for field in name_field]
+    ))
+    blades = dict(asset_model._base_manager.filter(
+        device_info__in=[location['pk'] for location in locations],
+    ).values_list('device_info', 'model__category__is_blade'))
+    for location in locations:
+        values = dict(
+            (column, location[lookup])
+            for column, lookup in LOCATION_NAME_FIELDS
+        )
+        values['location_complete'] = is_location_complete(
+            location, blades.get(location['pk']),
+        )
+        if any(location[column] != value for column, value in values.items()):
+            device_info_model._base_manager.filter(pk=location['pk']).update(
+                **values
+            )
+
+
 @receiver(
     post_delete,
     sender=Device,
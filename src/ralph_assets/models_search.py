@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Flattened search documents of assets.
+
+Search filters by names of related objects (owner's profile, model,
+manufacturer, budget, ...) join up to 8 tables. When
+``ASSETS_SEARCH_DOCUMENTS`` is on, these names are copied to one row per
+asset (:class:`AssetSearchDocument`), kept up to date by ``post_save`` hooks
+of the related models, and the search filters this table instead. Run
+``rebuild_search_documents`` command after turning it on.
+
+Substring searches (``contains``) of serial numbers, barcodes, hostnames etc.
+can't use B-tree indexes. When ``ASSETS_SEARCH_NGRAMS`` is on, trigrams of
+these values are stored in :class:`AssetNgram` (kept up to date by
+``post_save`` hooks, built by ``rebuild_ngram_index`` command) and the search
+narrows candidate assets to those having the trigrams of searched value
+before the ``contains`` filter is applied.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import models
+
+from ralph_assets.models_assets import Asset
+
+
+# document field -> lookup from asset
+DOCUMENT_FIELDS = (
+    ('model', 'model__name'),
+    ('manufacturer', 'model__manufacturer__name'),
+    ('budget_info', 'budget_info__name'),
+    ('service', 'service__name'),
+    ('device_environment', 'device_environment__name'),
+    ('imei', 'office_info__imei'),
+    ('purpose', 'office_info__purpose'),
+    ('company', 'owner__profile__company'),
+    ('department', 'owner__profile__department'),
+    ('segment', 'owner__profile__segment'),
+    ('cost_center', 'owner__profile__cost_center'),
+    ('employee_id', 'owner__profile__employee_id'),
+    ('profit_center', 'owner__profile__profit_center'),
+)
+DOCUMENT_LOOKUPS = dict(DOCUMENT_FIELDS)
+
+UPDATE_CHUNK_SIZE = 1000
+
+NGRAM_SIZE = 3
+# field id -> lookup from asset; ids are stored in the database, so new
+# fields have to get new ids (5 was used by remarks - long free text would
+# make the index grow out of proportion, so they're searched without it)
+NGRAM_FIELDS = (
+    (1, 'sn'),
+    (2, 'barcode'),
+    (3, 'hostname'),
+    (4, 'niw'),
+    (6, 'location'),
+    (7, 'task_url'),
+    (8, 'model__name'),
+)
+NGRAM_FIELD_IDS = dict((lookup, id) for id, lookup in NGRAM_FIELDS)
+# longer values are matched with (evenly spread) part of their trigrams
+NGRAM_MAX_TERMS = 8
+# when more assets contain trigrams of the value, narrowing the search
+# isn't worth it
+NGRAM_MAX_CANDIDATES = getattr(
+    settings, 'ASSETS_SEARCH_NGRAM_MAX_CANDIDATES', 10000,
+)
+
+
+def search_documents_enabled():
+    return getattr(settings, 'ASSETS_SEARCH_DOCUMENTS', False)
+
+
+def ngram_index_enabled():
+    return getattr(settings, 'ASSETS_SEARCH_NGRAMS', False)
+
+
+def get_search_lookup(lookup):
+    """Returns lookup of the search document field copied from *lookup* if
+    search documents are enabled, *lookup* otherwise."""
+    if search_documents_enabled():
+        for field, document_lookup in DOCUMENT_FIELDS:
+            if document_lookup == lookup:
+                return 'search_document__{}'.format(field)
+    return lookup
+
+
+class AssetSearchDocument(models.Model):
+    """Names of objects related to the asset, searched without joins."""
+    asset = models.OneToOneField(
+        Asset, primary_key=True, related_name='search_document',
+    )
+    model = models.CharField(max_length=75, null=True, db_index=True)
+    manufacturer = models.CharField(max_length=75, null=True, db_index=True)
+    budget_info = models.CharField(max_length=75, null=True, db_index=True)
+    service = models.CharField(max_length=75, null=True, db_index=True)
+    device_environment = models.CharField(
+        max_length=75, null=True, db_index=True,
+    )
+    imei = models.CharField(max_length=18, null=True, db_index=True)
+    purpose = models.PositiveSmallIntegerField(null=True)
+    company = models.CharField(max_length=64, null=True)
+    department = models.CharField(max_length=64, null=True)
+    segment = models.CharField(max_length=256, null=True)
+    cost_center = models.CharField(max_length=1024, null=True)
+    employee_id = models.CharField(max_length=64, null=True, db_index=True)
+    profit_center = models.CharField(max_length=1024, null=True)
+
+    def __unicode__(self):
+        return 'Search document of asset {}'.format(self.asset_id)
+
+
+def update_search_documents(asset_ids):
+    """(Re)builds search documents of assets with *asset_ids*."""
+    asset_ids = list(asset_ids)
+    for start in xrange(0, len(asset_ids), UPDATE_CHUNK_SIZE):
+        chunk = asset_ids[start:start + UPDATE_CHUNK_SIZE]
+        rows = Asset.admin_objects.filter(pk__in=chunk).values(
+            'pk', *[lookup for field, lookup in DOCUMENT_FIELDS]
+        )
+        documents = [
+            AssetSearchDocument(asset_id=row['pk'], **dict(
+                (field, row[lookup]) for field, lookup in DOCUMENT_FIELDS
+            ))
+            for row in rows
+        ]
+        AssetSearchDocument.objects.filter(asset__in=chunk).delete()
+        AssetSearchDocument.objects.bulk_create(documents)
+
+
+def update_related_search_documents(**lookups):
+    """Rebuilds search documents of assets matching any of *lookups*, e.g.
+    ``update_related_search_documents(model__manufacturer=manufacturer)``.
+    """
+    asset_ids = set()
+    for lookup, value in lookups.iteritems():
+        asset_ids.update(
+            Asset.admin_objects.filter(**{lookup: value}).values_list(
+                'pk', flat=True,
+            )
+        )
+    update_search_documents(sorted(asset_ids))
+
+
+class AssetNgram(models.Model):
+    """Trigram of the value of asset's field (one of ``NGRAM_FIELDS``)."""
+    # (field, ngram, asset) index is created in migration, Django 1.4 can't
+    # declare composite indexes
+    asset = models.ForeignKey(Asset, related_name='ngrams')
+    field = models.PositiveSmallIntegerField(choices=NGRAM_FIELDS)
+    ngram = models.CharField(max_length=NGRAM_SIZE)
+
+    def __unicode__(self):
+        return '{} of asset {}'.format(self.ngram, self.asset_id)
+
+
+def get_ngrams(value):
+    """Returns list of distinct (lowercased) trigrams of *value* in order of
+    their occurrence."""
+    value = (value or '').lower()
+    ngrams = []
+    seen = set()
+    for start in xrange(len(value) - NGRAM_SIZE + 1):
+        ngram = value[start:start + NGRAM_SIZE]
+        if ngram not in seen:
+            seen.add(ngram)
+            ngrams.append(ngram)
+    return ngrams
+
+
+def can_use_ngrams(lookup, value):
+    """True if ``contains`` search of *value* by *lookup* can be narrowed
+    with the trigram index."""
+    return (
+        ngram_index_enabled() and
+        lookup in NGRAM_FIELD_IDS and
+        len(value) >= NGRAM_SIZE
+    )
+
+
+def get_ngram_candidates(lookup, value):
+    """Returns ids of assets having all (or :data:`NGRAM_MAX_TERMS` of)
+    trigrams of *value* in *lookup* - a superset of assets containing
+    *value* - or None if there are more than ``NGRAM_MAX_CANDIDATES`` of them
+    (or the index can't be used).
+    """
+    if not can_use_ngrams(lookup, value):
+        return None
+    ngrams = get_ngrams(value)
+    if len(ngrams) > NGRAM_MAX_TERMS:
+        step = (len(ngrams) - 1) / (NGRAM_MAX_TERMS - 1)
+        ngrams = [
+            ngrams[int(round(index * step))]
+            for index in xrange(NGRAM_MAX_TERMS)
+        ]
+    candidates = list(
+        AssetNgram.objects.filter(
+            field=NGRAM_FIELD_IDS[lookup], ngram__in=ngrams,
+        ).values('asset').annotate(
+            matched=models.Count('ngram'),
+        ).filter(
+            matched=len(ngrams),
+        ).values_list('asset', flat=True)[:NGRAM_MAX_CANDIDATES + 1]
+    )
+    if len(candidates) > NGRAM_MAX_CANDIDATES:
+        return None
+    return candidates
+
+
+def update_ngram_index(asset_ids):
+    """Updates trigrams of assets with *asset_ids* - only fields which
+    changed are rewritten."""
+    asset_ids = list(asset_ids)
+    for start in xrange(0, len(asset_ids), UPDATE_CHUNK_SIZE):
+        chunk = asset_ids[start:start + UPDATE_CHUNK_SIZE]
+        wanted = {}
+        rows = Asset.admin_objects.filter(pk__in=chunk).values(
+            'pk', *[lookup for field_id, lookup in NGRAM_FIELDS]
+        )
+        for row in rows:
+            for field_id, lookup in NGRAM_FIELDS:
+                wanted[row['pk'], field_id] = set(get_ngrams(row[lookup]))
+        existing = {}
+        stored = AssetNgram.objects.filter(asset__in=chunk).values_list(
+            'asset', 'field', 'ngram',
+        )
+        for asset_id, field_id, ngram in stored:
+            existing.setdefault((asset_id, field_id), set()).add(ngram)
+        changed = {}
+        for key in set(wanted) | set(existing):
+            if wanted.get(key, set()) != existing.get(key, set()):
+                asset_id, field_id = key
+                changed.setdefault(field_id, []).append(asset_id)
+        for field_id, changed_ids in changed.iteritems():
+            AssetNgram.objects.filter(
+                field=field_id, asset__in=changed_ids,
+            ).delete()
+            AssetNgram.objects.bulk_create([
+                AssetNgram(asset_id=changed_id, field=field_id, ngram=ngram)
+                for changed_id in changed_ids
+                for ngram in wanted.get((changed_id, field_id), ())
+            ])
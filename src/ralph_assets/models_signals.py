@@ -6,10 +6,41 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 
-from django.db.models.signals import post_save
+from django.core.signals import request_finished
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from ralph.account.models import Profile
+from ralph.discovery.models_device import DeviceEnvironment, ServiceCatalog
 
-from ralph_assets.models import Asset, DeviceInfo
+from ralph_assets.category_index import invalidate_category_index
+from ralph_assets.delta import DELETION_LOGGED_MODELS, log_deletion
+from ralph_assets.history.cache import invalidate_pending_recent_history
+from ralph_assets.models import (
+    Asset,
+    AssetCategory,
+    AssetManufacturer,
+    AssetModel,
+    DeviceInfo,
+    OfficeInfo,
+)
+from ralph_assets.models_assets import BudgetInfo
+from ralph_assets.models_dc_assets import (
+    DataCenter,
+    Rack,
+    ServerRoom,
+    update_device_locations,
+)
+from ralph_assets.models_search import (
+    ngram_index_enabled,
+    search_documents_enabled,
+    update_ngram_index,
+    update_related_search_documents,
+    update_search_documents,
+)
+from ralph_assets.models_status import update_status_interval
+from ralph_assets.models_support import Support
+from ralph_assets.search_cache import ASSET_SEARCH_MODELS, bump_generation
 
 
 SAVE_PRIORITY = 215
@@ -118,3 +149,148 @@ def update_core_localization(asset_dev_info):
 )
 def asset_device_info_post_save(sender, instance, **kwargs):
     update_core_localization(asset_dev_info=instance)
+
+
+def search_cache_invalidate(sender, **kwargs):
+    bump_generation(sender)
+
+
+for searched_model in ASSET_SEARCH_MODELS:
+    for signal in (post_save, post_delete):
+        signal.connect(
+            search_cache_invalidate,
+            sender=searched_model,
+            dispatch_uid='assets.{}.search_cache'.format(
+                searched_model._meta.db_table,
+            ),
+        )
+
+
+@receiver(
+    m2m_changed,
+    sender=Support.assets.through,
+    dispatch_uid='assets.support_assets.search_cache',
+)
+def support_assets_search_cache_invalidate(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_generation(sender)
+
+
+@receiver(
+    post_save, sender=AssetCategory, dispatch_uid='assets.category.index',
+)
+@receiver(
+    post_delete, sender=AssetCategory, dispatch_uid='assets.category.index',
+)
+def category_index_invalidate(sender, instance, **kwargs):
+    invalidate_category_index()
+
+
+@receiver(request_finished, dispatch_uid='assets.recent_history.invalidate')
+def recent_history_invalidate(sender, **kwargs):
+    invalidate_pending_recent_history()
+
+
+@receiver(post_save, sender=Asset, dispatch_uid='assets.asset.search_document')
+def asset_search_document_update(sender, instance, raw=False, **kwargs):
+    if search_documents_enabled() and not raw:
+        update_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=Asset, dispatch_uid='assets.asset.ngram_index')
+def asset_ngram_index_update(sender, instance, raw=False, **kwargs):
+    if ngram_index_enabled() and not raw:
+        update_ngram_index([instance.pk])
+
+
+@receiver(post_save, sender=Asset, dispatch_uid='assets.asset.status_interval')
+def asset_status_interval_update(
+    sender, instance, raw=False, created=False, **kwargs
+):
+    if not raw:
+        update_status_interval(instance, created=created)
+
+
+@receiver(
+    post_save, sender=AssetModel, dispatch_uid='assets.model.ngram_index',
+)
+def model_ngram_index_update(sender, instance, raw=False, **kwargs):
+    if ngram_index_enabled() and not raw:
+        update_ngram_index(
+            Asset.admin_objects.filter(model=instance).values_list(
+                'pk', flat=True,
+            ),
+        )
+
+
+# model -> function returning lookups of assets related to its instance
+SEARCH_DOCUMENT_RELATIONS = {
+    OfficeInfo: lambda obj: {'office_info': obj},
+    AssetModel: lambda obj: {'model': obj},
+    AssetManufacturer: lambda obj: {'model__manufacturer': obj},
+    BudgetInfo: lambda obj: {'budget_info': obj},
+    ServiceCatalog: lambda obj: {'service': obj},
+    DeviceEnvironment: lambda obj: {'device_environment': obj},
+    Profile: lambda obj: {'owner': obj.user_id},
+}
+
+
+def related_search_documents_update(sender, instance, raw=False, **kwargs):
+    if search_documents_enabled() and not raw:
+        update_related_search_documents(
+            **SEARCH_DOCUMENT_RELATIONS[sender](instance)
+        )
+
+
+for related_model in SEARCH_DOCUMENT_RELATIONS:
+    post_save.connect(
+        related_search_documents_update,
+        sender=related_model,
+        dispatch_uid='assets.{}.search_document'.format(
+            related_model._meta.object_name.lower(),
+        ),
+    )
+
+
+# model -> function returning Q of device infos placed in (or describing)
+# its instance
+DEVICE_LOCATION_RELATIONS = {
+    DeviceInfo: lambda obj: Q(pk=obj.pk),
+    Asset: lambda obj: Q(pk=obj.device_info_id),
+    AssetModel: lambda obj: Q(asset__model=obj),
+    AssetCategory: lambda obj: Q(asset__model__category=obj),
+    Rack: lambda obj: Q(rack=obj),
+    ServerRoom: lambda obj: Q(server_room=obj) | Q(rack__server_room=obj),
+    DataCenter: lambda obj: Q(data_center=obj) | Q(rack__data_center=obj),
+}
+
+
+def device_locations_update(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_device_locations(DeviceInfo.admin_objects.filter(
+            DEVICE_LOCATION_RELATIONS[sender](instance),
+        ))
+
+
+for related_model in DEVICE_LOCATION_RELATIONS:
+    post_save.connect(
+        device_locations_update,
+        sender=related_model,
+        dispatch_uid='assets.{}.device_location'.format(
+            related_model._meta.object_name.lower(),
+        ),
+    )
+
+
+def deletion_log(sender, instance, **kwargs):
+    log_deletion(instance)
+
+
+for deleted_model in DELETION_LOGGED_MODELS:
+    post_delete.connect(
+        deletion_log,
+        sender=deleted_model,
+        dispatch_uid='assets.{}.deletion_log'.format(
+            deleted_model._meta.object_name.lower(),
+        ),
+    )
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Periods in which assets had given statuses.
+
+Questions like "was the asset liquidated on given date" used to be answered
+by scanning history of each asset. :class:`AssetStatusInterval` keeps one row
+per period of asset's status (``valid_to`` is exclusive, None for the
+current status), so they become range queries over all assets at once.
+Intervals are opened and closed by ``post_save`` hook of assets. Intervals
+of assets which existed before are built from history of their status
+changes by ``rebuild_status_intervals`` command or at their first save -
+until then, their liquidation is read from history (see
+:func:`get_liquidated_ids`).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import itertools
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+from ralph_assets.history.models import History, HistoryArchive
+from ralph_assets.models_assets import Asset, AssetStatus
+
+
+UPDATE_CHUNK_SIZE = 1000
+
+
+class AssetStatusIntervalManager(models.Manager):
+    def on(self, date):
+        """Intervals of statuses assets had at the end of *date*."""
+        return self.filter(
+            models.Q(valid_to=None) | models.Q(valid_to__gt=date),
+            valid_from__lte=date,
+        )
+
+    def liquidated_by(self, date):
+        """Intervals of assets which are liquidated since *date* or
+        earlier."""
+        return self.filter(
+            status=AssetStatus.liquidated.id,
+            valid_to=None,
+            valid_from__lte=date,
+        )
+
+
+class AssetStatusInterval(models.Model):
+    """Status the asset had from ``valid_from`` until ``valid_to``."""
+    # index on (status, valid_to, valid_from) is created in the migration
+    asset = models.ForeignKey(Asset, related_name='status_intervals')
+    status = models.PositiveSmallIntegerField(choices=AssetStatus())
+    valid_from = models.DateField()
+    valid_to = models.DateField(null=True, blank=True, default=None)
+
+    objects = AssetStatusIntervalManager()
+
+    def __unicode__(self):
+        return '{} of asset {} from {} to {}'.format(
+            self.get_status_display(), self.asset_id, self.valid_from,
+            self.valid_to or '-',
+        )
+
+
+def update_status_interval(asset, date=None, created=False):
+    """Closes the current interval of *asset* and opens a new one when the
+    status of *asset* has changed. Intervals of asset saved for the first
+    time since they are tracked are built from its history first."""
+    date = date or datetime.date.today()
+    if (
+        not created and
+        not AssetStatusInterval.objects.filter(asset=asset).exists()
+    ):
+        rebuild_status_intervals([asset.pk], current_status=False)
+    current = AssetStatusInterval.objects.filter(asset=asset, valid_to=None)
+    if list(current.values_list('status', flat=True)[:1]) == [asset.status]:
+        return
+    current.update(valid_to=date)
+    AssetStatusInterval.objects.create(
+        asset=asset, status=asset.status, valid_from=date,
+    )
+
+
+def _get_status_ids():
+    """Maps status names stored in history to their ids."""
+    return dict((unicode(desc), status) for status, desc in AssetStatus())
+
+
+def _get_status_changes(asset_ids):
+    """Returns status changes of assets with *asset_ids* recorded in history
+    (archived included) as (asset id, date, old status, new status) rows
+    ordered by asset and date."""
+    content_type = ContentType.objects.get_for_model(Asset)
+    rows = []
+    for model in (History, HistoryArchive):
+        rows.extend(model.objects.filter(
+            content_type=content_type,
+            object_id__in=asset_ids,
+            field_name='status',
+        ).values_list('object_id', 'date', 'id', 'old_value', 'new_value'))
+    rows.sort()
+    return [
+        (asset_id, date, old_value, new_value)
+        for asset_id, date, id, old_value, new_value in rows
+    ]
+
+
+def get_status_intervals(asset_id, status, created, changes, status_ids):
+    """Returns intervals of asset with current *status* (None if unknown)
+    built from its *changes* (see :func:`_get_status_changes`)."""
+    periods = []  # (status, valid_from)
+    for date, old_value, new_value in changes:
+        if not periods and old_value in status_ids:
+            periods.append((status_ids[old_value], created))
+        if new_value in status_ids:
+            periods.append((status_ids[new_value], date.date()))
+    if status is not None and (not periods or periods[-1][0] != status):
+        start = periods[-1][1] if periods else created
+        periods.append((status, start))
+    intervals = []
+    for index, (period_status, valid_from) in enumerate(periods):
+        valid_to = None
+        if index < len(periods) - 1:
+            valid_to = periods[index + 1][1]
+            if valid_to <= valid_from:
+                # superseded on the same day
+                continue
+        if intervals and intervals[-1].status == period_status:
+            intervals[-1].valid_to = valid_to
+            continue
+        intervals.append(AssetStatusInterval(
+            asset_id=asset_id,
+            status=period_status,
+            valid_from=valid_from,
+            valid_to=valid_to,
+        ))
+    return intervals
+
+
+def rebuild_status_intervals(asset_ids, current_status=True):
+    """(Re)builds status intervals of assets with *asset_ids* from history of
+    their status changes - ending with their current status or, without
+    *current_status*, with the latest status recorded in history."""
+    asset_ids = list(asset_ids)
+    status_ids = _get_status_ids()
+    for start in xrange(0, len(asset_ids), UPDATE_CHUNK_SIZE):
+        chunk = asset_ids[start:start + UPDATE_CHUNK_SIZE]
+        changes = dict(
+            (asset_id, [row[1:] for row in rows])
+            for asset_id, rows in itertools.groupby(
+                _get_status_changes(chunk), lambda row: row[0],
+            )
+        )
+        intervals = []
+        assets = Asset.admin_objects.filter(pk__in=chunk).values_list(
+            'pk', 'status', 'created',
+        )
+        for asset_id, status, created in assets:
+            intervals.extend(get_status_intervals(
+                asset_id, status if current_status else None, created.date(),
+                changes.get(asset_id, ()),
+                status_ids,
+            ))
+        AssetStatusInterval.objects.filter(asset__in=chunk).delete()
+        AssetStatusInterval.objects.bulk_create(intervals)
+
+
+def _get_liquidated_from_history(asset_ids, date):
+    """Returns set of ids among *asset_ids* of assets whose latest change of
+    status to liquidated was recorded in history on *date* or earlier."""
+    content_type = ContentType.objects.get_for_model(Asset)
+    liquidated_at = {}
+    for model in (History, HistoryArchive):
+        for asset_id, changed in model.objects.filter(
+            content_type=content_type,
+            object_id__in=asset_ids,
+            field_name='status',
+            new_value=unicode(AssetStatus.liquidated.desc),
+        ).values_list('object_id', 'date'):
+            liquidated_at[asset_id] = max(
+                changed, liquidated_at.get(asset_id, changed),
+            )
+    return set(
+        asset_id for asset_id, changed in liquidated_at.iteritems()
+        if changed.date() <= date
+    )
+
+
+def get_liquidated_ids(asset_ids, date):
+    """Returns set of ids among *asset_ids* (of all assets when None) of
+    assets liquidated by *date*. Liquidation of assets without intervals (not
+    rebuilt from history yet) is read from history of their status
+    changes."""
+    liquidated_intervals = AssetStatusInterval.objects.liquidated_by(date)
+    without_intervals = Asset.admin_objects.filter(
+        status=AssetStatus.liquidated.id,
+    )
+    if asset_ids is None:
+        without_intervals = without_intervals.exclude(
+            pk__in=AssetStatusInterval.objects.values('asset'),
+        )
+    else:
+        asset_ids = list(asset_ids)
+        liquidated_intervals = liquidated_intervals.filter(
+            asset__in=asset_ids,
+        )
+        with_intervals = set(AssetStatusInterval.objects.filter(
+            asset__in=asset_ids,
+        ).values_list('asset', flat=True).distinct())
+        without_intervals = without_intervals.filter(pk__in=[
+            asset_id for asset_id in asset_ids
+            if asset_id not in with_intervals
+        ])
+    liquidated = set(liquidated_intervals.values_list('asset', flat=True))
+    without_intervals = list(without_intervals.values_list('pk', flat=True))
+    liquidated.update(_get_liquidated_from_history(without_intervals, date))
+    return liquidated
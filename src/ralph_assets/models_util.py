@@ -11,7 +11,8 @@ from __future__ import unicode_literals
 import abc
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models.query import QuerySet
 from lck.django.choices import Choices
 
 from ralph.account.models import Region
@@ -60,6 +61,221 @@ class WithForm(object):
         """Return the url of edit for for this resource."""
 
 
+class CountedQuerySet(QuerySet):
+    """QuerySet which remembers its count, so the paginator and templates can
+    share one ``COUNT(*)``. The count survives only clones which can't change
+    it (ordering and related objects selection)."""
+
+    known_count = None
+
+    def count(self):
+        if self.known_count is None:
+            self.known_count = super(CountedQuerySet, self).count()
+        return self.known_count
+
+    def _clone(self, *args, **kwargs):
+        kwargs.setdefault('known_count', None)
+        return super(CountedQuerySet, self)._clone(*args, **kwargs)
+
+    def _with_count_of(self, queryset):
+        queryset.known_count = self.known_count
+        return queryset
+
+    def order_by(self, *args, **kwargs):
+        return self._with_count_of(
+            super(CountedQuerySet, self).order_by(*args, **kwargs)
+        )
+
+    def select_related(self, *args, **kwargs):
+        return self._with_count_of(
+            super(CountedQuerySet, self).select_related(*args, **kwargs)
+        )
+
+    def prefetch_related(self, *args, **kwargs):
+        return self._with_count_of(
+            super(CountedQuerySet, self).prefetch_related(*args, **kwargs)
+        )
+
+
+def with_known_count(queryset, count):
+    """Returns *queryset* clone which answers ``count()`` with *count*."""
+    return queryset._clone(klass=CountedQuerySet, known_count=count)
+
+
+def iterate_chunks(queryset, chunk_size=1000):
+    """Yields lists of at most *chunk_size* objects from *queryset*, so big
+    querysets are never fetched (nor cached) at once.
+
+    Querysets without explicit ordering are walked by primary key, which
+    stays cheap for the last chunks, the others are sliced (with primary key
+    as a tie-breaker, so no row is skipped nor repeated).
+    """
+    if queryset.query.order_by:
+        ordering = list(queryset.query.order_by)
+        if 'pk' not in ordering and '-pk' not in ordering:
+            ordering.append('pk')
+        queryset = queryset.order_by(*ordering)
+        offset = 0
+        while True:
+            chunk = list(queryset[offset:offset + chunk_size])
+            if not chunk:
+                break
+            yield chunk
+            if len(chunk) < chunk_size:
+                break
+            offset += chunk_size
+    else:
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            chunk_queryset = queryset
+            if last_pk is not None:
+                chunk_queryset = queryset.filter(pk__gt=last_pk)
+            chunk = list(chunk_queryset[:chunk_size])
+            if not chunk:
+                break
+            yield chunk
+            if len(chunk) < chunk_size:
+                break
+            last_pk = chunk[-1].pk
+
+
+TEMPORARY_TABLE_PREFIX = 'ralph_assets_temporary_value_'
+
+
+class TemporaryValue(models.Model):
+    """Row of a table of :class:`TemporaryValuesTable` - its tables are
+    never created by syncdb nor migrations."""
+    text = models.CharField(max_length=255, null=True)
+    number = models.BigIntegerField(null=True)
+
+    class Meta:
+        abstract = True
+
+
+_temporary_value_models = {}
+
+
+def get_temporary_value_model(index):
+    """Returns unmanaged model of the *index*-th temporary table (MySQL
+    can't read one temporary table twice in a query, so every list gets
+    its own table)."""
+    if index not in _temporary_value_models:
+        _temporary_value_models[index] = type(
+            str('TemporaryValue{}'.format(index)), (TemporaryValue,), {
+                '__module__': __name__,
+                'Meta': type(str('Meta'), (object,), {
+                    'db_table': '{}{}'.format(TEMPORARY_TABLE_PREFIX, index),
+                    'managed': False,
+                }),
+            },
+        )
+    return _temporary_value_models[index]
+
+
+class TemporaryValuesTable(object):
+    """Temporary tables of the database session, for ``__in`` lookups with
+    lists of values too long to be sent as query params. Every list added
+    inside of the block is loaded into its own table, created then and
+    dropped when the block ends, so querysets using them have to be
+    evaluated inside, e.g.::
+
+        with TemporaryValuesTable(Asset) as table:
+            assets = list(Asset.objects.filter(
+                sn__in=table.add(serial_numbers),
+            ))
+
+    Blocks without lists run no queries. Outside of the block :meth:`add`
+    returns plain lists. On MySQL text values get the collation of
+    *model*'s table.
+    """
+    insert_batch_size = 500
+
+    def __init__(self, model=None, using=DEFAULT_DB_ALIAS):
+        self.model = model
+        self.using = using
+        self.active = False
+        self.tables = []
+        self.text_type = None
+
+    def _get_text_type(self, connection, cursor):
+        text_type = 'VARCHAR({})'.format(
+            TemporaryValue._meta.get_field('text').max_length,
+        )
+        if connection.vendor != 'mysql' or self.model is None:
+            return text_type
+        cursor.execute(
+            'SELECT TABLE_COLLATION FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+            [self.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            return text_type
+        return '{} CHARACTER SET {} COLLATE {}'.format(
+            text_type, row[0].split('_')[0], row[0],
+        )
+
+    def _drop_table(self, connection, cursor, model, if_exists=False):
+        # DROP TABLE would commit the transaction on MySQL
+        cursor.execute('DROP {}TABLE {}{}'.format(
+            'TEMPORARY ' if connection.vendor == 'mysql' else '',
+            'IF EXISTS ' if if_exists else '',
+            connection.ops.quote_name(model._meta.db_table),
+        ))
+
+    def _create_table(self):
+        model = get_temporary_value_model(len(self.tables) + 1)
+        connection = connections[self.using]
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        if self.text_type is None:
+            self.text_type = self._get_text_type(connection, cursor)
+        # left behind by a block which ended with an error
+        self._drop_table(connection, cursor, model, if_exists=True)
+        cursor.execute(
+            'CREATE TEMPORARY TABLE {} ({} {} NULL, {} BIGINT NULL)'.format(
+                qn(model._meta.db_table), qn('text'), self.text_type,
+                qn('number'),
+            )
+        )
+        self.tables.append(model)
+        return model
+
+    def __enter__(self):
+        self.active = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.active = False
+        tables, self.tables = self.tables, []
+        if exc_type is not None:
+            # on PostgreSQL the transaction is aborted by now and DROP would
+            # hide the error - the tables go with the session or are
+            # dropped by the next block
+            return False
+        connection = connections[self.using]
+        cursor = connection.cursor()
+        for model in tables:
+            self._drop_table(connection, cursor, model)
+        return False
+
+    def add(self, values, numbers=False):
+        """Loads *values* (numbers, like ids, with *numbers*) into a new
+        table and returns queryset of them."""
+        if not self.active:
+            return list(values)
+        model = self._create_table()
+        column = 'number' if numbers else 'text'
+        values = list(values)
+        for start in xrange(0, len(values), self.insert_batch_size):
+            model.objects.using(self.using).bulk_create([
+                model(**{column: value})
+                for value in values[start:start + self.insert_batch_size]
+            ])
+        return model.objects.using(self.using).values_list(column, flat=True)
+
+
 class RegionalizedDBManager(models.Manager):
 
     def get_query_set(self):
@@ -60,13 +60,18 @@ LICENCES_USERS_COLUMNS = [
 ]
 
 
-def get_licences_rows(filter_type='all', only_assigned=False):
+def get_licences_rows(filter_type='all', only_assigned=False, progress=None):
+    """Yields rows of licences relations; *progress* (a
+    :class:`ralph_assets.progress.ProgressReporter`) is advanced per
+    licence."""
     if filter_type == 'all':
         queryset = Licence.objects.all()
     else:
         queryset = Licence.objects.filter(
             asset_type=MODE2ASSET_TYPE[filter_type]
         )
+    if progress:
+        progress.total = queryset.count()
     yield (
         LICENCES_COLUMNS +
         LICENCES_ASSETS_COLUMNS +
@@ -107,17 +112,30 @@ def get_licences_rows(filter_type='all', only_assigned=False):
                 ) for column in LICENCES_USERS_COLUMNS
             ]
             yield base_row + fill_empty_assets + row + [single_licence_cost]
+        if progress:
+            progress.advance()
+    if progress:
+        progress.finish()
 
 
-def get_assets_rows(filter_type='all'):
+def get_assets_rows(filter_type='all', progress=None):
+    """Yields rows of assets relations; *progress* (a
+    :class:`ralph_assets.progress.ProgressReporter`) is advanced per
+    asset."""
     if filter_type == 'all':
         queryset = Asset.objects.all().values(*ASSETS_COLUMNS)
     else:
         queryset = Asset.objects.filter(
             type=MODE2ASSET_TYPE[filter_type]
         ).values(*ASSETS_COLUMNS)
+    if progress:
+        progress.total = queryset.count()
     yield ASSETS_COLUMNS
     for asset in queryset:
         row = []
         row = [asset.get(column) for column in ASSETS_COLUMNS]
         yield row
+        if progress:
+            progress.advance()
+    if progress:
+        progress.finish()
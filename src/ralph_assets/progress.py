@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Progress of long running rq report jobs.
+
+Every :func:`ralph.util.reports.set_progress` call saves the job in Redis, so
+:class:`ProgressReporter` saves it only when enough time passed or the
+progress changed enough since the last save. Besides ``progress`` it keeps
+in the job's meta:
+
+- ``rows_processed`` and ``rows_total``,
+- ``rows_per_second`` - average speed since the first row,
+- ``eta`` - estimated number of seconds to the end (``None`` if unknown).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import time
+
+from django.conf import settings
+
+
+PROGRESS_INTERVAL = getattr(settings, 'ASSETS_PROGRESS_INTERVAL', 0.5)
+PROGRESS_DELTA = getattr(settings, 'ASSETS_PROGRESS_DELTA', 0.01)
+
+
+class ProgressReporter(object):
+    """Reports progress of processing *total* rows to rq *job*.
+
+    :param job: rq job (when ``None`` nothing is reported)
+    :param total: number of rows to process; when unknown only speed is
+        reported
+    :param interval: minimal number of seconds between saves of the job
+    :param delta: minimal change of progress (0 - 1) between saves of the job
+    """
+
+    def __init__(
+        self, job, total=None, interval=PROGRESS_INTERVAL,
+        delta=PROGRESS_DELTA, clock=time.time,
+    ):
+        self.job = job
+        self.total = total
+        self.interval = interval
+        self.delta = delta
+        self.clock = clock
+        self.processed = 0
+        self.started = None
+        self.last_saved = None
+        self.last_processed = 0
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 0
+        return min(self.processed / self.total, 1)
+
+    @property
+    def rows_per_second(self):
+        if self.started is None:
+            return None
+        elapsed = self.clock() - self.started
+        if elapsed <= 0:
+            return None
+        return self.processed / elapsed
+
+    @property
+    def eta(self):
+        speed = self.rows_per_second
+        if not speed or not self.total:
+            return None
+        return max(self.total - self.processed, 0) / speed
+
+    def advance(self, rows=1):
+        """Mark next *rows* as processed."""
+        self.update(self.processed + rows)
+
+    def update(self, processed):
+        """Set number of processed rows; the job is saved if it's due."""
+        if self.started is None:
+            self.started = self.clock()
+        self.processed = processed
+        if self._is_due():
+            self.save()
+
+    def finish(self):
+        """Mark all rows as processed and save the job."""
+        if self.started is None:
+            self.started = self.clock()
+        if self.total is None:
+            self.total = self.processed
+        self.processed = max(self.processed, self.total)
+        self.save()
+
+    def _is_due(self):
+        if self.last_saved is None:
+            return True
+        if self.clock() - self.last_saved >= self.interval:
+            return True
+        if not self.total:
+            return False
+        return self.processed - self.last_processed >= self.delta * self.total
+
+    def save(self):
+        self.last_saved = self.clock()
+        self.last_processed = self.processed
+        if not self.job:
+            return
+        meta = self.job.meta
+        meta['progress'] = self.progress
+        if not meta.get('start_progress'):
+            meta['start_progress'] = datetime.datetime.now()
+        meta['rows_processed'] = self.processed
+        meta['rows_total'] = self.total
+        meta['rows_per_second'] = self.rows_per_second
+        meta['eta'] = self.eta
+        self.job.save()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Opt-in cache for results computed from asset searches (like counts).
+
+Entries are keyed by the SQL of the query and by the current *generations*
+of all models the asset search reads (:data:`ASSET_SEARCH_MODELS`). The
+generation of a model is bumped every time its object is saved or deleted
+(and relations of assets with supports are changed), which invalidates all
+entries depending on it at once.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from ralph.account.models import Profile, Region
+from ralph.business.models import Venture
+from ralph.discovery.models import Device
+from ralph.discovery.models_device import DeviceEnvironment, ServiceCatalog
+
+from ralph_assets.models_assets import (
+    Asset,
+    AssetCategory,
+    AssetManufacturer,
+    AssetModel,
+    BudgetInfo,
+    OfficeInfo,
+    PartInfo,
+    Service,
+    Warehouse,
+)
+from ralph_assets.models_dc_assets import DeviceInfo
+from ralph_assets.models_support import Support
+from ralph_assets.models_util import TEMPORARY_TABLE_PREFIX
+
+
+# models read by search fields of assets (Ralph devices and ventures are
+# read by fields of core devices)
+ASSET_SEARCH_MODELS = (
+    Asset, AssetCategory, AssetManufacturer, AssetModel, BudgetInfo,
+    Device, DeviceEnvironment, DeviceInfo, OfficeInfo, PartInfo, Profile,
+    Region, Service, ServiceCatalog, Support.assets.through, User, Venture,
+    Warehouse,
+)
+
+
+def get_cache_timeout():
+    """Returns timeout (in seconds) of cached searches; 0 disables cache."""
+    return getattr(settings, 'ASSETS_SEARCH_CACHE_TIMEOUT', 0)
+
+
+def _get_generation_key(model):
+    return 'ralph_assets:search_generation:{}'.format(model._meta.db_table)
+
+
+def _new_generation():
+    # a timestamp, so evicted generation never brings back stale entries
+    return int(time.time() * 1000)
+
+
+def get_generations(models):
+    """Returns list of current generations of *models*."""
+    keys = [_get_generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if generations.get(key) is None:
+            generations[key] = _new_generation()
+            cache.add(key, generations[key])
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model):
+    """Invalidate all cached searches reading *model*."""
+    key = _get_generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation())
+
+
+def get_cache_key(kind, queryset, models):
+    try:
+        sql = unicode(queryset.query)
+    except Exception:
+        # some queries can't be rendered without db connection
+        return None
+    if TEMPORARY_TABLE_PREFIX in sql:
+        # results depend on lists loaded into temporary tables
+        return None
+    digest = hashlib.md5(sql.encode('utf-8')).hexdigest()
+    return 'ralph_assets:{}:{}:{}'.format(
+        kind, '.'.join(unicode(gen) for gen in get_generations(models)),
+        digest,
+    )
+
+
+def get_or_compute(kind, queryset, compute, models=ASSET_SEARCH_MODELS):
+    """Returns ``compute(queryset)`` - cached when cache is enabled, until
+    any of *models* changes."""
+    timeout = get_cache_timeout()
+    key = get_cache_key(kind, queryset, models) if timeout else None
+    if not key:
+        return compute(queryset)
+    result = cache.get(key)
+    if result is None:
+        result = compute(queryset)
+        cache.set(key, result, timeout)
+    return result
+
+
+def get_search_count(queryset):
+    """Returns count of assets searched with *queryset*."""
+    return get_or_compute('count', queryset, lambda qs: qs.count())
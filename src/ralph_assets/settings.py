@@ -33,6 +33,50 @@ ASSETS_TRANSITIONS = {
 
 ASSET_HIDE_ACTION_SEARCH = False
 
+# how CSV export of searched assets is done:
+#   'report' - rq job returns all rows,
+#   'spool' - rq job writes CSV file to ASSETS_REPORTS['TEMP_STORAGE_PATH']
+#             (it has to be shared by workers and web servers) - files are
+#             removed after ASSETS_CSV_EXPORT_SPOOL_TTL seconds (keep it not
+#             shorter than result_ttl of rq jobs),
+#   'stream' - CSV is streamed to the browser without rq job
+ASSETS_CSV_EXPORT_MODE = 'report'
+ASSETS_CSV_EXPORT_CHUNK_SIZE = 1000
+ASSETS_CSV_EXPORT_SPOOL_TTL = 500
+
+# deltas of exports (see ralph_assets.delta) read changes since this number
+# of seconds before the watermark, to catch rows committed late
+ASSETS_DELTA_OVERLAP = 300
+
+# progress of report jobs is saved in Redis at most every
+# ASSETS_PROGRESS_INTERVAL seconds, unless it changed by ASSETS_PROGRESS_DELTA
+ASSETS_PROGRESS_INTERVAL = 0.5
+ASSETS_PROGRESS_DELTA = 0.01
+
+# cache asset search results (like counts) for given number of seconds;
+# cache is invalidated on every change of objects the search reads, 0
+# disables it
+ASSETS_SEARCH_CACHE_TIMEOUT = 0
+
+# show counts of searched assets per status, category, warehouse,
+# manufacturer and region (cached like search counts)
+ASSETS_SEARCH_FACETS = True
+
+# paginate searches, licences, supports and history with cursors (next and
+# previous page only) instead of page numbers; a cursor in the url turns it
+# on regardless of this setting
+ASSETS_KEYSET_PAGINATION = False
+
+# search by names of related objects (owner's profile, model, location, ...)
+# in flattened per-asset documents instead of joining their tables; run
+# `rebuild_search_documents` command after turning it on
+ASSETS_SEARCH_DOCUMENTS = False
+
+# lists of values pasted to search (e.g. barcodes) longer than this are
+# loaded into temporary tables (one per list, dropped when the search view
+# ends) instead of being sent as query params
+ASSETS_SEARCH_TEMP_TABLE_THRESHOLD = 1000
+
 # force locale during pdf raport genration
 GENERATED_DOCS_LOCALE = None
 
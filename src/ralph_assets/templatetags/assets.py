@@ -8,6 +8,7 @@ from __future__ import unicode_literals
 from django import template
 from django.core.urlresolvers import reverse
 from django.forms import CheckboxInput
+from django.http import QueryDict
 
 from ralph_assets.models import get_edit_url
 from ralph_assets.models_support import Support
@@ -80,3 +81,30 @@ def multi_assign_form(form, counter=''):
 )
 def mode_switch(context):
     return {'mode': context['mode']}
+
+
+@register.inclusion_tag('assets/templatetags/keyset_pagination.html')
+def keyset_pagination(
+    page, url_query=None, show_csv=False, fugue_icons=False,
+    cursor_variable_name='cursor', export_variable_name='export',
+):
+    """Previous/next links of :class:`KeysetPage` (it has no page
+    numbers)."""
+    def cursor_url(cursor):
+        query = url_query.copy() if url_query else QueryDict('', mutable=True)
+        query[cursor_variable_name] = cursor
+        query.pop('page', None)
+        return query.urlencode()
+    return {
+        'page': page,
+        'url_query': url_query,
+        'show_csv': show_csv,
+        'fugue_icons': fugue_icons,
+        'export_variable_name': export_variable_name,
+        'url_previous_page': (
+            cursor_url(page.previous_cursor) if page.has_previous() else None
+        ),
+        'url_next_page': (
+            cursor_url(page.next_cursor) if page.has_next() else None
+        ),
+    }
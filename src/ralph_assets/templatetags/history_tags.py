@@ -8,6 +8,7 @@ from __future__ import unicode_literals
 from django import template
 from django.utils.translation import ugettext_lazy as _
 
+from ralph_assets.history.cache import get_recent_history
 from ralph_assets.history.models import History
 
 
@@ -21,7 +22,7 @@ def get_context(obj, history, limit, full_history_button, title,
         'history_for_model_url': History.get_history_url_for_object(obj),
         'history_title': title,
         'limit': limit,
-        'history': history[:limit] if history else None,
+        'history': history,
         'show_field_name': show_field_name,
     }
 
@@ -31,12 +32,12 @@ def short_history(obj, limit=5, full_history_button=True):
     """Render a short history table."""
     if not obj:
         return {}
-    history = obj.get_history()
+    history = get_recent_history(obj, limit=limit)
     if not history:
         return {}
     return get_context(
         obj,
-        history.order_by('-date'),
+        history,
         limit,
         full_history_button,
         _('Short history'),
@@ -48,12 +49,12 @@ def status_history(obj, limit=5, full_history_button=True):
     """Render a short history table only for status changes."""
     if not obj:
         return {}
-    history = obj.get_history(field_name='status')
+    history = get_recent_history(obj, field_name='status', limit=limit)
     if not history:
         return {}
     return get_context(
         obj,
-        history.order_by('-date'),
+        history,
         limit,
         full_history_button,
         _('Status history'),
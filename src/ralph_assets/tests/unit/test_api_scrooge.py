@@ -6,13 +6,15 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import mock
-from datetime import date
+from datetime import date, datetime
 
 from django.test import TestCase
 from ralph.account.models import Region
 
 from ralph_assets import models
 from ralph_assets import api_scrooge
+from ralph_assets.delta import DELETION_LOGGED_MODELS, get_watermark
+from ralph_assets.history.models import History
 from ralph_assets.tests.utils.assets import (
     DCAssetFactory,
     AssetModelFactory,
@@ -162,11 +164,12 @@ class TestApiScrooge(TestCase):
         result = [a for a in api_scrooge.get_assets(today)]
         self.assertEquals(result, [])
 
-    @mock.patch('ralph_assets.models_assets.Asset.is_liquidated')
     @mock.patch('ralph_assets.api_scrooge.logger')
-    def test_get_asset_liquidated(self, logger_mock, is_liquidated_mock):
-        is_liquidated_mock.return_value = True
-        DCAssetFactory()
+    def test_get_asset_liquidated(self, logger_mock):
+        asset = DCAssetFactory(status=models.AssetStatus.liquidated)
+        models.AssetStatusInterval.objects.filter(asset=asset).update(
+            valid_from=date(2013, 11, 1),
+        )
         today = date(2013, 11, 12)
         result = [a for a in api_scrooge.get_assets(today)]
         self.assertEquals(result, [])
@@ -196,3 +199,99 @@ class TestApiScrooge(TestCase):
         )
         supports = get_supports(date(2013, 11, 12))
         self.assertEqual(len(list(supports)), 1)
+
+    def test_get_supports_assets(self):
+        supports = [
+            DCSupportFactory(
+                date_from=date(2013, 11, 12),
+                date_to=date(2014, 11, 12),
+            )
+            for _ in range(3)
+        ]
+        assets = [DCAssetFactory() for _ in range(2)]
+        supports[0].assets.add(*assets)
+        supports[2].assets.add(assets[1])
+        getter = get_supports(date(2013, 11, 12))
+        getter.chunk_size = 2
+        result = dict(
+            (item['support_id'], sorted(item['assets'])) for item in getter
+        )
+        self.assertEqual(result, {
+            supports[0].id: sorted(asset.id for asset in assets),
+            supports[1].id: [],
+            supports[2].id: [assets[1].id],
+        })
+
+    since = datetime(2013, 11, 1)
+
+    def _make_old(self):
+        """Moves all changes of exported objects before :attr:`since`."""
+        for model in DELETION_LOGGED_MODELS:
+            model._base_manager.update(modified=datetime(2013, 1, 1))
+        History.objects.update(date=datetime(2013, 1, 1))
+
+    def test_get_assets_delta(self):
+        assets = [
+            DCAssetFactory(invoice_date=date(2013, 10, 11)) for _ in range(3)
+        ]
+        self._make_old()
+        today = date(2013, 11, 12)
+        self.assertEqual(list(api_scrooge.get_assets_delta(
+            today, self.since,
+        )), [])
+        assets[0].sn = 'changed-sn'
+        assets[0].save()
+        models.Asset.admin_objects.filter(pk=assets[1].pk).delete()
+        result = list(api_scrooge.get_assets_delta(today, self.since))
+        self.assertEqual(len(result), 2)
+        self.assertFalse(result[0].pop('deleted'))
+        self._compare_asset(
+            assets[0],
+            result[0],
+            today,
+            assets[0].device_info.get_ralph_device().name,
+        )
+        self.assertEqual(result[1], {
+            'asset_id': assets[1].id,
+            'deleted': True,
+        })
+
+    def test_get_warehouses_delta(self):
+        warehouses = [WarehouseFactory() for _ in range(2)]
+        self._make_old()
+        token = api_scrooge.get_warehouses_change_token()
+        self.assertEqual(api_scrooge.get_warehouses_change_token(), token)
+        warehouses[1].delete()
+        self.assertNotEqual(api_scrooge.get_warehouses_change_token(), token)
+        self.assertEqual(list(api_scrooge.get_warehouses_delta(self.since)), [
+            {'warehouse_id': warehouses[1].id, 'deleted': True},
+        ])
+
+    def test_delta_since_watermark(self):
+        warehouses = [WarehouseFactory() for _ in range(2)]
+        self._make_old()
+        watermark = get_watermark()._replace(started=self.since)
+        warehouses[1].delete()
+        History.objects.update(date=datetime(2013, 1, 1))
+        self.assertEqual(list(api_scrooge.get_warehouses_delta(watermark)), [
+            {'warehouse_id': warehouses[1].id, 'deleted': True},
+        ])
+        self.assertEqual(list(api_scrooge.get_warehouses_delta(
+            get_watermark()._replace(started=self.since),
+        )), [])
+
+    def test_assets_change_token(self):
+        asset = DCAssetFactory(invoice_date=date(2013, 11, 5))
+        self._make_old()
+        token = api_scrooge.get_assets_change_token(date(2013, 11, 4))
+        self.assertEqual(
+            api_scrooge.get_assets_change_token(date(2013, 11, 4)), token,
+        )
+        self.assertNotEqual(
+            api_scrooge.get_assets_change_token(date(2013, 11, 12)), token,
+        )
+        asset.sn = 'changed-sn'
+        asset.save()
+        self.assertNotEqual(
+            api_scrooge.get_assets_change_token(date(2013, 11, 4)), token,
+        )
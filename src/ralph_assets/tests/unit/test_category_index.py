@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+
+import mock
+from django.test import TestCase
+
+from ralph_assets import category_index
+from ralph_assets.category_index import CategoryIndex, get_category_index
+from ralph_assets.models_assets import AssetCategory
+from ralph_assets.tests.utils.assets import (
+    AssetCategoryFactory,
+    AssetSubCategoryFactory,
+)
+
+
+class TestCategoryIndex(TestCase):
+    def setUp(self):
+        # root -> (child -> grandchild), other
+        self.index = CategoryIndex([
+            ('child', 'Child', 1, 'root', False, 1, 2, 5),
+            ('root', 'Root', 1, None, False, 1, 1, 6),
+            ('grandchild', 'Grandchild', 1, 'child', False, 1, 3, 4),
+            ('other', 'Other', 1, None, False, 2, 1, 2),
+        ])
+
+    def test_subtree_slugs(self):
+        self.assertEqual(
+            self.index.get_subtree_slugs('root'),
+            ('root', 'child', 'grandchild'),
+        )
+        self.assertEqual(self.index.get_subtree_slugs('other'), ('other',))
+        self.assertEqual(self.index.get_subtree_slugs('unknown'), ('unknown',))
+
+    def test_ancestors(self):
+        self.assertEqual(
+            [node.slug for node in self.index.get_ancestors('grandchild')],
+            ['root', 'child'],
+        )
+
+    def test_find(self):
+        self.assertEqual(self.index.find('Child', 1).slug, 'child')
+        with self.assertRaises(AssetCategory.DoesNotExist):
+            self.index.find('Child', 2)
+
+
+class TestCategoryIndexInvalidation(TestCase):
+    def test_index_is_rebuilt_after_category_change(self):
+        category = AssetSubCategoryFactory()
+        root = category.parent
+        self.assertEqual(
+            set(get_category_index().get_subtree_slugs(root.slug)),
+            {root.slug, category.slug},
+        )
+        # the version is read from the database with local cache
+        with self.assertNumQueries(1):
+            get_category_index()
+        with mock.patch.object(
+            category_index, '_cache_is_shared', return_value=True,
+        ):
+            get_category_index()
+            with self.assertNumQueries(0):
+                get_category_index()
+        other = AssetCategoryFactory()
+        category.parent = other
+        category.save()
+        self.assertEqual(
+            get_category_index().get_subtree_slugs(root.slug), (root.slug,),
+        )
+
+    def test_change_in_other_process_is_seen_with_local_cache(self):
+        category = AssetCategoryFactory(name='Old name')
+        self.assertEqual(
+            get_category_index().get(category.slug).name, 'Old name',
+        )
+        # saved without signals, like in another process
+        AssetCategory.objects.filter(pk=category.pk).update(
+            name='New name',
+            modified=datetime.datetime.now() + datetime.timedelta(days=1),
+        )
+        self.assertEqual(
+            get_category_index().get(category.slug).name, 'New name',
+        )
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import tempfile
+
+from django.test import TestCase
+
+from ralph_assets.models_assets import Asset
+from ralph_assets.models_util import iterate_chunks
+from ralph_assets.tests.utils.assets import AssetFactory
+from ralph_assets.views.csv_export import (
+    encode_csv_lines,
+    make_spooled_csv_response,
+    remove_expired_spools,
+    spool_csv,
+)
+
+
+class TestIterateChunks(TestCase):
+    def setUp(self):
+        self.assets = [AssetFactory() for _ in range(5)]
+
+    def test_unordered_queryset(self):
+        chunks = list(iterate_chunks(Asset.objects.all(), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            [asset.id for chunk in chunks for asset in chunk],
+            sorted(asset.id for asset in self.assets),
+        )
+
+    def test_ordered_queryset(self):
+        queryset = Asset.objects.order_by('-id')
+        chunks = list(iterate_chunks(queryset, chunk_size=2))
+        self.assertEqual(
+            [asset.id for chunk in chunks for asset in chunk],
+            sorted((asset.id for asset in self.assets), reverse=True),
+        )
+
+
+class TestCSVExport(TestCase):
+    rows = [['id', 'name'], [1, 'zażółć'], [2, 'b;c']]
+
+    def test_encode_csv_lines(self):
+        lines = list(encode_csv_lines(self.rows))
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0], b'id;name\r\n')
+        self.assertEqual(lines[1], '1;zażółć\r\n'.encode('cp1250'))
+        self.assertEqual(lines[2], b'2;"b;c"\r\n')
+
+    def test_spooled_file_can_be_downloaded_again(self):
+        path = spool_csv(self.rows, directory=tempfile.gettempdir())
+        for _ in range(2):
+            response = make_spooled_csv_response(path, 'export.csv')
+            content = b''.join(response)
+            self.assertEqual(content, b''.join(encode_csv_lines(self.rows)))
+        os.remove(path)
+
+    def test_expired_spooled_files_are_removed(self):
+        directory = tempfile.mkdtemp()
+        old_path = spool_csv(self.rows, directory=directory)
+        os.utime(old_path, (0, 0))
+        new_path = spool_csv(self.rows, directory=directory)
+        self.assertFalse(os.path.exists(old_path))
+        remove_expired_spools(directory)
+        self.assertTrue(os.path.exists(new_path))
+        remove_expired_spools(directory, ttl=-1)
+        self.assertEqual(os.listdir(directory), [])
+        os.rmdir(directory)
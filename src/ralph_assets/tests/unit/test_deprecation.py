@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+from ralph_assets.deprecation import (
+    DeprecationTable,
+    deprecated_on,
+    update_deprecation_dates,
+)
+from ralph_assets.models_assets import Asset
+from ralph_assets.tests.utils.assets import AssetFactory
+from ralph_assets.views import search_fields
+from ralph_assets.views.search_fields import get_search_plan
+
+
+class TestDeprecationTable(TestCase):
+    def setUp(self):
+        invoice_date = datetime.date(2013, 1, 31)
+        self.assets = [
+            AssetFactory(
+                invoice_date=invoice_date, deprecation_rate=25, price=1200,
+            ),
+            AssetFactory(
+                invoice_date=invoice_date, deprecation_rate=33, price=100,
+            ),
+            AssetFactory(invoice_date=invoice_date, deprecation_rate=0),
+            AssetFactory(invoice_date=None),
+            AssetFactory(invoice_date=invoice_date, force_deprecation=True),
+            AssetFactory(
+                invoice_date=invoice_date,
+                deprecation_end_date=datetime.date(2014, 1, 31),
+            ),
+        ]
+        self.table = DeprecationTable.from_queryset(
+            Asset.objects.order_by('pk'),
+        )
+
+    dates = (
+        datetime.date(2013, 1, 30),
+        datetime.date(2014, 1, 31),
+        datetime.date(2014, 2, 1),
+        datetime.date(2016, 3, 1),
+        datetime.date(2017, 2, 1),
+    )
+
+    def get_deprecated_in_db(self, date):
+        return list(Asset.objects.filter(deprecated_on(date)).order_by(
+            'pk',
+        ).values_list('pk', flat=True))
+
+    def test_same_as_is_deprecated(self):
+        for date in self.dates:
+            self.assertEqual(
+                self.table.get_deprecated(date),
+                [asset.is_deprecated(date) for asset in self.assets],
+            )
+
+    def test_stored_deprecation_dates(self):
+        expected = dict(
+            (date, self.table.get_deprecated_ids(date)) for date in self.dates
+        )
+        for date in self.dates:
+            self.assertEqual(self.get_deprecated_in_db(date), expected[date])
+        Asset.objects.update(effective_deprecation_date=None)
+        update_deprecation_dates(Asset.objects.all())
+        for date in self.dates:
+            self.assertEqual(self.get_deprecated_in_db(date), expected[date])
+
+    def test_search_deprecated_before(self):
+        search_fields._search_plans.clear()
+        query = get_search_plan({
+            'deprecation_date_to': '2016-12-31',
+        }).get_query()
+        self.assertEqual(
+            sorted(Asset.objects.filter(query).values_list('pk', flat=True)),
+            [asset.pk for asset in self.assets[1:]],
+        )
+
+    def test_monthly_values(self):
+        dates, values = self.table.get_monthly_values(
+            datetime.date(2015, 1, 15), 2,
+        )
+        self.assertEqual(
+            dates, [datetime.date(2015, 1, 1), datetime.date(2015, 2, 1)],
+        )
+        # 1200 deprecated in 4 years (1461 days), 761 days are left
+        self.assertEqual(values[0][0], Decimal('625.05'))
+        self.assertEqual(values[1][0], Decimal('599.59'))
+        self.assertEqual(
+            [value[2:] for value in values], [[Decimal(0)] * 4] * 2,
+        )
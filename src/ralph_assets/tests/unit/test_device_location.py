@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from django.test import TestCase
+
+from ralph_assets.models_assets import Asset, DeviceInfo
+from ralph_assets.tests.utils.assets import DCAssetFactory
+from ralph_assets.views.search_fields import get_search_plan
+
+
+class TestDeviceLocation(TestCase):
+    def setUp(self):
+        self.asset = DCAssetFactory(model__category__is_blade=False)
+
+    def get_device_info(self):
+        return DeviceInfo.objects.get(pk=self.asset.device_info_id)
+
+    def test_location_names(self):
+        rack = self.asset.device_info.rack
+        device_info = self.get_device_info()
+        self.assertEqual(device_info.location_rack, rack.name)
+        self.assertEqual(
+            device_info.location_rack_data_center, rack.data_center.name,
+        )
+        self.assertEqual(
+            device_info.location_rack_server_room, rack.server_room.name,
+        )
+        rack.name = 'Renamed rack'
+        rack.save()
+        self.assertEqual(self.get_device_info().location_rack, 'Renamed rack')
+
+    def test_location_complete(self):
+        self.assertTrue(self.get_device_info().location_complete)
+        category = self.asset.model.category
+        category.is_blade = True
+        category.save()
+        self.assertFalse(self.get_device_info().location_complete)
+        device_info = self.get_device_info()
+        device_info.slot_no = '1'
+        device_info.save()
+        self.assertTrue(self.get_device_info().location_complete)
+
+    def test_search_by_location_name(self):
+        rack = self.asset.device_info.rack
+        for value, found in (
+            (rack.name, True),
+            (rack.name[1:], False),
+            (rack.server_room.name, True),
+            ('{}/{}'.format(rack.server_room.name, rack.name), False),
+        ):
+            queryset = Asset.objects.filter(
+                get_search_plan({'location_name': value}).get_query(),
+            )
+            self.assertEqual(queryset.exists(), found)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+
+from django.test import TestCase
+
+from ralph_assets.models_assets import Asset
+from ralph_assets.tests.utils.assets import AssetFactory
+from ralph_assets.views.keyset_pagination import (
+    InvalidCursor,
+    encode_cursor,
+    get_ordering,
+    paginate_keyset,
+)
+
+
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        dates = [None, None, datetime.date(2014, 1, 1)] * 4
+        for date in dates:
+            AssetFactory(invoice_date=date)
+
+    def walk(self, queryset, page_size=5):
+        pages = []
+        cursor = None
+        while True:
+            page = paginate_keyset(queryset, cursor, page_size)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_match_ordered_queryset(self):
+        for sort in ('invoice_date', '-invoice_date', 'barcode'):
+            queryset = Asset.objects.order_by(sort)
+            pages = self.walk(queryset)
+            descending = '-' if sort.startswith('-') else ''
+            self.assertEqual(
+                [asset.id for page in pages for asset in page],
+                list(queryset.order_by(sort, descending + 'id').values_list(
+                    'id', flat=True,
+                )),
+            )
+            self.assertEqual([len(page) for page in pages], [5, 5, 2])
+
+    def test_previous_page(self):
+        queryset = Asset.objects.order_by('invoice_date')
+        pages = self.walk(queryset)
+        previous = paginate_keyset(queryset, pages[2].previous_cursor, 5)
+        self.assertEqual(list(previous), list(pages[1]))
+        first = paginate_keyset(queryset, previous.previous_cursor, 5)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_ordering_by_relation_is_not_supported(self):
+        self.assertIsNone(get_ordering(Asset.objects.order_by('model')))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            paginate_keyset(Asset.objects.all(), 'not a cursor', 5)
+
+    def test_ordering_by_primary_key_keeps_its_direction(self):
+        self.assertEqual(
+            get_ordering(Asset.objects.order_by('-pk')), [('pk', True)],
+        )
+        self.assertEqual(
+            get_ordering(Asset.objects.order_by('barcode', '-id')),
+            [('barcode', False), ('pk', True)],
+        )
+        queryset = Asset.objects.order_by('-id')
+        self.assertEqual(
+            [asset.id for page in self.walk(queryset) for asset in page],
+            list(queryset.values_list('id', flat=True)),
+        )
+
+    def test_cursor_with_values_of_wrong_types_is_invalid(self):
+        queryset = Asset.objects.order_by('invoice_date')
+        for values in (['not a date', 1], [None, 'x'], [None, None]):
+            with self.assertRaises(InvalidCursor):
+                paginate_keyset(queryset, encode_cursor('n', values), 5)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from django.test import TestCase
+
+from ralph_assets.progress import ProgressReporter
+
+
+class FakeJob(object):
+    def __init__(self):
+        self.meta = {'progress': 0, 'start_progress': None}
+        self.saves = 0
+
+    def save(self):
+        self.saves += 1
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgressReporter(TestCase):
+    def setUp(self):
+        self.job = FakeJob()
+        self.clock = FakeClock()
+        self.progress = ProgressReporter(
+            self.job, 1000, interval=0.5, delta=0.01, clock=self.clock,
+        )
+
+    def test_saves_are_throttled_by_delta(self):
+        for _ in range(1000):
+            self.progress.advance()
+        # first row and then every 1%
+        self.assertEqual(self.job.saves, 100)
+        self.progress.finish()
+        self.assertEqual(self.job.meta['progress'], 1)
+
+    def test_saves_are_throttled_by_time(self):
+        self.progress.advance()
+        self.progress.advance()
+        self.assertEqual(self.job.saves, 1)
+        self.clock.now = 0.5
+        self.progress.advance()
+        self.assertEqual(self.job.saves, 2)
+
+    def test_speed_and_eta(self):
+        self.progress.update(0)
+        self.clock.now = 10
+        self.progress.update(100)
+        meta = self.job.meta
+        self.assertEqual(meta['rows_processed'], 100)
+        self.assertEqual(meta['rows_total'], 1000)
+        self.assertEqual(meta['rows_per_second'], 10)
+        self.assertEqual(meta['eta'], 90)
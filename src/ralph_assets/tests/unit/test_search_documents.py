@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from ralph_assets.models_assets import Asset
+from ralph_assets.models_search import AssetSearchDocument
+from ralph_assets.tests.utils.assets import AssetFactory
+from ralph_assets.views import search_fields
+from ralph_assets.views.search_fields import get_search_plan
+
+
+@override_settings(ASSETS_SEARCH_DOCUMENTS=True)
+class TestSearchDocuments(TestCase):
+    def setUp(self):
+        search_fields._search_plans.clear()
+        self.asset = AssetFactory()
+
+    def test_document_is_created_with_asset(self):
+        document = AssetSearchDocument.objects.get(asset=self.asset)
+        self.assertEqual(document.model, self.asset.model.name)
+        self.assertEqual(
+            document.manufacturer, self.asset.model.manufacturer.name,
+        )
+
+    def test_document_follows_related_objects(self):
+        manufacturer = self.asset.model.manufacturer
+        manufacturer.name = 'Renamed manufacturer'
+        manufacturer.save()
+        document = AssetSearchDocument.objects.get(asset=self.asset)
+        self.assertEqual(document.manufacturer, 'Renamed manufacturer')
+
+    def test_search_uses_documents(self):
+        query = get_search_plan({'manufacturer': 'manufacturer'}).get_query()
+        queryset = Asset.objects.filter(query)
+        self.assertIn('search_document', unicode(queryset.query))
+        self.assertEqual(list(queryset), [self.asset])
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import mock
+from django.test import TestCase
+from django.test.utils import override_settings
+from ralph.discovery.models import DeviceType
+from ralph.discovery.tests.util import DeviceFactory, DeviceModelFactory
+
+from ralph_assets.category_index import get_category_index
+from ralph_assets.models_assets import Asset, AssetStatus
+from ralph_assets.models_util import TemporaryValuesTable, with_known_count
+from ralph_assets.search_cache import get_search_count
+from ralph_assets.tests.utils.assets import AssetFactory, DCAssetFactory
+from ralph_assets.views import search_fields
+from ralph_assets.views.search_facets import FACETS, get_facets
+from ralph_assets.views.search_fields import (
+    get_search_plan,
+    get_search_signature,
+)
+
+
+class TestSearchPlan(TestCase):
+    def setUp(self):
+        search_fields._search_plans.clear()
+
+    def test_signature_skips_empty_and_unknown_params(self):
+        signature = get_search_signature({
+            'sn': 'abc',
+            'barcode': '',
+            'not_a_field': 'x',
+            'invoice_date_to': '2014-01-01',
+        })
+        self.assertEqual(signature, (
+            ('invoice_date', (None, '2014-01-01')),
+            ('sn', 'abc'),
+        ))
+
+    def test_plan_is_cached(self):
+        plan = get_search_plan({'sn': 'abc', 'niw': 'x'})
+        self.assertIs(get_search_plan({'niw': 'x', 'sn': 'abc'}), plan)
+        self.assertIsNot(get_search_plan({'sn': 'abcd'}), plan)
+
+    def test_query_is_a_copy(self):
+        plan = get_search_plan({'sn': 'abc'})
+        plan.get_query().children.append(('barcode', 'abc'))
+        self.assertEqual(len(plan.get_query().children), 1)
+
+    def test_lookup_strategies(self):
+        asset = AssetFactory(sn='sn-1234', barcode='bc-1234')
+        AssetFactory(sn='sn-5678', barcode='bc-5678')
+        cases = [
+            ({'sn': '1234'}, [asset.id]),
+            ({'sn': '"sn-1234"'}, [asset.id]),
+            ({'sn': '"1234"'}, []),
+            ({'barcode': 'bc-1234;bc-0000'}, [asset.id]),
+            ({'id': '{}'.format(asset.id)}, [asset.id]),
+        ]
+        for params, expected in cases:
+            query = get_search_plan(params).get_query()
+            self.assertEqual(
+                list(Asset.objects.filter(query).values_list('id', flat=True)),
+                expected,
+            )
+
+    def test_multi_value_search(self):
+        asset = AssetFactory(barcode='bc-1')
+        AssetFactory(barcode='bc-2')
+        params = {'barcode': 'bc-1;bc-3;bc-1'}
+        plan = get_search_plan(params)
+        queryset = Asset.objects.filter(plan.get_query())
+        self.assertEqual(list(queryset), [asset])
+        self.assertEqual(
+            plan.get_missing_values(queryset), [('barcode', ['bc-3'])],
+        )
+
+    @mock.patch.object(search_fields, 'SEARCH_TEMP_TABLE_THRESHOLD', 1)
+    def test_long_list_is_joined_from_temporary_table(self):
+        asset = AssetFactory(sn='sn-1')
+        AssetFactory(sn='sn-2')
+        plan = get_search_plan({'sn': 'sn-1|sn-3'})
+        self.assertEqual(len(plan.deferred), 1)
+        with TemporaryValuesTable(Asset) as table:
+            view = mock.Mock(temporary_values=table)
+            queryset = Asset.objects.filter(plan.get_query(view=view))
+            self.assertIn(
+                'ralph_assets_temporary_value', unicode(queryset.query),
+            )
+            self.assertEqual(list(queryset), [asset])
+            self.assertEqual(
+                plan.get_missing_values(queryset), [('sn', ['sn-3'])],
+            )
+        # outside of the block values are sent as params
+        queryset = Asset.objects.filter(plan.get_query(view=view))
+        self.assertNotIn(
+            'ralph_assets_temporary_value', unicode(queryset.query),
+        )
+        self.assertEqual(list(queryset), [asset])
+
+    @mock.patch.object(search_fields, 'SEARCH_TEMP_TABLE_THRESHOLD', 1)
+    def test_long_lists_are_joined_from_own_tables(self):
+        asset = AssetFactory(sn='sn-1', barcode='bc-1')
+        AssetFactory(sn='sn-2', barcode='bc-2')
+        plan = get_search_plan({'sn': 'sn-1|sn-2', 'barcode': 'bc-1|bc-3'})
+        with TemporaryValuesTable(Asset) as table:
+            view = mock.Mock(temporary_values=table)
+            queryset = Asset.objects.filter(plan.get_query(view=view))
+            sql = unicode(queryset.query)
+            self.assertEqual(len(table.tables), 2)
+            for model in table.tables:
+                self.assertIn(model._meta.db_table, sql)
+            self.assertEqual(list(queryset), [asset])
+
+    def test_block_without_lists_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            with TemporaryValuesTable(Asset):
+                pass
+
+    def test_core_device_filters_are_subqueries(self):
+        device = DeviceFactory(
+            model=DeviceModelFactory(
+                name='Server', type=DeviceType.rack_server,
+            ),
+        )
+        asset = DCAssetFactory(device_info__ralph_device_id=device.id)
+        DCAssetFactory()
+        for params in (
+            {'device_model_type': str(DeviceType.rack_server.id)},
+            {'discovered': 'yes'},
+        ):
+            plan = get_search_plan(params)
+            self.assertEqual(plan.deferred, [])
+            queryset = Asset.objects.filter(plan.get_query())
+            self.assertIn('discovery_device', unicode(queryset.query))
+            self.assertEqual(list(queryset), [asset])
+
+
+class TestCountedQuerySet(TestCase):
+    def setUp(self):
+        AssetFactory()
+        AssetFactory()
+
+    def test_count_is_shared_by_ordered_clones(self):
+        queryset = with_known_count(Asset.objects.all(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(queryset.order_by('-id').count(), 2)
+            self.assertEqual(queryset.select_related('model').count(), 2)
+
+    def test_count_is_forgotten_when_query_changes(self):
+        queryset = with_known_count(Asset.objects.all(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(queryset.filter(id=0).count(), 0)
+
+
+@override_settings(ASSETS_SEARCH_CACHE_TIMEOUT=60)
+class TestSearchCache(TestCase):
+    def test_count_is_invalidated_by_related_objects(self):
+        asset = DCAssetFactory()
+        queryset = Asset.objects.filter(device_info__ralph_device_id=654321)
+        self.assertEqual(get_search_count(queryset), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_search_count(queryset), 0)
+        asset.device_info.ralph_device_id = 654321
+        asset.device_info.save()
+        self.assertEqual(get_search_count(queryset), 1)
+
+
+class TestSearchFacets(TestCase):
+    def test_facets_are_counted_with_one_query(self):
+        AssetFactory(status=AssetStatus.new)
+        AssetFactory(status=AssetStatus.new)
+        AssetFactory(status=AssetStatus.used)
+        get_category_index()
+        # and one for the version of categories index (with local cache)
+        with self.assertNumQueries(2):
+            facets = dict(
+                (facet.name, values)
+                for facet, values in get_facets(Asset.objects.all())
+            )
+        self.assertEqual(facets['status'], [
+            (AssetStatus.new.id, AssetStatus.new.desc, 2),
+            (AssetStatus.used.id, AssetStatus.used.desc, 1),
+        ])
+        self.assertEqual(
+            sum(count for _, _, count in facets['warehouse']), 3,
+        )
+
+    @mock.patch.object(search_fields, 'SEARCH_TEMP_TABLE_THRESHOLD', 1)
+    def test_facets_of_long_lists_are_counted_per_facet(self):
+        AssetFactory(sn='sn-1', status=AssetStatus.new)
+        AssetFactory(sn='sn-2', status=AssetStatus.used)
+        get_category_index()
+        plan = get_search_plan({'sn': 'sn-1|sn-3'})
+        with TemporaryValuesTable(Asset) as table:
+            view = mock.Mock(temporary_values=table)
+            queryset = Asset.objects.filter(plan.get_query(view=view))
+            with self.assertNumQueries(len(FACETS) + 1):
+                facets = dict(
+                    (facet.name, values)
+                    for facet, values in get_facets(queryset)
+                )
+        self.assertEqual(facets['status'], [
+            (AssetStatus.new.id, AssetStatus.new.desc, 1),
+        ])
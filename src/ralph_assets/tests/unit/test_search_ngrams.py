@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from ralph_assets.models_assets import Asset
+from ralph_assets.models_search import (
+    AssetNgram,
+    get_ngram_candidates,
+    get_ngrams,
+)
+from ralph_assets.tests.utils.assets import AssetFactory
+from ralph_assets.views import search_fields
+from ralph_assets.views.search_fields import get_search_plan
+
+
+class TestGetNgrams(TestCase):
+    def test_distinct_lowercased_ngrams(self):
+        self.assertEqual(get_ngrams('AbAbA'), ['aba', 'bab'])
+
+    def test_short_values(self):
+        self.assertEqual(get_ngrams('ab'), [])
+        self.assertEqual(get_ngrams(None), [])
+
+
+@override_settings(ASSETS_SEARCH_NGRAMS=True)
+class TestNgramIndex(TestCase):
+    def setUp(self):
+        search_fields._search_plans.clear()
+        self.asset = AssetFactory(sn='SN-XYZ-12345')
+        self.other = AssetFactory(sn='SN-ABC-67890')
+
+    def test_index_follows_asset(self):
+        self.assertTrue(AssetNgram.objects.filter(
+            asset=self.asset, ngram='xyz',
+        ).exists())
+        self.asset.sn = 'SN-QQQ-12345'
+        self.asset.save()
+        self.assertFalse(AssetNgram.objects.filter(
+            asset=self.asset, ngram='xyz',
+        ).exists())
+
+    def test_candidates(self):
+        self.assertEqual(get_ngram_candidates('sn', 'xyz-1'), [self.asset.pk])
+        self.assertEqual(
+            sorted(get_ngram_candidates('sn', 'sn-')),
+            sorted([self.asset.pk, self.other.pk]),
+        )
+        self.assertIsNone(get_ngram_candidates('sn', 'xy'))
+        self.assertIsNone(get_ngram_candidates('order_no', 'xyz'))
+
+    def test_search_is_narrowed(self):
+        plan = get_search_plan({'sn': 'xyz-123'})
+        self.assertEqual(len(plan.deferred), 1)
+        queryset = Asset.objects.filter(plan.get_query())
+        self.assertEqual(list(queryset), [self.asset])
+        queryset = Asset.objects.filter(
+            get_search_plan({'sn': '12345-'}).get_query(),
+        )
+        self.assertEqual(list(queryset), [])
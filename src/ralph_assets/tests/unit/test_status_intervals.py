@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ralph_assets.history.models import History
+from ralph_assets.models_assets import Asset, AssetStatus
+from ralph_assets.models_status import (
+    AssetStatusInterval,
+    get_liquidated_ids,
+)
+from ralph_assets.tests.utils.assets import AssetFactory
+
+
+class TestStatusIntervals(TestCase):
+    def setUp(self):
+        self.asset = AssetFactory(status=AssetStatus.new)
+        self.today = datetime.date.today()
+
+    def get_intervals(self):
+        return list(AssetStatusInterval.objects.filter(
+            asset=self.asset,
+        ).order_by('id').values_list('status', 'valid_from', 'valid_to'))
+
+    def test_status_changes_are_tracked(self):
+        self.asset.status = AssetStatus.used
+        self.asset.save()
+        self.asset.remarks = 'not a status change'
+        self.asset.save()
+        self.assertEqual(self.get_intervals(), [
+            (AssetStatus.new.id, self.today, self.today),
+            (AssetStatus.used.id, self.today, None),
+        ])
+        self.assertEqual(
+            list(AssetStatusInterval.objects.on(self.today).values_list(
+                'status', flat=True,
+            )),
+            [AssetStatus.used.id],
+        )
+
+    def test_rebuild_from_history(self):
+        self.asset.status = AssetStatus.liquidated
+        self.asset.save()
+        status_history = History.objects.filter(
+            object_id=self.asset.id, field_name='status',
+        )
+        status_history.filter(new_value='new').update(
+            date=datetime.datetime(2014, 1, 1, 12),
+        )
+        status_history.filter(new_value='liquidated').update(
+            date=datetime.datetime(2014, 3, 1, 12),
+        )
+        Asset.admin_objects.filter(pk=self.asset.pk).update(
+            created=datetime.datetime(2014, 1, 1),
+        )
+        AssetStatusInterval.objects.all().delete()
+        call_command('rebuild_status_intervals')
+        self.assertEqual(self.get_intervals(), [
+            (
+                AssetStatus.new.id,
+                datetime.date(2014, 1, 1),
+                datetime.date(2014, 3, 1),
+            ),
+            (AssetStatus.liquidated.id, datetime.date(2014, 3, 1), None),
+        ])
+        liquidated = AssetStatusInterval.objects.liquidated_by(
+            datetime.date(2014, 3, 1),
+        )
+        self.assertEqual(
+            list(liquidated.values_list('asset', flat=True)), [self.asset.id],
+        )
+        self.assertFalse(self.asset.is_liquidated(datetime.date(2014, 2, 28)))
+
+    def _liquidate_before_tracking(self):
+        """Liquidates the asset on 2014-03-01 as if intervals weren't
+        tracked then."""
+        self.asset.status = AssetStatus.liquidated
+        self.asset.save()
+        status_history = History.objects.filter(
+            object_id=self.asset.id, field_name='status',
+        )
+        status_history.filter(new_value='new').update(
+            date=datetime.datetime(2014, 1, 1, 12),
+        )
+        status_history.filter(new_value='liquidated').update(
+            date=datetime.datetime(2014, 3, 1, 12),
+        )
+        Asset.admin_objects.filter(pk=self.asset.pk).update(
+            created=datetime.datetime(2014, 1, 1),
+        )
+        AssetStatusInterval.objects.all().delete()
+
+    def test_liquidation_without_intervals_is_read_from_history(self):
+        self._liquidate_before_tracking()
+        self.assertEqual(
+            get_liquidated_ids([self.asset.id], datetime.date(2014, 3, 1)),
+            set([self.asset.id]),
+        )
+        self.assertEqual(
+            get_liquidated_ids([self.asset.id], datetime.date(2014, 2, 28)),
+            set(),
+        )
+        self.assertTrue(self.asset.is_liquidated(datetime.date(2014, 3, 2)))
+
+    def test_intervals_are_rebuilt_on_first_save(self):
+        self._liquidate_before_tracking()
+        asset = Asset.admin_objects.get(pk=self.asset.pk)
+        asset.status = AssetStatus.used
+        asset.save()
+        self.assertEqual(self.get_intervals(), [
+            (AssetStatus.new.id, datetime.date(2014, 1, 1),
+             datetime.date(2014, 3, 1)),
+            (AssetStatus.liquidated.id, datetime.date(2014, 3, 1), self.today),
+            (AssetStatus.used.id, self.today, None),
+        ])
@@ -5,9 +5,29 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from django.test import TestCase
+import datetime
 
-from ralph_assets.tests.utils.assets import DeviceInfoFactory
+import mock
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from ralph.ui.tests.global_utils import UserFactory
+
+from ralph_assets.history.asof import get_values_as_of
+from ralph_assets.history.buffer import buffered_history
+from ralph_assets.history.cache import get_recent_history
+from ralph_assets.history.models import (
+    History,
+    HistoryArchive,
+    get_current_m2m_values,
+    get_previous_m2m_values,
+)
+from ralph_assets.models_assets import Asset, AssetStatus
+from ralph_assets.models_dc_assets import DeviceInfo
+from ralph_assets.templatetags.history_tags import status_history
+from ralph_assets.tests.utils.assets import AssetFactory, DeviceInfoFactory
+from ralph_assets.tests.utils.supports import DCSupportFactory
 
 
 class HistoryTestCase(TestCase):
@@ -17,3 +37,233 @@ class HistoryTestCase(TestCase):
         device_info.position += 1
         device_info.save()
         self.assertEqual(old_length + 1, len(device_info.get_history()))
+
+    def test_change_is_diffed_against_loaded_values(self):
+        device_info = DeviceInfo.objects.get(pk=DeviceInfoFactory().pk)
+        old_position = device_info.position
+        device_info.position += 1
+        device_info.save()
+        history = device_info.get_history(field_name='position')[0]
+        self.assertEqual(history.old_value, unicode(old_position))
+        self.assertEqual(history.new_value, unicode(old_position + 1))
+        # the next save is compared with values saved before
+        length = len(device_info.get_history())
+        device_info.save()
+        self.assertEqual(len(device_info.get_history()), length)
+
+    def test_only_tracked_values_are_remembered(self):
+        device_info = DeviceInfo.objects.get(pk=DeviceInfoFactory().pk)
+        self.assertIn('position', device_info._history_values)
+        self.assertNotIn('modified', device_info._history_values)
+        self.assertNotIn('_state', device_info._history_values)
+
+    def test_deferred_fields_are_not_logged(self):
+        device_info = DeviceInfo.objects.only('position').get(
+            pk=DeviceInfoFactory().pk,
+        )
+        old_length = len(device_info.get_history())
+        device_info.position += 1
+        device_info.save()
+        self.assertEqual(old_length + 1, len(device_info.get_history()))
+        self.assertEqual(
+            len(device_info.get_history(field_name='position')), 1,
+        )
+
+
+class BufferedHistoryTestCase(TestCase):
+    def setUp(self):
+        self.device_infos = [DeviceInfoFactory() for _ in range(3)]
+
+    def change_positions(self):
+        for device_info in self.device_infos:
+            device_info.position += 1
+            device_info.save()
+
+    def test_entries_are_written_at_the_end(self):
+        old_count = History.objects.count()
+        with buffered_history():
+            with buffered_history():
+                self.change_positions()
+            self.assertEqual(History.objects.count(), old_count)
+        self.assertEqual(History.objects.count(), old_count + 3)
+
+    def test_entries_are_dropped_on_error(self):
+        old_count = History.objects.count()
+        with self.assertRaises(ValueError):
+            with buffered_history():
+                self.change_positions()
+                raise ValueError()
+        self.assertEqual(History.objects.count(), old_count)
+
+    @mock.patch('ralph_assets.history.buffer.HISTORY_FLUSH_QUEUE', 'history')
+    @mock.patch('ralph_assets.history.buffer.django_rq')
+    def test_entries_are_written_in_current_transaction(self, django_rq):
+        old_count = History.objects.count()
+        with buffered_history():
+            self.change_positions()
+        self.assertEqual(History.objects.count(), old_count + 3)
+        self.assertFalse(django_rq.get_queue.called)
+
+
+class QueuedHistoryTestCase(TransactionTestCase):
+    @mock.patch('ralph_assets.history.buffer.HISTORY_FLUSH_QUEUE', 'history')
+    @mock.patch('ralph_assets.history.buffer.django_rq')
+    def test_entries_are_enqueued_after_commit(self, django_rq):
+        device_info = DeviceInfoFactory()
+        old_count = History.objects.count()
+        queue = django_rq.get_queue.return_value
+        queue.enqueue.side_effect = lambda *args: self.assertFalse(
+            transaction.is_managed(),
+        )
+        with buffered_history():
+            device_info.position += 1
+            device_info.save()
+        self.assertEqual(History.objects.count(), old_count)
+        func, rows = queue.enqueue.call_args[0]
+        self.assertEqual(
+            [(row['object_id'], row['field_name']) for row in rows],
+            [(device_info.pk, 'position')],
+        )
+        func(rows)
+        self.assertEqual(History.objects.count(), old_count + 1)
+
+
+class M2MHistoryTestCase(TestCase):
+    def setUp(self):
+        self.supports = [DCSupportFactory() for _ in range(2)]
+        self.assets = [AssetFactory() for _ in range(2)]
+
+    def test_current_values_of_many_objects(self):
+        self.supports[0].assets.add(*self.assets)
+        values = get_current_m2m_values(self.supports, 'assets')
+        self.assertEqual(values.keys(), [self.supports[0].pk])
+        self.assertEqual(
+            sorted(values[self.supports[0].pk]),
+            sorted(asset.pk for asset in self.assets),
+        )
+
+    def test_previous_values_of_many_objects(self):
+        self.supports[0].assets.add(self.assets[0])
+        self.supports[1].assets.add(self.assets[1])
+        self.supports[0].assets.add(self.assets[1])
+        values = get_previous_m2m_values(self.supports, 'assets')
+        self.assertEqual(
+            sorted(values[self.supports[0].pk]),
+            sorted(asset.pk for asset in self.assets),
+        )
+        self.assertEqual(values[self.supports[1].pk], [self.assets[1].pk])
+
+    def test_previous_values_include_buffered_entries(self):
+        with buffered_history():
+            self.supports[0].assets.add(self.assets[0])
+            self.assertEqual(
+                get_previous_m2m_values(self.supports, 'assets'),
+                {self.supports[0].pk: [self.assets[0].pk]},
+            )
+
+
+class HistoryArchiveTestCase(TestCase):
+    def test_old_entries_are_archived(self):
+        device_info = DeviceInfoFactory()
+        for position in (1, 2):
+            device_info.position = position
+            device_info.save()
+        old_entry = device_info.get_history(field_name='position')[1]
+        History.objects.filter(pk=old_entry.pk).update(
+            date=datetime.datetime(2000, 1, 1),
+        )
+        call_command('archive_history', months=12)
+        self.assertEqual(
+            list(HistoryArchive.objects.values_list('id', flat=True)),
+            [old_entry.pk],
+        )
+        self.assertEqual(
+            len(device_info.get_history(field_name='position')), 1,
+        )
+        full_history = device_info.get_history(
+            field_name='position', include_archive=True,
+        )
+        self.assertEqual(
+            [entry.new_value for entry in full_history], ['2', '1'],
+        )
+        self.assertEqual(full_history.count(), 2)
+        self.assertEqual(
+            [entry.new_value for entry in full_history[1:2]], ['1'],
+        )
+
+    def test_archived_m2m_values_are_previous_values(self):
+        support = DCSupportFactory()
+        asset = AssetFactory()
+        support.assets.add(asset)
+        History.objects.update(date=datetime.datetime(2000, 1, 1))
+        call_command('archive_history', months=12)
+        self.assertFalse(History.objects.filter(field_name='assets').exists())
+        self.assertEqual(
+            get_previous_m2m_values([support], 'assets'),
+            {support.pk: [asset.pk]},
+        )
+
+
+class AsOfTestCase(TestCase):
+    def test_values_are_rebuilt_from_history(self):
+        assets = [
+            AssetFactory(status=AssetStatus.new, remarks='first')
+            for _ in range(3)
+        ]
+        History.objects.update(date=datetime.datetime(2014, 1, 1))
+        for asset in assets[:2]:
+            asset.status = AssetStatus.used
+            asset.remarks = 'second'
+            asset.save()
+        History.objects.filter(date__gt=datetime.datetime(2014, 1, 1)).update(
+            date=datetime.datetime(2014, 6, 1),
+        )
+        queryset = Asset.objects.filter(pk__in=[asset.pk for asset in assets])
+        fields = ('status', 'remarks')
+        before = list(get_values_as_of(
+            queryset, datetime.datetime(2014, 3, 1), fields, batch_size=2,
+        ))
+        after = list(get_values_as_of(
+            queryset, datetime.datetime(2014, 9, 1), fields, batch_size=2,
+        ))
+        self.assertEqual(
+            [(row['id'], row['status'], row['remarks']) for row in before],
+            [(asset.pk, 'new', 'first') for asset in assets],
+        )
+        self.assertEqual(
+            [(row['status'], row['remarks']) for row in after],
+            [('in use', 'second'), ('in use', 'second'), ('new', 'first')],
+        )
+
+    def test_current_values_have_the_form_of_history(self):
+        asset = AssetFactory(owner=None, price=0)
+        queryset = Asset.objects.filter(pk=asset.pk)
+        fields = ('owner', 'price')
+        date = datetime.datetime.now()
+        before = list(get_values_as_of(queryset, date, fields))
+        asset.owner = UserFactory()
+        asset.price = 10
+        asset.save()
+        History.objects.filter(object_id=asset.pk).update(
+            date=date + datetime.timedelta(seconds=1),
+        )
+        after = list(get_values_as_of(queryset, date, fields))
+        self.assertEqual(after, before)
+
+
+@override_settings(ASSETS_HISTORY_CACHE_TIMEOUT=60)
+class RecentHistoryTestCase(TransactionTestCase):
+    def test_latest_entries_follow_new_history(self):
+        asset = AssetFactory(status=AssetStatus.new)
+        for status in (AssetStatus.used, AssetStatus.damaged):
+            asset.status = status
+            asset.save()
+        context = status_history(asset, limit=2)
+        self.assertEqual(
+            [entry.new_value for entry in context['history']],
+            ['damaged', 'in use'],
+        )
+        asset.status = AssetStatus.in_repair
+        asset.save()
+        latest = get_recent_history(asset, field_name='status', limit=1)
+        self.assertEqual(latest[0].new_value, 'in repair')
@@ -372,6 +372,25 @@ class TestLinkedDevice(TestCase):
         self.assertEqual(dc_asset.find_device_to_link(), device_to_check)
 
 
+class TestPrefetchRalphDevices(TestCase):
+    def setUp(self):
+        for _ in range(3):
+            core_device = DeviceFactory()
+            DCAssetFactory(
+                device_info=DeviceInfoFactory(ralph_device_id=core_device.id),
+            )
+        DCAssetFactory(device_info=DeviceInfoFactory(ralph_device_id=None))
+
+    def test_devices_are_loaded_in_bulk(self):
+        assets = models_assets.prefetch_ralph_devices(
+            models_assets.Asset.objects.all(),
+        )
+        with self.assertNumQueries(0):
+            linked = [asset.linked_device for asset in assets]
+            [asset.venture for asset in assets]
+        self.assertEqual(len(filter(None, linked)), 3)
+
+
 class TestDeviceInfoValidation(TestCase):
 
     def setUp(self):
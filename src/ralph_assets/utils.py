@@ -5,6 +5,9 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import threading
+from collections import OrderedDict
+
 from ajax_select.fields import AutoCompleteSelectField
 from django import forms
 from django.forms.models import modelformset_factory
@@ -116,3 +119,36 @@ def assigned_formset_factory(obj, base_model, field, lookup,
         can_delete=False,
     )
     return formset
+
+
+class LRUCache(object):
+    """Small thread-safe in-process cache which evicts the least recently
+    used entry when *max_size* is exceeded."""
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
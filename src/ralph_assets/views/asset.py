@@ -8,10 +8,10 @@ from __future__ import unicode_literals
 import logging
 
 from django.contrib import messages
-from django.db import transaction
 from django.http import HttpResponseRedirect
 from django.utils.translation import ugettext_lazy as _
 
+from ralph_assets.history.buffer import buffered_history
 from ralph_assets.models import Asset
 from ralph_assets.models_assets import AssetType
 from ralph_assets.views.base import (
@@ -108,7 +108,7 @@ class AssetBulkEdit(
                     )
 
     def save_formset(self, instances, formset):
-        with transaction.commit_on_success():
+        with buffered_history():
             for idx, instance in enumerate(instances):
                 instance.modified_by = self.request.user.get_profile()
                 instance.save(user=self.request.user)
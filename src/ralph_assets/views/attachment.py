@@ -114,12 +114,16 @@ class AddAttachment(BaseAttachment):
             self.request.POST, self.request.FILES,
         )
         if self.attachments_formset.is_valid():
+            parents = list(self.selected_parents)
+            # parents are added at once from attachment's side of relation
+            parents_accessor = self.Parent._meta.get_field(
+                'attachments',
+            ).related.get_accessor_name()
             for form in self.attachments_formset.forms:
                 attachment = form.save(commit=False)
                 attachment.uploaded_by = self.request.user
                 form.save()
-                for parent in self.selected_parents:
-                    parent.attachments.add(attachment)
+                getattr(attachment, parents_accessor).add(*parents)
             messages.success(self.request, _("Changes saved."))
             return HttpResponseRedirect(self.get_back_url(self.parent_name))
         messages.error(self.request, _("Please correct the errors."))
@@ -29,6 +29,7 @@ from ralph_assets.app import Assets as app
 from ralph_assets.models_assets import AssetType
 from ralph_assets.models import Asset
 from ralph_assets.forms import OfficeForm
+from ralph_assets.views.keyset_pagination import KeysetPaginationMixin
 
 MAX_PAGE_SIZE = 65535
 HISTORY_PAGE_SIZE = 25
@@ -258,7 +259,7 @@ class JsonResponseMixin(object):
         )
 
 
-class PaginateMixin(object):
+class PaginateMixin(KeysetPaginationMixin):
     paginate_queryset = None
     query_variable_name = 'page'
 
@@ -272,22 +273,24 @@ class PaginateMixin(object):
 
     def get_context_data(self, **kwargs):
         context = super(PaginateMixin, self).get_context_data(**kwargs)
-        try:
-            page = int(self.request.GET.get(self.query_variable_name, 1))
-        except ValueError:
-            page = 1
-        if page == 0:
-            page = 1
-            page_size = MAX_PAGE_SIZE
-        else:
-            page_size = HISTORY_PAGE_SIZE
-        page_content = Paginator(
-            self.get_paginate_queryset(), page_size
-        ).page(page)
+        queryset = self.get_paginate_queryset()
+        page_content = self.paginate_by_cursor(queryset, HISTORY_PAGE_SIZE)
+        if page_content is None:
+            try:
+                page = int(self.request.GET.get(self.query_variable_name, 1))
+            except ValueError:
+                page = 1
+            if page == 0:
+                page = 1
+                page_size = MAX_PAGE_SIZE
+            else:
+                page_size = HISTORY_PAGE_SIZE
+            page_content = Paginator(queryset, page_size).page(page)
         context.update({
             'page_content': page_content,
             'query_variable_name': self.query_variable_name,
         })
+        context.setdefault('url_query', self.request.GET)
         return context
 
 
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""CSV export without keeping all the rows in memory.
+
+Rows are encoded one by one and either streamed straight to the HTTP
+response or spooled to a file (when the export runs as an rq job, so only the
+file's path goes through Redis). Spooled files live as long as results of rq
+jobs (so the export can be downloaded again while its job is known) - expired
+ones are removed whenever a new file is spooled.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import cStringIO
+import glob
+import logging
+import os
+import tempfile
+import time
+
+from bob.csvutil import UnicodeWriter
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:
+    # Django < 1.5 streams HttpResponse's content given as an iterator
+    StreamingHttpResponse = HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+# the same encoding as in bob.csvutil.make_csv_response
+CSV_ENCODING = 'cp1250'
+SPOOL_BLOCK_SIZE = 64 * 1024
+SPOOL_PREFIX = 'assets-export-'
+SPOOL_SUFFIX = '.csv'
+# seconds - rq keeps results of jobs (paths of files) for 500 by default
+SPOOL_TTL = getattr(settings, 'ASSETS_CSV_EXPORT_SPOOL_TTL', 500)
+
+
+def get_export_mode():
+    """Returns one of:
+
+    - ``report`` - rq job returns all rows (pickled into Redis),
+    - ``spool`` - rq job writes the CSV to a file in
+      ``ASSETS_REPORTS['TEMP_STORAGE_PATH']`` and returns its path,
+    - ``stream`` - no rq job, CSV is streamed in the response.
+    """
+    return getattr(settings, 'ASSETS_CSV_EXPORT_MODE', 'report')
+
+
+def encode_csv_lines(rows, encoding=CSV_ENCODING):
+    """Yields encoded CSV line for each row from *rows*."""
+    buf = cStringIO.StringIO()
+    writer = UnicodeWriter(buf, encoding=encoding)
+    for row in rows:
+        writer.writerow([unicode(item) for item in row])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def _set_attachment(response, filename):
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
+
+
+def make_streaming_csv_response(rows, filename):
+    response = StreamingHttpResponse(
+        encode_csv_lines(rows), content_type='application/csv',
+    )
+    return _set_attachment(response, filename)
+
+
+def remove_expired_spools(directory, ttl=SPOOL_TTL):
+    """Removes files spooled to *directory* more than *ttl* seconds ago."""
+    expired = time.time() - ttl
+    pattern = os.path.join(directory, SPOOL_PREFIX + '*' + SPOOL_SUFFIX)
+    for path in glob.glob(pattern):
+        try:
+            if os.path.getmtime(path) < expired:
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Can't remove spooled export {}: {}".format(
+                path, e,
+            ))
+
+
+def spool_csv(rows, directory=None):
+    """Writes *rows* as CSV to a new file and returns its path."""
+    directory = directory or settings.ASSETS_REPORTS['TEMP_STORAGE_PATH']
+    remove_expired_spools(directory)
+    fd, path = tempfile.mkstemp(
+        prefix=SPOOL_PREFIX, suffix=SPOOL_SUFFIX, dir=directory,
+    )
+    with os.fdopen(fd, 'wb') as f:
+        for line in encode_csv_lines(rows):
+            f.write(line)
+    return path
+
+
+def _read_blocks(f):
+    with f:
+        while True:
+            block = f.read(SPOOL_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def make_spooled_csv_response(path, filename):
+    """Streams file created by :func:`spool_csv` (which is kept for next
+    downloads until it expires)."""
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        raise Http404
+    response = StreamingHttpResponse(
+        _read_blocks(f), content_type='application/csv',
+    )
+    return _set_attachment(response, filename)
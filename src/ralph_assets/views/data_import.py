@@ -12,7 +12,6 @@ from django.core.files.storage import FileSystemStorage
 from django.contrib.auth.models import User
 from django.contrib.formtools.wizard.views import SessionWizardView
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
-from django.db import transaction
 from django.db.models.fields import (
     BooleanField,
     CharField,
@@ -28,11 +27,13 @@ from lck.django.common.models import Named
 from ralph.account.models import Region
 from ralph.discovery.models_device import DeviceEnvironment, ServiceCatalog
 
+from ralph_assets.category_index import get_category_index
 from ralph_assets.forms_import import (
     ColumnChoiceField,
     get_model_by_name,
     get_amendment_model,
 )
+from ralph_assets.history.buffer import buffered_history
 from ralph_assets.models_assets import (
     MODE2ASSET_TYPE,
     ASSET_TYPE2MODE,
@@ -251,7 +252,7 @@ class XlsUploadView(SessionWizardView, AssetsBase):
             value = [value]
         return value
 
-    @transaction.commit_on_success
+    @buffered_history()
     def done(self, form_list):
         mappings = self.storage.data['mappings']
         names_per_sheet, update_per_sheet, add_per_sheet =\
@@ -389,6 +390,17 @@ class XlsUploadView(SessionWizardView, AssetsBase):
             ctx_data
         )
 
+    def get_category(self, name):
+        """Returns category named *name* for the current mode, found in the
+        category index (instances are reused during the import)."""
+        node = get_category_index().find(
+            name, MODE2ASSET_CATEGORY_TYPE[self.mode],
+        )
+        categories = self.__dict__.setdefault('_categories', {})
+        if node.slug not in categories:
+            categories[node.slug] = AssetCategory.objects.get(pk=node.slug)
+        return categories[node.slug]
+
     def get_or_create_model(self, data):
         """Update/add AssetModel and clear asset_data from its fields.
 
@@ -414,10 +426,7 @@ class XlsUploadView(SessionWizardView, AssetsBase):
         kwargs = {'name': model, 'type': MODE2ASSET_TYPE[self.mode]}
 
         if category:
-            category = AssetCategory.objects.get(
-                name=category,
-                type=MODE2ASSET_CATEGORY_TYPE[self.mode],
-            )
+            category = self.get_category(category)
         else:
             category = None
         kwargs['category'] = category
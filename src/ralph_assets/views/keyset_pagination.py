@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Keyset (seek) pagination.
+
+Instead of a page number, links carry an opaque cursor with the sort key and
+primary key of the last (or first) row shown, and the next page is fetched
+with ``WHERE (sort key, pk) > (cursor)`` - which costs the same for every
+page, unlike ``OFFSET`` which scans all the skipped rows.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import base64
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.fields.related import RelatedField
+
+
+KEYSET_PAGINATION = getattr(settings, 'ASSETS_KEYSET_PAGINATION', False)
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return unicode(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def encode_cursor(direction, values):
+    data = json.dumps([direction, values], default=_json_default)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).rstrip(b'=')
+
+
+def decode_cursor(cursor):
+    """Returns (direction, values) encoded in *cursor*."""
+    try:
+        data = base64.urlsafe_b64decode(
+            str(cursor) + b'=' * (-len(cursor) % 4),
+        )
+        direction, values = json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def get_ordering(queryset):
+    """Returns ordering of *queryset* as a list of (field path, descending)
+    pairs ending with the primary key, or None if it can't be used for
+    keyset pagination (e.g. it's ordered by relation or by extra field, or
+    it's a list)."""
+    query = getattr(queryset, 'query', None)
+    if query is None:
+        return None
+    if query.order_by:
+        order_by = list(query.order_by)
+    elif query.default_ordering:
+        order_by = list(query.model._meta.ordering)
+    else:
+        order_by = []
+    ordering = []
+    for item in order_by:
+        if not isinstance(item, basestring) or item == '?':
+            return None
+        descending = item.startswith('-')
+        path = item.lstrip('-')
+        if path == 'pk' or path == query.model._meta.pk.name:
+            # rows are unique from here on
+            ordering.append(('pk', descending))
+            return ordering
+        if not _is_concrete_path(query.model, path):
+            return None
+        ordering.append((path, descending))
+    pk_descending = ordering[-1][1] if ordering else False
+    ordering.append(('pk', pk_descending))
+    return ordering
+
+
+def _is_concrete_path(model, path):
+    parts = path.split('__')
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return False
+        is_relation = isinstance(field, RelatedField)
+        if index == len(parts) - 1:
+            return not is_relation
+        if not is_relation:
+            return False
+        model = field.rel.to
+    return False
+
+
+def _get_field(model, path):
+    if path == 'pk':
+        return model._meta.pk
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).rel.to
+    return model._meta.get_field(parts[-1])
+
+
+def _convert_values(model, ordering, values):
+    """Returns *values* of a cursor converted to types of *ordering* fields
+    of *model*.
+
+    :raises InvalidCursor: when values don't match the fields
+    """
+    if len(values) != len(ordering):
+        raise InvalidCursor(values)
+    converted = []
+    for (path, descending), value in zip(ordering, values):
+        field = _get_field(model, path)
+        if value is None:
+            if path == 'pk' or not field.null:
+                raise InvalidCursor(values)
+        elif isinstance(value, (list, dict)):
+            raise InvalidCursor(values)
+        else:
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor(values)
+        converted.append(value)
+    return converted
+
+
+def _get_value(obj, path):
+    if path == 'pk':
+        return obj.pk
+    for part in path.split('__'):
+        obj = getattr(obj, part, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _nulls_first(descending):
+    # NULL is the smallest value in MySQL and SQLite, the biggest in Postgres
+    nulls_smallest = connection.vendor != 'postgresql'
+    return nulls_smallest != descending
+
+
+def _after(path, value, descending):
+    """Q of rows placed after *value* of *path* in the ordering."""
+    nulls_first = _nulls_first(descending)
+    if value is None:
+        if nulls_first:
+            return Q(**{'{}__isnull'.format(path): False})
+        return Q(pk__isnull=True)  # nothing
+    lookup = 'lt' if descending else 'gt'
+    q = Q(**{'{}__{}'.format(path, lookup): value})
+    if not nulls_first:
+        q |= Q(**{'{}__isnull'.format(path): True})
+    return q
+
+
+def _equal(path, value):
+    if value is None:
+        return Q(**{'{}__isnull'.format(path): True})
+    return Q(**{path: value})
+
+
+def get_keyset_query(ordering, values):
+    """Q of rows placed after *values* (one per *ordering* item)."""
+    query = None
+    equal = Q()
+    for (path, descending), value in zip(ordering, values):
+        part = equal & _after(path, value, descending)
+        query = part if query is None else query | part
+        equal &= _equal(path, value)
+    return query
+
+
+class KeysetPage(object):
+    """Page of keyset pagination - provides cursors of adjacent pages."""
+    cursor_based = True
+
+    def __init__(self, object_list, ordering, has_previous, has_next):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def _get_values(self, obj):
+        return [_get_value(obj, path) for path, descending in self.ordering]
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(
+                PREVIOUS, self._get_values(self.object_list[0]),
+            )
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(NEXT, self._get_values(self.object_list[-1]))
+
+
+def paginate_keyset(queryset, cursor, page_size, ordering=None):
+    """Returns :class:`KeysetPage` of *queryset* placed after (or before)
+    *cursor*; the first page if *cursor* is empty.
+
+    :raises InvalidCursor: when cursor is malformed
+    """
+    ordering = ordering or get_ordering(queryset)
+    direction, values = decode_cursor(cursor) if cursor else (NEXT, None)
+    if values is not None:
+        values = _convert_values(queryset.model, ordering, values)
+    if direction == PREVIOUS:
+        # walk backwards: reversed ordering, rows after cursor
+        seek_ordering = [(path, not desc) for path, desc in ordering]
+    else:
+        seek_ordering = ordering
+    queryset = queryset.order_by(*[
+        ('-' if descending else '') + path
+        for path, descending in seek_ordering
+    ])
+    if values is not None:
+        queryset = queryset.filter(get_keyset_query(seek_ordering, values))
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == PREVIOUS:
+        rows.reverse()
+        return KeysetPage(rows, ordering, has_more, True)
+    return KeysetPage(rows, ordering, values is not None, has_more)
+
+
+class KeysetPaginationMixin(object):
+    """Makes :class:`bob.data_table.DataTableMixin` paginate with cursors
+    when ``ASSETS_KEYSET_PAGINATION`` is on or a cursor is requested."""
+    cursor_variable_name = 'cursor'
+    keyset_pagination = KEYSET_PAGINATION
+
+    def keyset_requested(self):
+        return (
+            self.keyset_pagination or
+            self.cursor_variable_name in self.request.GET
+        ) and self.request.GET.get(self.query_variable_name) != '0'
+
+    def paginate_by_cursor(self, queryset, page_size):
+        """Returns :class:`KeysetPage` or None when *queryset* can't be
+        paginated with cursors."""
+        if not self.keyset_requested():
+            return None
+        ordering = get_ordering(queryset)
+        if ordering is None:
+            return None
+        cursor = self.request.GET.get(self.cursor_variable_name)
+        try:
+            return paginate_keyset(queryset, cursor, page_size, ordering)
+        except InvalidCursor:
+            return paginate_keyset(queryset, None, page_size, ordering)
+
+    def _paginate(self, queryset):
+        page = self.paginate_by_cursor(queryset, self.rows_per_page)
+        if page is None:
+            return super(KeysetPaginationMixin, self)._paginate(queryset)
+        return page
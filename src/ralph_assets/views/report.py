@@ -9,6 +9,7 @@ import logging
 import uuid
 
 from bob import csvutil
+from rq import get_current_job
 from bob.menu import MenuItem, MenuHeader
 from django.core.urlresolvers import reverse
 from django.db.models import Count
@@ -17,8 +18,10 @@ from django.utils.translation import ugettext_lazy as _
 
 from ralph.util.reports import Report
 from ralph.discovery.models_device import Device
+from ralph_assets.category_index import get_category_index
 from ralph_assets.views.base import AssetsBase
 from ralph_assets.others import get_assets_rows, get_licences_rows
+from ralph_assets.progress import ProgressReporter
 from ralph_assets.models_assets import (
     Asset,
     AssetModel,
@@ -154,21 +157,40 @@ class CategoryModelReport(BaseReport):
         queryset = Asset.objects
         if mode:
             queryset = queryset.filter(type=mode)
-        queryset = queryset.select_related('model', 'category').values(
-            'model__category__name',
+        queryset = queryset.values(
+            'model__category',
             'model__name',
         ).annotate(
             num=Count('model')
-        ).order_by('model__category__name')
+        ).order_by('model__category')
 
+        index = get_category_index()
         for item in queryset:
-            cat = item['model__category__name'] or 'None'
+            category = index.get(item['model__category'])
+            if category:
+                parent = self.add_category(index, category)
+            else:
+                parent = 'None'
             self.report.add(
                 name=item['model__name'],
-                parent=cat,
+                parent=parent,
                 count=item['num'],
             )
 
+    def add_category(self, index, category):
+        """Adds node of *category* (nested in nodes of its ancestors) and
+        returns it, so counts of subcategories are summed up."""
+        parent = None
+        for node in index.get_ancestors(category.slug) + [category]:
+            report_node = self.report.get(node.name)
+            if not report_node:
+                if parent:
+                    report_node, __ = self.report.add(node.name, parent=parent)
+                else:
+                    report_node, __ = self.report.get_or_create(node.name)
+            parent = report_node
+        return parent
+
 
 class CategoryModelStatusReport(BaseReport):
     slug = 'category-model-status'
@@ -365,7 +387,10 @@ class AssetRelationsReport(BaseRelationsReport):
 
     def get_result(self, *args, **kwargs):
         filter_type = kwargs.get('mode')
-        return list(get_assets_rows(filter_type=filter_type))
+        progress = ProgressReporter(get_current_job())
+        return list(
+            get_assets_rows(filter_type=filter_type, progress=progress),
+        )
 
 
 class LicenceRelationsReport(BaseRelationsReport):
@@ -376,7 +401,8 @@ class LicenceRelationsReport(BaseRelationsReport):
     def get_result(self, *args, **kwargs):
         filter_type = kwargs.get('mode')
         data = []
-        for row in get_licences_rows(filter_type, True):
+        progress = ProgressReporter(get_current_job())
+        for row in get_licences_rows(filter_type, True, progress=progress):
             data.append([item.decode('utf-8') for item in row])
         return data
 
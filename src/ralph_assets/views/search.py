@@ -6,7 +6,6 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import logging
-import re
 
 from rq import get_current_job
 from bob.data_table import DataTableMixin
@@ -16,319 +15,56 @@ from django.db.models import Q
 from django.contrib import messages
 from django.utils.translation import ugettext_lazy as _
 
-from ralph.util.reports import Report, set_progress
+from ralph.util.reports import Report
 from ralph.business.models import Venture
-from ralph.discovery.models_device import Device
 from ralph_assets.forms import (
     BackOfficeSearchAssetForm,
     DataCenterSearchAssetForm,
 )
-from ralph_assets.models import Asset, AssetCategory, PartInfo, OfficeInfo
+from ralph_assets.category_index import get_category_index
+from ralph_assets.models import Asset, PartInfo, OfficeInfo
+from ralph_assets.models_assets import prefetch_ralph_devices
+from ralph_assets.models_util import (
+    TemporaryValuesTable,
+    iterate_chunks,
+    with_known_count,
+)
+from ralph_assets.progress import ProgressReporter
+from ralph_assets.search_cache import get_search_count
 from ralph_assets.views.base import AssetsBase, DataTableColumnAssets
+from ralph_assets.views.csv_export import (
+    get_export_mode,
+    make_spooled_csv_response,
+    make_streaming_csv_response,
+    spool_csv,
+)
+from ralph_assets.views.keyset_pagination import KeysetPaginationMixin
+from ralph_assets.views.search_facets import get_facets
+from ralph_assets.views.search_fields import get_search_plan
 
 
 logger = logging.getLogger(__name__)
 
-
-QUOTATION_MARKS = re.compile(r"^\".+\"$")
-SEARCH_DELIMITERS = re.compile(r";|\|")
+CSV_EXPORT_CHUNK_SIZE = getattr(settings, 'ASSETS_CSV_EXPORT_CHUNK_SIZE', 1000)
+SEARCH_FACETS = getattr(settings, 'ASSETS_SEARCH_FACETS', True)
 
 
 class AssetsSearchQueryableMixin(object):
+    """Builds asset search query from request's GET params, using plans
+    compiled from the ``SEARCH_FIELDS`` registry."""
+
+    def get_search_plan(self):
+        return get_search_plan(self.request.GET)
 
     def handle_search_data(self, *args, **kwargs):
-        search_fields = [
-            'barcode',
-            'budget_info',
-            'category',
-            'company',
-            'cost_center',
-            'deleted',
-            'department',
-            'deprecation_rate',
-            'device_environment',
-            'device_info',
-            'employee_id',
-            'guardian',
-            'hostname',
-            'id',
-            'imei',
-            'invoice_no',
-            'location',
-            'location_name',
-            'manufacturer',
-            'model',
-            'niw',
-            'order_no',
-            'owner',
-            'part_info',
-            'profit_center',
-            'provider',
-            'purpose',
-            'ralph_device_id',
-            'region',
-            'remarks',
-            'required_support',
-            'segment',
-            'service',
-            'service_name',
-            'sn',
-            'source',
-            'status',
-            'support_assigned',
-            'task_url',
-            'unlinked',
-            'user',
-            'venture_department',
-            'warehouse',
-            'without_assigned_location',
-        ]
-        # handle simple 'equals' search fields at once.
-        all_q = Q()
-        for field in search_fields:
-            field_value = self.request.GET.get(field)
-            if field_value:
-                exact = False
-                multi = False
-                # if search term is enclosed in "", we want exact matches
-                if isinstance(field_value, basestring) and \
-                        QUOTATION_MARKS.search(field_value):
-                    exact = True
-                    field_value = field_value[1:-1]
-                elif re.search(SEARCH_DELIMITERS, field_value):
-                    multi = True
-                if field == 'part_info':
-                    if field_value == 'device':
-                        all_q &= Q(part_info__isnull=True)
-                    elif field_value == 'part':
-                        all_q &= Q(part_info__gte=0)
-                elif field == 'model':
-                    if exact:
-                        all_q &= Q(model__name=field_value)
-                    else:
-                        all_q &= Q(model__name__icontains=field_value)
-                elif field == 'category':
-                    part = self.get_search_category_part(field_value)
-                    if part:
-                        all_q &= part
-                elif field == 'deleted':
-                    if field_value.lower() == 'on':
-                        all_q &= Q(deleted__in=(True, False))
-                elif field == 'manufacturer':
-                    if exact:
-                        all_q &= Q(model__manufacturer__name=field_value)
-                    else:
-                        all_q &= Q(
-                            model__manufacturer__name__icontains=field_value
-                        )
-                elif field == 'barcode':
-                    if exact:
-                        all_q &= Q(barcode=field_value)
-                    elif multi:
-                        all_q &= self._search_fields_or(
-                            ['barcode'],
-                            re.split(SEARCH_DELIMITERS, field_value),
-                        )
-                    else:
-                        all_q &= Q(barcode__contains=field_value)
-                elif field == 'hostname':
-                    if exact:
-                        all_q &= Q(hostname=field_value)
-                    elif multi:
-                        all_q &= self._search_fields_or(
-                            ['hostname'],
-                            re.split(SEARCH_DELIMITERS, field_value),
-                        )
-                    else:
-                        all_q &= Q(hostname__contains=field_value)
-                elif field == 'sn':
-                    if exact:
-                        all_q &= Q(sn=field_value)
-                    elif multi:
-                        all_q &= self._search_fields_or(
-                            ['sn'],
-                            re.split(SEARCH_DELIMITERS, field_value),
-                        )
-                    else:
-                        all_q &= Q(sn__icontains=field_value)
-                elif field == 'niw':
-                    if exact:
-                        all_q &= Q(niw=field_value)
-                    elif multi:
-                        all_q &= self._search_fields_or(
-                            ['niw'],
-                            re.split(SEARCH_DELIMITERS, field_value),
-                        )
-                    else:
-                        all_q &= Q(niw__icontains=field_value)
-                elif field == 'provider':
-                    if exact:
-                        all_q &= Q(provider=field_value)
-                    else:
-                        all_q &= Q(provider__icontains=field_value)
-                elif field == 'order_no':
-                    if exact:
-                        all_q &= Q(order_no=field_value)
-                    else:
-                        all_q &= Q(order_no__icontains=field_value)
-                elif field == 'invoice_no':
-                    if exact:
-                        all_q &= Q(invoice_no=field_value)
-                    else:
-                        all_q &= Q(invoice_no__icontains=field_value)
-                elif field == 'warehouse':
-                    all_q &= Q(warehouse__id=field_value)
-                elif field == 'owner':
-                    all_q &= Q(owner__id=field_value)
-                elif field == 'location':
-                    all_q &= Q(location__icontains=field_value)
-                elif field == 'employee_id':
-                    all_q &= Q(owner__profile__employee_id=field_value)
-                elif field == 'company':
-                    all_q &= Q(owner__profile__company__icontains=field_value)
-                elif field == 'segment':
-                    all_q &= Q(owner__profile__segment__icontains=field_value)
-                elif field == 'profit_center':
-                    all_q &= Q(owner__profile__profit_center=field_value)
-                elif field == 'cost_center':
-                    all_q &= Q(owner__profile__cost_center=field_value)
-                elif field == 'department':
-                    all_q &= Q(
-                        owner__profile__department__icontains=field_value
-                    )
-                elif field == 'remarks':
-                    all_q &= Q(remarks__icontains=field_value)
-                elif field == 'user':
-                    all_q &= Q(user__id=field_value)
-                elif field == 'guardian':
-                    all_q &= Q(guardian__id=field_value)
-                elif field == 'deprecation_rate':
-                    deprecation_rate_query_map = {
-                        'null': Q(deprecation_rate__isnull=True),
-                        'deprecated': Q(deprecation_rate=0),
-                        '6': Q(deprecation_rate__gt=0,
-                               deprecation_rate__lte=6),
-                        '12': Q(deprecation_rate__gt=6,
-                                deprecation_rate__lte=12),
-                        '24': Q(deprecation_rate__gt=12,
-                                deprecation_rate__lte=24),
-                        '48': Q(deprecation_rate__gt=24,
-                                deprecation_rate__lte=48),
-                        '48<': Q(deprecation_rate__gt=48),
-                    }
-                    all_q &= deprecation_rate_query_map[field_value]
-                elif field == 'unlinked' and field_value.lower() == 'on':
-                        all_q &= ~Q(device_info=None)
-                        all_q &= Q(device_info__ralph_device_id=None)
-                elif field == 'ralph_device_id':
-                    if exact:
-                        all_q &= Q(device_info__ralph_device_id=field_value)
-                    else:
-                        all_q &= Q(
-                            device_info__ralph_device_id__icontains=field_value
-                        )
-                elif field == 'task_url':
-                    if exact:
-                        all_q &= Q(task_url=field_value)
-                    else:
-                        all_q &= Q(task_url__icontains=field_value)
-                elif field == 'id':
-                        all_q &= Q(
-                            id__in=[int(id) for id in field_value.split(",")],
-                        )
-                elif field == 'imei':
-                    if exact:
-                        all_q &= Q(office_info__imei=field_value)
-                    else:
-                        all_q &= Q(office_info__imei__icontains=field_value)
-                elif field == 'service_name':
-                    all_q &= Q(service_name=field_value)
-                elif field == 'required_support':
-                    user_choice = True if field_value == 'yes' else False
-                    all_q &= Q(required_support=user_choice)
-                elif field == 'support_assigned':
-                    user_choice = True if field_value == 'none' else False
-                    all_q &= Q(supports__isnull=user_choice)
-                elif field == 'purpose':
-                    all_q &= Q(office_info__purpose=field_value)
-                elif field == 'budget_info':
-                    if exact:
-                        all_q &= Q(budget_info__name=field_value)
-                    else:
-                        all_q &= Q(budget_info__name__icontains=field_value)
-                elif field == 'service':
-                    if exact:
-                        all_q &= Q(service__name=field_value)
-                    else:
-                        all_q &= Q(service__name__icontains=field_value)
-                elif field == 'device_environment':
-                    if exact:
-                        all_q &= Q(device_environment__name=field_value)
-                    else:
-                        all_q &= Q(
-                            device_environment__name__icontains=field_value,
-                        )
-                elif field == 'without_assigned_location':
-                    empty_location = (
-                        Q(device_info__data_center=None) |
-                        Q(device_info__server_room=None) |
-                        Q(device_info__rack=None) |
-                        Q(device_info__position=None) |
-                        Q(device_info__orientation=None)
-                    )
-                    asset_without_category_and_location = (
-                        Q(model__category=None) & Q(empty_location)
-                    )
-                    blade_asset_with_empty_location = (
-                        Q(model__category__is_blade=True) &
-                        Q(empty_location | Q(device_info__slot_no=None))
-                    )
-                    not_blade_asset_with_empty_location = (
-                        Q(model__category__is_blade=False) & Q(empty_location)
-                    )
-                    all_q &= (
-                        asset_without_category_and_location |
-                        blade_asset_with_empty_location |
-                        not_blade_asset_with_empty_location
-                    )
-                elif field == 'region':
-                    all_q &= Q(region__id=field_value)
-                elif field == 'location_name':
-                    all_q &= (
-                        Q(device_info__rack__name=field_value) |
-                        Q(device_info__data_center__name=field_value) |
-                        Q(device_info__server_room__name=field_value) |
-                        Q(device_info__rack__server_room__name=field_value) |
-                        Q(device_info__rack__data_center__name=field_value)
-                    )
-                elif field == 'venture_department':
-                    devices = Device.objects.select_related(
-                        'venture__department'
-                    ).filter(
-                        venture__department__id=int(field_value)
-                    ).values_list('id', flat=True)
-                    all_q &= Q(device_info__ralph_device_id__in=devices)
-                else:
-                    q = Q(**{field: field_value})
-                    all_q = all_q & q
+        return self.get_search_plan().get_query(view=self)
 
-        # now fields within ranges.
-        search_date_fields = [
-            'invoice_date', 'request_date', 'delivery_date',
-            'production_use_date', 'provider_order_date', 'loan_end_date',
-        ]
-        for date in search_date_fields:
-            start = self.request.GET.get(date + '_from')
-            end = self.request.GET.get(date + '_to')
-            if start:
-                all_q &= Q(**{date + '__gte': start})
-            if end:
-                all_q &= Q(**{date + '__lte': end})
-        self.items_count = Asset.objects.filter(all_q).count()
-        return all_q
-
-
-class GenericSearch(Report, AssetsBase, DataTableMixin):
+    def get_search_category_part(self, field_value):
+        categories = get_category_index().get_subtree_slugs(field_value)
+        return Q(model__category_id__in=categories)
+
+
+class GenericSearch(Report, AssetsBase, KeysetPaginationMixin, DataTableMixin):
     """A generic view that contains a bob grid and a search form"""
 
     sort_variable_name = 'sort'
@@ -368,7 +104,7 @@ class GenericSearch(Report, AssetsBase, DataTableMixin):
             objects = objects.select_related(*self.pre_selected)
         query_set = objects.filter(query)
         self.items_count = query_set.count()
-        return query_set.all()
+        return with_known_count(query_set, self.items_count)
 
 
 class _AssetSearch(AssetsSearchQueryableMixin, AssetsBase):
@@ -392,41 +128,23 @@ class _AssetSearch(AssetsSearchQueryableMixin, AssetsBase):
         self.form = search_form(self.request.GET, mode=mode)
         super(_AssetSearch, self).set_mode(mode)
 
-    def get_search_category_part(self, field_value):
-        try:
-            category_id = field_value
-        except ValueError:
-            pass
-        else:
-            category = AssetCategory.objects.get(slug=category_id)
-            children = [x.slug for x in category.get_children()]
-            categories = [category_id, ] + children
-            return Q(model__category_id__in=categories)
-
     def get_all_items(self, query):
         include_deleted = self.request.GET.get('deleted')
         if include_deleted and include_deleted.lower() == 'on':
             return self.admin_objects.filter(query)
         return self.objects.filter(query)
 
-    def _search_fields_or(self, fields, values):
-        q = Q()
-        for value in values:
-            value = value.strip()
-            if not value:
-                continue
-            for field in fields:
-                q |= Q(**{field: value})
-        return q
 
-
-class AssetSearchDataTable(_AssetSearch, DataTableMixin):
+class AssetSearchDataTable(
+    _AssetSearch, KeysetPaginationMixin, DataTableMixin,
+):
     """
         The main-screen search form for all type of assets.
         (version without async reports)
     """
     rows_per_page = 15
     csv_file_name = 'ralph.csv'
+    temporary_values = None
     sort_variable_name = 'sort'
     export_variable_name = 'export'
     _ = DataTableColumnAssets
@@ -525,50 +243,87 @@ class AssetSearchDataTable(_AssetSearch, DataTableMixin):
                 AssetSearchDataTable, self,
             ).handle_search_data(*args, **kwargs)
             queryset = self.get_all_items(all_q)
-            self.assets_count = queryset.count() if all_q.children else None
+            count = get_search_count(queryset)
+            queryset = with_known_count(queryset, count)
+            self.assets_count = count if all_q.children else None
             if get_csv:
                 return self.get_csv_data(queryset)
             else:
+                self.missing_values = self.get_missing_values(queryset)
+                self.facets = self.get_facets(queryset)
                 self.data_table_query(queryset)
         else:
             queryset = self.objects.none()
             self.assets_count = None
+            self.missing_values = []
+            self.facets = []
             self.data_table_query(queryset)
             messages.error(self.request, _("Please correct the errors."))
 
+    def get_missing_values(self, queryset):
+        """Returns list of (field label, values) pairs with pasted values
+        which weren't found."""
+        missing = []
+        for name, values in self.get_search_plan().get_missing_values(
+            queryset,
+        ):
+            field = self.form.fields.get(name)
+            missing.append((field.label if field else name, values))
+        return missing
+
+    def get_facets(self, queryset):
+        """Returns list of (facet label, [(label, count, url), ...]) pairs,
+        url narrows the search to the value."""
+        if not SEARCH_FACETS:
+            return []
+        facets = []
+        for facet, values in get_facets(queryset):
+            links = []
+            for param, label, count in values:
+                params = self.request.GET.copy()
+                params[facet.name] = param
+                params.pop('page', None)
+                links.append((label, count, '?' + params.urlencode()))
+            if links:
+                facets.append((facet.label, links))
+        return facets
+
     def get_csv_header(self):
         header = super(AssetSearchDataTable, self).get_csv_header()
         return ['type'] + header
 
     def get_csv_rows(self, queryset, type, model):
-        data = [self.get_csv_header()]
-        total = queryset.count()
-        processed = 0
-        job = get_current_job()
-        for asset in queryset:
-            row = ['part'] if asset.part_info else ['device']
-            for item in self.columns:
-                field = item.field
-                if field:
-                    nested_field_name = item.foreign_field_name
-                    if nested_field_name == type:
-                        cell = self.get_cell(
-                            getattr(asset, type), field, model
-                        )
-                    elif nested_field_name == 'part_info':
-                        cell = self.get_cell(asset.part_info, field, PartInfo)
-                    elif nested_field_name == 'venture':
-                        cell = self.get_cell(asset.venture, field, Venture)
-                    elif nested_field_name == 'is_discovered':
-                        cell = unicode(asset.is_discovered)
-                    else:
-                        cell = self.get_cell(asset, field, Asset)
-                    row.append(unicode(cell))
-            data.append(row)
-            processed += 1
-            set_progress(job, processed / total)
-        set_progress(job, 1)
-        return data
+        """Yields header and rows of the export; assets are fetched in chunks
+        so the whole export is never kept in memory."""
+        yield self.get_csv_header()
+        progress = ProgressReporter(get_current_job(), queryset.count())
+        for chunk in iterate_chunks(queryset, CSV_EXPORT_CHUNK_SIZE):
+            prefetch_ralph_devices(chunk)
+            for asset in chunk:
+                yield self.get_csv_row(asset, type, model)
+                progress.advance()
+        progress.finish()
+
+    def get_csv_row(self, asset, type, model):
+        row = ['part'] if asset.part_info else ['device']
+        for item in self.columns:
+            field = item.field
+            if field:
+                nested_field_name = item.foreign_field_name
+                if nested_field_name == type:
+                    cell = self.get_cell(
+                        getattr(asset, type), field, model
+                    )
+                elif nested_field_name == 'part_info':
+                    cell = self.get_cell(asset.part_info, field, PartInfo)
+                elif nested_field_name == 'venture':
+                    cell = self.get_cell(asset.venture, field, Venture)
+                elif nested_field_name == 'is_discovered':
+                    cell = unicode(asset.is_discovered)
+                else:
+                    cell = self.get_cell(asset, field, Asset)
+                row.append(unicode(cell))
+        return row
 
     def get_context_data(self, *args, **kwargs):
         ret = super(
@@ -591,26 +346,46 @@ class AssetSearchDataTable(_AssetSearch, DataTableMixin):
             'asset_transitions_enable': settings.ASSETS_TRANSITIONS['ENABLE'],
             'asset_hide_action_search': settings.ASSET_HIDE_ACTION_SEARCH,
             'assets_count': self.assets_count,
+            'missing_values': self.missing_values,
+            'facets': self.facets,
         })
         return ret
 
     def get(self, *args, **kwargs):
-        self.handle_search_data()
         if self.export_requested():
+            # streamed after the view returns - long lists are sent as params
+            self.handle_search_data()
             return self.response
-        return super(AssetSearchDataTable, self).get(*args, **kwargs)
+        with TemporaryValuesTable(Asset) as self.temporary_values:
+            self.handle_search_data()
+            response = super(AssetSearchDataTable, self).get(*args, **kwargs)
+            if hasattr(response, 'render'):
+                # the page is fetched when the template is rendered
+                response.render()
+            return response
 
     def is_async(self, request, *args, **kwargs):
         self.export = request.GET.get('export')
-        return self.export == 'csv'
+        return self.export == 'csv' and get_export_mode() != 'stream'
 
     def get_result(self, request, *args, **kwargs):
         self.set_mode(kwargs['mode'])
-        return self.handle_search_data(get_csv=True)
+        with TemporaryValuesTable(Asset) as self.temporary_values:
+            rows = self.handle_search_data(get_csv=True)
+            if get_export_mode() == 'spool':
+                return spool_csv(rows)
+            return list(rows)
 
     def get_response(self, request, result):
+        if get_export_mode() == 'spool':
+            return make_spooled_csv_response(result, self.csv_file_name)
         return self.make_csv_response(result)
 
+    def do_csv_export(self, queryset):
+        return make_streaming_csv_response(
+            self.get_csv_data(queryset), self.csv_file_name,
+        )
+
     def get_csv_data(self, queryset):
         return self.get_csv_rows(
             queryset, type='office_info', model=OfficeInfo
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Counts of searched assets per status, category, warehouse, manufacturer
+and region.
+
+Every facet is grouped separately (grouping by all of them at once would
+return a row per combination of their values), but all of them are counted
+with one statement - a ``UNION ALL`` of grouped queries tagged with their
+facets - and cached together like the count of the search (see
+:mod:`ralph_assets.search_cache`).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from django.db import connections
+from django.db.models import Count
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.utils.translation import ugettext_lazy as _
+
+from ralph_assets.category_index import get_category_index
+from ralph_assets.models_assets import AssetStatus
+from ralph_assets.models_util import TEMPORARY_TABLE_PREFIX
+from ralph_assets.search_cache import get_or_compute
+
+
+class Facet(object):
+    """Single facet of the search.
+
+    :param name: name of the search param narrowing results to a value
+    :param value_field: field grouped by, its values are used in links
+    :param label_field: field with the label of the value (if different)
+    """
+    # values are numbers (ids), not text
+    numeric = True
+
+    def __init__(self, name, label, value_field, label_field=None):
+        self.name = name
+        self.label = label
+        self.value_field = value_field
+        self.label_field = label_field
+
+    @property
+    def fields(self):
+        return [self.value_field] + (
+            [self.label_field] if self.label_field else []
+        )
+
+    def get_label(self, row):
+        if self.label_field:
+            return row[self.label_field]
+        return row[self.value_field]
+
+    def get_labels(self, rows):
+        return [self.get_label(row) for row in rows]
+
+    def get_param(self, value):
+        return value
+
+
+class StatusFacet(Facet):
+    def get_label(self, row):
+        return AssetStatus.from_id(row[self.value_field]).desc
+
+
+class CategoryFacet(Facet):
+    numeric = False
+
+    def get_labels(self, rows):
+        index = get_category_index()
+        labels = []
+        for row in rows:
+            node = index.get(row[self.value_field])
+            labels.append(node.name if node else row[self.value_field])
+        return labels
+
+
+class ExactTextFacet(Facet):
+    """Text search param - value is quoted to match it exactly."""
+    numeric = False
+
+    def get_param(self, value):
+        return '"{}"'.format(value)
+
+
+FACETS = [
+    StatusFacet('status', _('Status'), 'status'),
+    CategoryFacet('category', _('Category'), 'model__category'),
+    Facet('warehouse', _('Warehouse'), 'warehouse', 'warehouse__name'),
+    ExactTextFacet(
+        'manufacturer', _('Manufacturer'), 'model__manufacturer__name',
+    ),
+    Facet('region', _('Region'), 'region', 'region__name'),
+]
+
+
+def _get_grouped(queryset, facet):
+    return queryset.order_by().values(*facet.fields).annotate(num=Count('id'))
+
+
+def _count_groups(queryset):
+    """Returns dict of facet name -> list of rows with counts of values."""
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    parts, params = [], []
+    for index, facet in enumerate(FACETS):
+        grouped = _get_grouped(queryset, facet)
+        columns = [qn(column) for alias, column in grouped.query.select]
+        try:
+            sql, sql_params = grouped.query.sql_with_params()
+        except EmptyResultSet:
+            return dict((facet.name, []) for facet in FACETS)
+        if TEMPORARY_TABLE_PREFIX in sql:
+            # MySQL can't read a temporary table twice in one statement
+            return dict(
+                (facet.name, list(_get_grouped(queryset, facet)))
+                for facet in FACETS
+            )
+        # values of different types are kept in separate columns
+        parts.append(
+            'SELECT {index}, {number}, {text}, {label}, {num} '
+            'FROM ({sql}) AS {alias}'.format(
+                index=index,
+                number=columns[0] if facet.numeric else 'NULL',
+                text='NULL' if facet.numeric else columns[0],
+                label=columns[1] if facet.label_field else 'NULL',
+                num=qn('num'), sql=sql, alias=qn('facet_{}'.format(index)),
+            )
+        )
+        params.extend(sql_params)
+    groups = dict((facet.name, []) for facet in FACETS)
+    cursor = connection.cursor()
+    cursor.execute(' UNION ALL '.join(parts), params)
+    for index, number, text, label, num in cursor.fetchall():
+        facet = FACETS[index]
+        row = {
+            facet.value_field: number if facet.numeric else text,
+            'num': num,
+        }
+        if facet.label_field:
+            row[facet.label_field] = label
+        groups[facet.name].append(row)
+    return groups
+
+
+def get_facets(queryset):
+    """Returns list of ``(facet, [(param, label, count), ...])`` pairs for
+    the searched *queryset*, values sorted from the most frequent."""
+    groups = get_or_compute('facets', queryset, _count_groups)
+    facets = []
+    for facet in FACETS:
+        rows = [
+            row for row in groups[facet.name]
+            if row[facet.value_field] is not None
+        ]
+        values = sorted(
+            (
+                (row[facet.value_field], label, row['num'])
+                for row, label in zip(rows, facet.get_labels(rows))
+            ),
+            key=lambda item: (-item[2], item[1]),
+        )
+        facets.append((facet, [
+            (facet.get_param(value), label, count)
+            for value, label, count in values
+        ]))
+    return facets
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""Declarative registry of asset search fields.
+
+Every search field is described by a lookup strategy. A normalized GET
+signature is compiled once into a :class:`SearchPlan` which is kept in an LRU
+cache, so repeated searches only pay for a deep copy of the prepared ``Q``
+tree (and for the few strategies that depend on database state).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import copy
+import operator
+import re
+
+from django.conf import settings
+from django.db.models import Q
+from ralph.discovery.models_device import Device, DeviceType
+
+from ralph_assets.models_dc_assets import LOCATION_NAME_FIELDS
+from ralph_assets.models_search import (
+    can_use_ngrams,
+    get_ngram_candidates,
+    get_search_lookup,
+)
+from ralph_assets.utils import LRUCache
+
+
+QUOTATION_MARKS = re.compile(r"^\".+\"$")
+SEARCH_DELIMITERS = re.compile(r";|\|")
+
+SEARCH_PLAN_CACHE_SIZE = getattr(
+    settings, 'ASSETS_SEARCH_PLAN_CACHE_SIZE', 256,
+)
+# lists of values longer than this are joined from a temporary table
+SEARCH_TEMP_TABLE_THRESHOLD = getattr(
+    settings, 'ASSETS_SEARCH_TEMP_TABLE_THRESHOLD', 1000,
+)
+
+
+def parse_search_value(value):
+    """Return (value, exact, multi) for raw *value* from the search form.
+
+    If search term is enclosed in "", we want exact matches; if it contains
+    one of ``SEARCH_DELIMITERS`` it is a list of values.
+    """
+    if QUOTATION_MARKS.search(value):
+        return value[1:-1], True, False
+    if SEARCH_DELIMITERS.search(value):
+        return value, False, True
+    return value, False, False
+
+
+def split_search_values(value):
+    """Split multi-value search term and skip empty and repeated items."""
+    values = []
+    seen = set()
+    for item in SEARCH_DELIMITERS.split(value):
+        item = item.strip()
+        if item and item not in seen:
+            seen.add(item)
+            values.append(item)
+    return values
+
+
+class SearchField(object):
+    """Base lookup strategy for a single search field.
+
+    :param cacheable: False when the query depends on database state and has
+        to be built for every request
+    """
+    cacheable = True
+
+    def get_value(self, params, name):
+        return params.get(name) or None
+
+    def is_cacheable(self, value):
+        return self.cacheable
+
+    def get_missing_values(self, queryset, value):
+        """Returns values searched for but not found in *queryset*, for
+        fields which accept lists of values."""
+        return []
+
+    def compile(self, value, view=None):
+        value, exact, multi = parse_search_value(value)
+        return self.get_query(value, exact=exact, multi=multi, view=view)
+
+    def get_query(self, value, exact=False, multi=False, view=None):
+        raise NotImplementedError()
+
+
+class ExactField(SearchField):
+    """Always compare with ``=``."""
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def get_query(self, value, **kwargs):
+        return Q(**{get_search_lookup(self.lookup): value})
+
+
+class TextField(SearchField):
+    """Text field matched with *contains* lookup, or with ``=`` when value is
+    quoted (and *exact* is allowed) and with a list of values when *multi* is
+    allowed.
+
+    Lists of values are matched with ``IN``; lists longer than
+    ``SEARCH_TEMP_TABLE_THRESHOLD`` are not cached in search plans and are
+    loaded into the view's ``temporary_values`` tables (see
+    :class:`ralph_assets.models_util.TemporaryValuesTable`), when the view
+    evaluates the search inside of it. *contains* searches of fields
+    covered by the trigram index are narrowed to candidate assets found in
+    the index (which depends on database state, so they aren't cached
+    either).
+    """
+
+    def __init__(self, lookup, contains='icontains', exact=True, multi=False):
+        self.lookup = lookup
+        self.contains = contains
+        self.exact = exact
+        self.multi = multi
+
+    def get_multi_values(self, value):
+        """Returns list of searched values or None if *value* isn't a
+        list."""
+        value, exact, multi = parse_search_value(value)
+        if multi and self.multi and not (exact and self.exact):
+            return split_search_values(value)
+
+    def is_cacheable(self, value):
+        values = self.get_multi_values(value)
+        if values is None:
+            value, exact, multi = parse_search_value(value)
+            return (exact and self.exact) or not can_use_ngrams(
+                self.lookup, value,
+            )
+        return len(values) <= SEARCH_TEMP_TABLE_THRESHOLD
+
+    def get_query(self, value, exact=False, multi=False, view=None):
+        lookup = get_search_lookup(self.lookup)
+        if exact and self.exact:
+            return Q(**{lookup: value})
+        if multi and self.multi:
+            values = split_search_values(value)
+            if len(values) > SEARCH_TEMP_TABLE_THRESHOLD:
+                values = self.get_temporary_values(values, view)
+            return Q(**{'{}__in'.format(lookup): values})
+        query = Q(**{'{}__{}'.format(lookup, self.contains): value})
+        candidates = get_ngram_candidates(self.lookup, value)
+        if candidates is not None:
+            if len(candidates) > SEARCH_TEMP_TABLE_THRESHOLD:
+                candidates = self.get_temporary_values(
+                    candidates, view, numbers=True,
+                )
+            query = Q(pk__in=candidates) & query
+        return query
+
+    def get_temporary_values(self, values, view, numbers=False):
+        table = getattr(view, 'temporary_values', None)
+        if table is None:
+            return values
+        return table.add(values, numbers=numbers)
+
+    def get_missing_values(self, queryset, value):
+        values = self.get_multi_values(value)
+        if not values:
+            return []
+        found_values = queryset.order_by().values_list(
+            self.lookup, flat=True,
+        ).distinct()
+        found = set(
+            found_value.lower() for found_value in found_values if found_value
+        )
+        return [item for item in values if item.lower() not in found]
+
+
+class MappedField(SearchField):
+    """Value is a key in *mapping* of prepared queries. Unknown keys get
+    *default* (or are skipped when there is no default)."""
+
+    def __init__(self, mapping, default=None, lower=False):
+        self.mapping = mapping
+        self.default = default
+        self.lower = lower
+
+    def get_query(self, value, **kwargs):
+        if self.lower:
+            value = value.lower()
+        return self.mapping.get(value, self.default)
+
+
+class ConstantField(SearchField):
+    """Checkbox-like field - any value applies the same *query*."""
+
+    def __init__(self, query):
+        self.query = query
+
+    def get_query(self, value, **kwargs):
+        return self.query
+
+
+class IdListField(SearchField):
+    """Comma separated list of primary keys."""
+
+    def get_query(self, value, **kwargs):
+        return Q(id__in=[int(id) for id in value.split(',')])
+
+
+class RangeField(SearchField):
+    """Range given by two params: ``<name>_from`` and ``<name>_to``."""
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def get_value(self, params, name):
+        start = params.get(name + '_from') or None
+        end = params.get(name + '_to') or None
+        if start or end:
+            return start, end
+
+    def compile(self, value, view=None):
+        start, end = value
+        q = Q()
+        if start:
+            q &= Q(**{self.lookup + '__gte': start})
+        if end:
+            q &= Q(**{self.lookup + '__lte': end})
+        return q
+
+
+class DeprecationDateField(RangeField):
+    """Range of stored deprecation dates. Assets deprecated regardless of
+    date (forced or without invoice date) have none - they fall into ranges
+    without start (i.e. "deprecated before")."""
+
+    def compile(self, value, view=None):
+        q = super(DeprecationDateField, self).compile(value, view)
+        start, end = value
+        if end and not start:
+            q |= Q(**{self.lookup: None})
+        return q
+
+
+def core_device_query(device_query):
+    """Q of assets linked to Ralph core devices matching *device_query*.
+
+    There is no foreign key between ``DeviceInfo`` and ``Device``, so devices
+    are selected with a subquery (which the database plans as a semi-join)
+    instead of a list of ids fetched beforehand - the search stays a single
+    statement.
+    """
+    devices = Device.objects.filter(device_query).values('id')
+    return Q(device_info__ralph_device_id__in=devices)
+
+
+class CoreDeviceField(SearchField):
+    """Filter by a *lookup* of Ralph core device linked to the asset, e.g.
+    ``CoreDeviceField('venture__department__id')``."""
+
+    def __init__(self, lookup, convert=int):
+        self.lookup = lookup
+        self.convert = convert
+
+    def get_query(self, value, **kwargs):
+        try:
+            value = self.convert(value)
+        except (TypeError, ValueError):
+            return None
+        return core_device_query(Q(**{self.lookup: value}))
+
+
+class CustomField(SearchField):
+    """Query is built by the view's *method_name* for every request."""
+    cacheable = False
+
+    def __init__(self, method_name):
+        self.method_name = method_name
+
+    def get_query(self, value, view=None, **kwargs):
+        return getattr(view, self.method_name)(value)
+
+
+class LocationNameField(SearchField):
+    """Name of rack, data center or server room the asset is placed in (or
+    of server room and data center of its rack) - matched with names
+    denormalized on device info."""
+
+    def get_query(self, value, **kwargs):
+        return reduce(operator.or_, [
+            Q(**{'device_info__' + column: value})
+            for column, _ in LOCATION_NAME_FIELDS
+        ])
+
+
+SEARCH_FIELDS = {
+    'barcode': TextField('barcode', contains='contains', multi=True),
+    'budget_info': TextField('budget_info__name'),
+    'category': CustomField('get_search_category_part'),
+    'company': TextField('owner__profile__company', exact=False),
+    'cost_center': ExactField('owner__profile__cost_center'),
+    'deleted': MappedField(
+        {'on': Q(deleted__in=(True, False))}, lower=True,
+    ),
+    'department': TextField('owner__profile__department', exact=False),
+    'deprecation_rate': MappedField({
+        'null': Q(deprecation_rate__isnull=True),
+        'deprecated': Q(deprecation_rate=0),
+        '6': Q(deprecation_rate__gt=0, deprecation_rate__lte=6),
+        '12': Q(deprecation_rate__gt=6, deprecation_rate__lte=12),
+        '24': Q(deprecation_rate__gt=12, deprecation_rate__lte=24),
+        '48': Q(deprecation_rate__gt=24, deprecation_rate__lte=48),
+        '48<': Q(deprecation_rate__gt=48),
+    }),
+    'device_environment': TextField('device_environment__name'),
+    'device_info': ExactField('device_info'),
+    'device_model_type': CoreDeviceField('model__type'),
+    'discovered': MappedField({
+        'yes': core_device_query(
+            Q(model__isnull=False) & ~Q(model__type=DeviceType.unknown.id),
+        ),
+    }, lower=True),
+    'employee_id': ExactField('owner__profile__employee_id'),
+    'guardian': ExactField('guardian__id'),
+    'hostname': TextField('hostname', contains='contains', multi=True),
+    'id': IdListField(),
+    'imei': TextField('office_info__imei'),
+    'invoice_no': TextField('invoice_no'),
+    'location': TextField('location', exact=False),
+    'location_name': LocationNameField(),
+    'manufacturer': TextField('model__manufacturer__name'),
+    'model': TextField('model__name'),
+    'niw': TextField('niw', multi=True),
+    'order_no': TextField('order_no'),
+    'owner': ExactField('owner__id'),
+    'part_info': MappedField({
+        'device': Q(part_info__isnull=True),
+        'part': Q(part_info__gte=0),
+    }),
+    'profit_center': ExactField('owner__profile__profit_center'),
+    'provider': TextField('provider'),
+    'purpose': ExactField('office_info__purpose'),
+    'ralph_device_id': TextField('device_info__ralph_device_id'),
+    'region': ExactField('region__id'),
+    'remarks': TextField('remarks', exact=False),
+    'required_support': MappedField(
+        {'yes': Q(required_support=True)},
+        default=Q(required_support=False),
+    ),
+    'segment': TextField('owner__profile__segment', exact=False),
+    'service': TextField('service__name'),
+    'service_name': ExactField('service_name'),
+    'sn': TextField('sn', multi=True),
+    'source': ExactField('source'),
+    'status': ExactField('status'),
+    'support_assigned': MappedField(
+        {'none': Q(supports__isnull=True)},
+        default=Q(supports__isnull=False),
+    ),
+    'task_url': TextField('task_url'),
+    'unlinked': MappedField(
+        {'on': ~Q(device_info=None) & Q(device_info__ralph_device_id=None)},
+        lower=True,
+    ),
+    'user': ExactField('user__id'),
+    'venture': CoreDeviceField('venture__id'),
+    'venture_department': CoreDeviceField('venture__department__id'),
+    'warehouse': ExactField('warehouse__id'),
+    'without_assigned_location': ConstantField(
+        Q(device_info=None) | Q(device_info__location_complete=False),
+    ),
+    # fields within ranges
+    'invoice_date': RangeField('invoice_date'),
+    'request_date': RangeField('request_date'),
+    'delivery_date': RangeField('delivery_date'),
+    'deprecation_date': DeprecationDateField('effective_deprecation_date'),
+    'production_use_date': RangeField('production_use_date'),
+    'provider_order_date': RangeField('provider_order_date'),
+    'loan_end_date': RangeField('loan_end_date'),
+}
+
+
+def get_search_signature(params):
+    """Normalize request params to a hashable signature of a search."""
+    signature = []
+    for name in sorted(SEARCH_FIELDS):
+        value = SEARCH_FIELDS[name].get_value(params, name)
+        if value:
+            signature.append((name, value))
+    return tuple(signature)
+
+
+class SearchPlan(object):
+    """Search compiled from signature - static part of query is built once,
+    fields which are not cacheable are deferred to :meth:`get_query`."""
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.static_query = Q()
+        self.deferred = []
+        for name, value in signature:
+            search_field = SEARCH_FIELDS[name]
+            if not search_field.is_cacheable(value):
+                self.deferred.append((search_field, value))
+                continue
+            query = search_field.compile(value)
+            if query is not None:
+                self.static_query &= query
+
+    def get_query(self, view=None):
+        query = copy.deepcopy(self.static_query)
+        for search_field, value in self.deferred:
+            part = search_field.compile(value, view=view)
+            if part is not None:
+                query &= part
+        return query
+
+    def get_missing_values(self, queryset):
+        """Returns list of (field name, values) pairs with values pasted to
+        the search which are missing in *queryset*."""
+        missing = []
+        for name, value in self.signature:
+            values = SEARCH_FIELDS[name].get_missing_values(queryset, value)
+            if values:
+                missing.append((name, values))
+        return missing
+
+
+_search_plans = LRUCache(max_size=SEARCH_PLAN_CACHE_SIZE)
+
+
+def get_search_plan(params):
+    """Return compiled (possibly cached) :class:`SearchPlan` for *params*."""
+    signature = get_search_signature(params)
+    plan = _search_plans.get(signature)
+    if plan is None:
+        plan = SearchPlan(signature)
+        _search_plans.set(signature, plan)
+    return plan